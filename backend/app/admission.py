@@ -0,0 +1,245 @@
+"""Rate limiting and load shedding for ``/session/start`` and the message endpoints.
+
+Two checks run before a request does any work:
+
+* token buckets (``RATE_LIMIT_*``) per client address for ``/session/start``
+  and per session and client address for messages; an empty bucket answers
+  429 with ``Retry-After``.
+* admission control: while more than ``ADMISSION_LLM_QUEUE`` model calls wait
+  for a slot, or more than ``ADMISSION_DB_QUEUE`` database calls wait for a
+  connection, non-crisis messages are answered 503.
+
+Crisis detection runs first and crisis messages skip both checks, so the
+crisis reply is always served. Buckets live in this process
+(``MemoryBucketStore``) unless ``RATE_LIMIT_URL`` points at a Redis shared by
+all workers, reached with ``redis.asyncio`` so a check never blocks the event
+loop. With the in-process store a decision is a dict lookup and a few float
+operations under a lock.
+"""
+import math
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Callable, List, Optional, Protocol
+
+from fastapi import HTTPException, Request
+
+from app import config, database, llm, metrics
+
+KEY_PREFIX = "ratelimit:"
+
+
+@dataclass(frozen=True)
+class Limit:
+    __slots__ = ("requests", "seconds")
+
+    requests: int
+    seconds: float
+
+    @classmethod
+    def parse(cls, value: str) -> "Limit":
+        """``"<requests>/<seconds>"``, e.g. ``"20/60"``."""
+        requests, _, seconds = value.partition("/")
+        return cls(int(requests), float(seconds or 1))
+
+    @property
+    def rate(self) -> float:
+        return self.requests / self.seconds
+
+    @property
+    def enabled(self) -> bool:
+        return self.requests > 0
+
+
+class BucketStore(Protocol):
+    """Token buckets by key, possibly shared between worker processes."""
+
+    async def take(self, key: str, rate: float, burst: int, now: float) -> float:
+        """Take one token; return 0 if there was one, else the seconds until there will be."""
+
+    async def refund(self, key: str, rate: float, burst: int, now: float) -> None:
+        """Give back a token taken for a request that another limit then refused."""
+
+
+class MemoryBucketStore:
+    """In-process ``BucketStore``; also the stand-in for Redis in tests. Keeps at most ``max_keys`` buckets (LRU)."""
+
+    def __init__(self, max_keys: int = 100_000):
+        self.max_keys = max_keys
+        self._buckets: "OrderedDict[str, List[float]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    async def take(self, key: str, rate: float, burst: int, now: float) -> float:
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                bucket = self._buckets[key] = [float(burst), now]
+                if len(self._buckets) > self.max_keys:
+                    self._buckets.popitem(last=False)
+            else:
+                self._buckets.move_to_end(key)
+                bucket[0] = min(float(burst), bucket[0] + (now - bucket[1]) * rate)
+                bucket[1] = now
+            if bucket[0] >= 1:
+                bucket[0] -= 1
+                return 0.0
+            return (1 - bucket[0]) / rate
+
+    async def refund(self, key: str, rate: float, burst: int, now: float) -> None:
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is not None:
+                bucket[0] = min(float(burst), bucket[0] + (now - bucket[1]) * rate + 1)
+                bucket[1] = now
+
+    def clear(self) -> None:
+        with self._lock:
+            self._buckets.clear()
+
+
+# KEYS[1] bucket; ARGV rate, burst, now. Tokens and timestamp live in one hash; idle buckets expire.
+_TAKE_SCRIPT = """
+local tokens = tonumber(redis.call('HGET', KEYS[1], 't') or ARGV[2])
+local updated = tonumber(redis.call('HGET', KEYS[1], 'u') or ARGV[3])
+local rate, burst, now = tonumber(ARGV[1]), tonumber(ARGV[2]), tonumber(ARGV[3])
+tokens = math.min(burst, tokens + math.max(0, now - updated) * rate)
+local wait = 0
+if tokens >= 1 then tokens = tokens - 1 else wait = (1 - tokens) / rate end
+redis.call('HSET', KEYS[1], 't', tokens, 'u', now)
+redis.call('EXPIRE', KEYS[1], math.ceil(burst / rate) + 1)
+return tostring(wait)
+"""
+
+# Same layout as _TAKE_SCRIPT; adds a token back to a bucket that still exists.
+_REFUND_SCRIPT = """
+local tokens = tonumber(redis.call('HGET', KEYS[1], 't'))
+if not tokens then return 0 end
+local updated = tonumber(redis.call('HGET', KEYS[1], 'u'))
+local rate, burst, now = tonumber(ARGV[1]), tonumber(ARGV[2]), tonumber(ARGV[3])
+tokens = math.min(burst, tokens + math.max(0, now - updated) * rate + 1)
+redis.call('HSET', KEYS[1], 't', tokens, 'u', now)
+return 0
+"""
+
+
+class RedisBucketStore:
+    """``BucketStore`` on Redis, updated atomically by a Lua script; needs the optional ``redis`` package."""
+
+    def __init__(self, url: str):
+        import redis.asyncio
+
+        client = redis.asyncio.Redis.from_url(url, decode_responses=True)
+        self._take = client.register_script(_TAKE_SCRIPT)
+        self._refund = client.register_script(_REFUND_SCRIPT)
+
+    async def take(self, key: str, rate: float, burst: int, now: float) -> float:
+        return float(await self._take(keys=[KEY_PREFIX + key], args=[rate, burst, now]))
+
+    async def refund(self, key: str, rate: float, burst: int, now: float) -> None:
+        await self._refund(keys=[KEY_PREFIX + key], args=[rate, burst, now])
+
+
+class RateLimiter:
+    def __init__(self, store: BucketStore, clock: Callable[[], float] = time.time):
+        self.store = store
+        self._clock = clock
+
+    async def retry_after(self, key: str, limit: Limit) -> float:
+        """0 if the request fits ``limit`` for ``key``, else the seconds to wait."""
+        if not limit.enabled:
+            return 0.0
+        return await self.store.take(key, limit.rate, limit.requests, self._clock())
+
+    async def refund(self, key: str, limit: Limit) -> None:
+        """Undo a successful ``retry_after`` for a request that was refused anyway."""
+        if limit.enabled:
+            await self.store.refund(key, limit.rate, limit.requests, self._clock())
+
+
+class Admission:
+    def __init__(
+        self,
+        limiter: RateLimiter,
+        session_start_per_ip: Limit = Limit.parse(config.RATE_LIMIT_SESSION_START_PER_IP),
+        message_per_session: Limit = Limit.parse(config.RATE_LIMIT_MESSAGE_PER_SESSION),
+        message_per_ip: Limit = Limit.parse(config.RATE_LIMIT_MESSAGE_PER_IP),
+        rate_limits: bool = config.RATE_LIMIT_ENABLED,
+        shedding: bool = config.ADMISSION_ENABLED,
+        llm_queue: int = config.ADMISSION_LLM_QUEUE,
+        db_queue: int = config.ADMISSION_DB_QUEUE,
+        trusted_proxies: int = config.RATE_LIMIT_TRUSTED_PROXIES,
+    ):
+        self.limiter = limiter
+        self.session_start_per_ip = session_start_per_ip
+        self.message_per_session = message_per_session
+        self.message_per_ip = message_per_ip
+        self.rate_limits = rate_limits
+        self.shedding = shedding
+        self.llm_queue = llm_queue
+        self.db_queue = db_queue
+        self.trusted_proxies = trusted_proxies
+
+    def client_address(self, request: Request) -> str:
+        """The address the outermost trusted proxy saw the request come from.
+
+        Each proxy appends the address it received the request from, so only the
+        last ``trusted_proxies`` entries can be believed; anything further left
+        was sent by the client. With fewer entries than that the request did not
+        come through the proxies, and the peer address is used.
+        """
+        if self.trusted_proxies:
+            hops = [hop.strip() for hop in request.headers.get("x-forwarded-for", "").split(",") if hop.strip()]
+            if len(hops) >= self.trusted_proxies:
+                return hops[-self.trusted_proxies]
+        return request.client.host if request.client else "unknown"
+
+    def overloaded(self) -> Optional[str]:
+        """The saturated resource ("llm_queue" or "db_queue"), or None."""
+        if llm.queue_depth() > self.llm_queue:
+            return "llm_queue"
+        if database.pool_queue_depth() > self.db_queue:
+            return "db_queue"
+        return None
+
+    async def check_session_start(self, request: Request) -> None:
+        if self.rate_limits:
+            wait = await self.limiter.retry_after("start:ip:" + self.client_address(request), self.session_start_per_ip)
+            if wait:
+                _reject("session_start", "ip", 429, wait)
+
+    async def check_message(self, endpoint: str, request: Request, session_id: str) -> None:
+        """Raise 429/503 for a non-crisis message that should not be served now; crisis messages never get here."""
+        if self.rate_limits:
+            limits = (
+                ("session", "message:session:" + session_id, self.message_per_session),
+                ("ip", "message:ip:" + self.client_address(request), self.message_per_ip),
+            )
+            taken = []
+            for reason, key, limit in limits:
+                wait = await self.limiter.retry_after(key, limit)
+                if wait:
+                    # A message refused by one limit must not use up the others.
+                    for earlier in taken:
+                        await self.limiter.refund(*earlier)
+                    _reject(endpoint, reason, 429, wait)
+                taken.append((key, limit))
+        if self.shedding:
+            reason = self.overloaded()
+            if reason:
+                _reject(endpoint, reason, 503, 1)
+
+
+def _reject(endpoint: str, reason: str, status_code: int, retry_after: float) -> None:
+    metrics.ADMISSION_REJECTIONS.inc(endpoint, reason)
+    detail = "Too many requests" if status_code == 429 else "Service busy, try again shortly"
+    raise HTTPException(status_code=status_code, detail=detail, headers={"Retry-After": str(math.ceil(retry_after))})
+
+
+def _build_store() -> BucketStore:
+    if config.RATE_LIMIT_URL:
+        return RedisBucketStore(config.RATE_LIMIT_URL)
+    return MemoryBucketStore()
+
+
+controller = Admission(RateLimiter(_build_store()))
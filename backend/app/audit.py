@@ -0,0 +1,38 @@
+import uuid
+from datetime import datetime
+
+from app import config
+from app.batching import BatchWriter
+from app.database import engine as default_engine
+from app.models import AuditLog
+
+
+class AuditSink(BatchWriter):
+    """Write-behind buffer for non-critical audit events.
+
+    Events that must be durable when the response goes out (crisis overrides)
+    are not sent here; callers write them in their own transaction.
+    """
+
+    def __init__(
+        self,
+        engine=default_engine,
+        max_queue: int = config.AUDIT_QUEUE_SIZE,
+        batch_size: int = config.AUDIT_BATCH_SIZE,
+        flush_interval: float = config.AUDIT_FLUSH_INTERVAL,
+    ):
+        super().__init__(AuditLog.__table__, "audit", engine, max_queue, batch_size, flush_interval)
+
+    def record(self, session_id: uuid.UUID, event: str, detail: dict) -> None:
+        self.put(_row(session_id, event, detail))
+
+    async def arecord(self, session_id: uuid.UUID, event: str, detail: dict) -> None:
+        """``record`` for callers on the event loop."""
+        await self.aput(_row(session_id, event, detail))
+
+
+def _row(session_id: uuid.UUID, event: str, detail: dict) -> dict:
+    return {"id": uuid.uuid4(), "session_id": session_id, "event": event, "detail": detail, "created_at": datetime.utcnow()}
+
+
+sink = AuditSink()
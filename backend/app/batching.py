@@ -0,0 +1,226 @@
+"""Write-behind batching shared by the audit sink and the transcript writer."""
+import logging
+import queue
+import threading
+import time
+from typing import Dict, List, Optional
+
+from sqlalchemy import Table, insert
+from sqlalchemy.exc import DataError, IntegrityError, OperationalError
+from starlette.concurrency import run_in_threadpool
+
+from app.database import run_to_completion
+
+logger = logging.getLogger(__name__)
+
+# Queue marker that makes the flusher write what it has without waiting out the interval.
+_WAKE = object()
+
+
+class BatchWriter:
+    """Write-behind buffer of rows for one table.
+
+    ``put`` enqueues a row and returns immediately; a daemon thread writes rows
+    in multi-row INSERTs once ``batch_size`` rows are waiting or ``flush_interval``
+    seconds after the first one arrived. When the queue is full, or the flusher is
+    not running, the row is written synchronously by the caller instead of being
+    dropped; code on the event loop uses ``aput``, which makes that write on the
+    threadpool.
+
+    Only ``OperationalError`` (lost connection, lock timeout) is retried. A batch
+    the database refuses with ``IntegrityError`` or ``DataError`` (a turn for a
+    session retention already purged, text Postgres will not store) is split
+    until the offending rows are alone; the rest are written and the rejected
+    ones logged and counted, so one bad row cannot wedge the flusher.
+    """
+
+    def __init__(
+        self,
+        table: Table,
+        name: str,
+        engine,
+        max_queue: int,
+        batch_size: int,
+        flush_interval: float,
+    ):
+        self.table = table
+        self.name = name
+        self.engine = engine
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._queue: queue.Queue = queue.Queue(maxsize=max_queue)
+        self._stopping = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._retry: List[dict] = []
+        self._stats_lock = threading.Lock()
+        self._stats: Dict[str, float] = {
+            "enqueued": 0,
+            "written": 0,
+            "batches": 0,
+            "sync_writes": 0,
+            "failed_batches": 0,
+            "rejected": 0,
+            "last_batch_rows": 0,
+            "last_batch_ms": 0.0,
+            "max_batch_ms": 0.0,
+        }
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self) -> None:
+        if self.running:
+            return
+        self._stopping.clear()
+        self._thread = threading.Thread(target=self._run, name=f"{self.name}-flusher", daemon=True)
+        self._thread.start()
+
+    def flush(self) -> None:
+        """Block until every row enqueued so far has been written."""
+        if not self.running:
+            return
+        self._wake()
+        self._queue.join()
+
+    def stop(self, timeout: Optional[float] = 10.0) -> None:
+        """Stop the flusher after writing everything still queued."""
+        if self._thread is None:
+            return
+        self._stopping.set()
+        self._wake()
+        self._thread.join(timeout)
+        self._thread = None
+        self._flush_remaining()
+
+    def put(self, row: dict) -> None:
+        if not self._enqueue(row):
+            # Backpressure: the caller pays for the write rather than losing the row.
+            self._write([row])
+
+    async def aput(self, row: dict) -> None:
+        """``put`` for callers on the event loop: a synchronous write runs on the threadpool."""
+        if not self._enqueue(row):
+            # Still written when the request is cancelled (client gone).
+            await run_to_completion(run_in_threadpool(self._write, [row]))
+
+    def _enqueue(self, row: dict) -> bool:
+        """Queue ``row`` for the flusher; False if the caller has to write it."""
+        if self.running:
+            try:
+                self._queue.put_nowait(row)
+                self._bump("enqueued")
+                return True
+            except queue.Full:
+                pass
+        self._bump("sync_writes")
+        return False
+
+    def _wake(self) -> None:
+        try:
+            self._queue.put_nowait(_WAKE)
+        except queue.Full:
+            pass  # a full queue means the flusher is about to write anyway
+
+    def stats(self) -> Dict[str, float]:
+        with self._stats_lock:
+            stats = dict(self._stats)
+        stats["queue_depth"] = self._queue.qsize()
+        return stats
+
+    def _bump(self, key: str, amount: float = 1) -> None:
+        with self._stats_lock:
+            self._stats[key] += amount
+
+    def _write(self, rows: List[dict]) -> None:
+        start = time.perf_counter()
+        with self.engine.begin() as conn:
+            conn.execute(insert(self.table), rows)
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        with self._stats_lock:
+            self._stats["written"] += len(rows)
+            self._stats["batches"] += 1
+            self._stats["last_batch_rows"] = len(rows)
+            self._stats["last_batch_ms"] = elapsed_ms
+            self._stats["max_batch_ms"] = max(self._stats["max_batch_ms"], elapsed_ms)
+        logger.debug("%s batch: %d rows in %.1f ms", self.name, len(rows), elapsed_ms)
+
+    def _write_isolating(self, rows: List[dict]) -> None:
+        """Write ``rows`` from the queue, dropping the ones the database rejects.
+
+        On ``OperationalError`` the rows not yet written are left in ``_retry``
+        and the error is raised.
+        """
+        pending = [rows]
+        while pending:
+            chunk = pending.pop()
+            try:
+                self._write(chunk)
+            except (IntegrityError, DataError) as exc:
+                if len(chunk) > 1:
+                    middle = len(chunk) // 2
+                    pending += [chunk[middle:], chunk[:middle]]
+                    continue
+                self._bump("rejected")
+                logger.error(
+                    "%s row for session %s rejected: %s", self.name, chunk[0].get("session_id"), type(exc.orig).__name__
+                )
+            except OperationalError:
+                self._retry = chunk + [row for later in reversed(pending) for row in later]
+                raise
+            except Exception:
+                # Not a refusal of particular rows, and retrying will not help.
+                self._bump("rejected", len(chunk))
+                logger.exception("%s batch of %d rows failed; dropping it", self.name, len(chunk))
+            self._done(chunk)
+
+    def _collect(self) -> List[dict]:
+        batch, self._retry = self._retry, []
+        deadline = None
+        while len(batch) < self.batch_size:
+            timeout = self.flush_interval
+            if batch:
+                if deadline is None:
+                    deadline = time.monotonic() + self.flush_interval
+                timeout = deadline - time.monotonic()
+                if timeout <= 0 or self._stopping.is_set():
+                    break
+            try:
+                item = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                break
+            if item is _WAKE:
+                self._queue.task_done()
+                break
+            batch.append(item)
+        return batch
+
+    def _done(self, rows: List[dict]) -> None:
+        for _ in rows:
+            self._queue.task_done()
+
+    def _run(self) -> None:
+        while not self._stopping.is_set():
+            batch = self._collect()
+            if not batch:
+                continue
+            try:
+                self._write_isolating(batch)
+            except OperationalError:
+                logger.exception("%s batch of %d rows failed; retrying", self.name, len(self._retry))
+                self._bump("failed_batches")
+                self._stopping.wait(self.flush_interval)
+
+    def _flush_remaining(self) -> None:
+        rows, self._retry = self._retry, []
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is _WAKE:
+                self._queue.task_done()
+            else:
+                rows.append(item)
+        for start in range(0, len(rows), self.batch_size):
+            self._write_isolating(rows[start : start + self.batch_size])
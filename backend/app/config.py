@@ -2,43 +2,78 @@ import os
 from datetime import timedelta
 
 DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./app.db")
+# Opt-in non-blocking DB access (asyncpg for Postgres, aiosqlite for SQLite)
+ASYNC_DB = os.getenv("ASYNC_DB", "false").lower() == "true"
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "true").lower() == "true"
+# Run create_all when a worker starts (local development); production runs `python -m app.migrate` once instead.
+CREATE_SCHEMA = os.getenv("CREATE_SCHEMA", "true").lower() == "true"
 RETENTION_DAYS = int(os.getenv("RETENTION_DAYS", "30"))
+# Seconds between mtime checks of backend/resources/*.json
+RESOURCE_RELOAD_INTERVAL = float(os.getenv("RESOURCE_RELOAD_INTERVAL", "2"))
+# Seconds between mtime checks of backend/questionnaires/*.json
+QUESTIONNAIRE_RELOAD_INTERVAL = float(os.getenv("QUESTIONNAIRE_RELOAD_INTERVAL", str(RESOURCE_RELOAD_INTERVAL)))
 
-PHQ9_QUESTIONS = [
-    "Little interest or pleasure in doing things",
-    "Feeling down, depressed, or hopeless",
-    "Trouble falling or staying asleep, or sleeping too much",
-    "Feeling tired or having little energy",
-    "Poor appetite or overeating",
-    "Feeling bad about yourself — or that you are a failure or have let yourself or your family down",
-    "Trouble concentrating on things, such as reading the newspaper or watching television",
-    "Moving or speaking so slowly that other people could have noticed? Or the opposite — being so fidgety or restless that you have been moving around a lot more than usual",
-    "Thoughts that you would be better off dead or of hurting yourself in some way",
-]
-
-GAD7_QUESTIONS = [
-    "Feeling nervous, anxious, or on edge",
-    "Not being able to stop or control worrying",
-    "Worrying too much about different things",
-    "Trouble relaxing",
-    "Being so restless that it is hard to sit still",
-    "Becoming easily annoyed or irritable",
-    "Feeling afraid as if something awful might happen",
-]
-
-PHQ9_THRESHOLDS = {
-    "low": 0,
-    "moderate": 10,
-    "high": 15,
-}
-
-GAD7_THRESHOLDS = {
-    "low": 0,
-    "moderate": 10,
-    "high": 15,
-}
+# Session metadata cache: per-process LRU entries (0 disables), TTL in seconds, optional shared backend (redis://...).
+SESSION_CACHE_SIZE = int(os.getenv("SESSION_CACHE_SIZE", "10000"))
+SESSION_CACHE_TTL = float(os.getenv("SESSION_CACHE_TTL", "300"))
+SESSION_CACHE_URL = os.getenv("SESSION_CACHE_URL")
 
 RETENTION_DELTA = timedelta(days=RETENTION_DAYS)
+# Purge expired rows in chunks of this size, sleeping RETENTION_PAUSE seconds between chunks.
+RETENTION_CHUNK_SIZE = int(os.getenv("RETENTION_CHUNK_SIZE", "1000"))
+RETENTION_PAUSE = float(os.getenv("RETENTION_PAUSE", "0"))
+# 0 disables the in-process scheduler (use `python -m app.retention` from cron instead).
+RETENTION_INTERVAL_MINUTES = float(os.getenv("RETENTION_INTERVAL_MINUTES", "0"))
+
+# Non-crisis audit events are buffered and written in batches by a background thread.
+AUDIT_WRITE_BEHIND = os.getenv("AUDIT_WRITE_BEHIND", "true").lower() == "true"
+AUDIT_QUEUE_SIZE = int(os.getenv("AUDIT_QUEUE_SIZE", "10000"))
+AUDIT_BATCH_SIZE = int(os.getenv("AUDIT_BATCH_SIZE", "500"))
+AUDIT_FLUSH_INTERVAL = float(os.getenv("AUDIT_FLUSH_INTERVAL", "1.0"))
+
+# Conversation transcripts: the last TRANSCRIPT_TURNS turns of up to TRANSCRIPT_SESSIONS sessions stay in memory
+# for prompt context; every turn is appended to transcript_turns in write-behind batches.
+TRANSCRIPT_TURNS = int(os.getenv("TRANSCRIPT_TURNS", "20"))
+TRANSCRIPT_SESSIONS = int(os.getenv("TRANSCRIPT_SESSIONS", "10000"))
+TRANSCRIPT_WRITE_BEHIND = os.getenv("TRANSCRIPT_WRITE_BEHIND", "true").lower() == "true"
+TRANSCRIPT_QUEUE_SIZE = int(os.getenv("TRANSCRIPT_QUEUE_SIZE", str(AUDIT_QUEUE_SIZE)))
+TRANSCRIPT_BATCH_SIZE = int(os.getenv("TRANSCRIPT_BATCH_SIZE", str(AUDIT_BATCH_SIZE)))
+TRANSCRIPT_FLUSH_INTERVAL = float(os.getenv("TRANSCRIPT_FLUSH_INTERVAL", str(AUDIT_FLUSH_INTERVAL)))
+# Monthly partitions of transcript_turns created ahead of time on Postgres.
+TRANSCRIPT_PARTITIONS_AHEAD = int(os.getenv("TRANSCRIPT_PARTITIONS_AHEAD", "2"))
+
+# Token-bucket rate limits as "<requests>/<seconds>" (the burst is <requests>); 0 requests disables one limit.
+RATE_LIMIT_ENABLED = os.getenv("RATE_LIMIT_ENABLED", "true").lower() == "true"
+RATE_LIMIT_SESSION_START_PER_IP = os.getenv("RATE_LIMIT_SESSION_START_PER_IP", "20/60")
+RATE_LIMIT_MESSAGE_PER_SESSION = os.getenv("RATE_LIMIT_MESSAGE_PER_SESSION", "30/60")
+RATE_LIMIT_MESSAGE_PER_IP = os.getenv("RATE_LIMIT_MESSAGE_PER_IP", "120/60")
+# Buckets shared between workers (redis://...); unset keeps them per process.
+RATE_LIMIT_URL = os.getenv("RATE_LIMIT_URL")
+# Proxies in front of the app that append to X-Forwarded-For; the client address is the entry this many
+# hops from the right. 0 ignores the header and uses the connection's peer address.
+RATE_LIMIT_TRUSTED_PROXIES = int(os.getenv("RATE_LIMIT_TRUSTED_PROXIES", "0"))
+
+# Request/stage/SQL metrics served on /metrics; false leaves the instrumentation out.
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "true").lower() == "true"
 
 MOCK_LLM_ENABLED = os.getenv("MOCK_LLM", "true").lower() == "true"
+# Simulated model timing for the mock: seconds before the first chunk and between chunks.
+MOCK_LLM_LATENCY = float(os.getenv("MOCK_LLM_LATENCY", "0"))
+MOCK_LLM_CHUNK_DELAY = float(os.getenv("MOCK_LLM_CHUNK_DELAY", "0"))
+
+# Real provider endpoint, used when MOCK_LLM=false.
+LLM_URL = os.getenv("LLM_URL")
+# Per-call deadline in seconds (including waiting for a slot); on expiry /message answers with the fallback summary.
+LLM_TIMEOUT = float(os.getenv("LLM_TIMEOUT", "10"))
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "32"))
+# Cache results for repeated prompts (normalized); 0 disables the cache.
+LLM_CACHE_SIZE = int(os.getenv("LLM_CACHE_SIZE", "0"))
+LLM_CACHE_TTL = float(os.getenv("LLM_CACHE_TTL", "300"))
 
+# Non-crisis messages are answered 503 while more than this many calls wait for an LLM slot / a DB connection.
+ADMISSION_ENABLED = os.getenv("ADMISSION_ENABLED", "true").lower() == "true"
+ADMISSION_LLM_QUEUE = int(os.getenv("ADMISSION_LLM_QUEUE", str(LLM_MAX_CONCURRENCY)))
+ADMISSION_DB_QUEUE = int(os.getenv("ADMISSION_DB_QUEUE", "10"))
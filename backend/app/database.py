@@ -1,10 +1,127 @@
+import asyncio
+import os
+from typing import Any, Awaitable, Callable, Optional, TypeVar
+
+import anyio
 from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker, declarative_base
+from sqlalchemy.orm import Session, sessionmaker, declarative_base
+from starlette.concurrency import run_in_threadpool
 from app import config
 
-engine = create_engine(
-    config.DATABASE_URL,
-    connect_args={"check_same_thread": False} if config.DATABASE_URL.startswith("sqlite") else {},
-)
+T = TypeVar("T")
+
+
+def _engine_options(url: str) -> dict:
+    if url.startswith("sqlite"):
+        return {"connect_args": {"check_same_thread": False}, "pool_pre_ping": config.DB_POOL_PRE_PING}
+    return {
+        "pool_size": config.DB_POOL_SIZE,
+        "max_overflow": config.DB_MAX_OVERFLOW,
+        "pool_timeout": config.DB_POOL_TIMEOUT,
+        "pool_pre_ping": config.DB_POOL_PRE_PING,
+    }
+
+
+def async_database_url(url: str) -> str:
+    """Map a sync DATABASE_URL onto its async driver (asyncpg / aiosqlite)."""
+    scheme, sep, rest = url.partition("://")
+    backend = scheme.split("+", 1)[0]
+    if backend in ("postgresql", "postgres"):
+        return f"postgresql+asyncpg{sep}{rest}"
+    if backend == "sqlite":
+        return f"sqlite+aiosqlite{sep}{rest}"
+    return url
+
+
+engine = create_engine(config.DATABASE_URL, **_engine_options(config.DATABASE_URL))
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base = declarative_base()
+
+async_engine = None
+AsyncSessionLocal = None
+if config.ASYNC_DB:
+    from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+
+    _async_url = async_database_url(config.DATABASE_URL)
+    async_engine = create_async_engine(_async_url, **_engine_options(_async_url))
+    AsyncSessionLocal = sessionmaker(async_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False)
+
+
+def _reset_pools_after_fork() -> None:
+    """Give a forked worker fresh connection pools.
+
+    ``dispose(close=False)`` drops the inherited pool without touching its
+    sockets (which still belong to the parent), so each worker opens its own
+    connections. Event listeners and module-level references stay valid.
+    """
+    engine.dispose(close=False)
+    if async_engine is not None:
+        async_engine.sync_engine.dispose(close=False)
+
+
+os.register_at_fork(after_in_child=_reset_pools_after_fork)
+
+
+async def run_to_completion(awaitable: Awaitable[T]) -> T:
+    """Await ``awaitable`` to the end even if the caller is cancelled meanwhile.
+
+    The cancellation is re-raised once it has finished. Handles both task
+    cancellation (``anyio.CancelScope(shield=True)`` does not stop it) and anyio
+    cancel scopes (which would keep re-cancelling a bare ``asyncio.shield``).
+    """
+    task = asyncio.ensure_future(awaitable)
+    cancelled = False
+    with anyio.CancelScope(shield=True):
+        while not task.done():
+            try:
+                await asyncio.shield(task)
+            except asyncio.CancelledError:
+                cancelled = True
+    if cancelled:
+        raise asyncio.CancelledError
+    return task.result()
+
+
+class DB:
+    """Request-scoped database handle.
+
+    Endpoint logic is written once against a sync ``Session``. ``run`` executes it
+    on a threadpool worker in the default mode, or inside ``AsyncSession.run_sync``
+    when ``ASYNC_DB`` is enabled, where I/O is awaited on the event loop and no
+    worker thread is held.
+    """
+
+    # Calls in progress in this process, across requests. Only changed on the event loop.
+    in_flight = 0
+
+    def __init__(self, session: Optional[Session] = None, async_session: Any = None):
+        self.session = session
+        self.async_session = async_session
+
+    async def run(self, fn: Callable[..., T], *args: Any) -> T:
+        DB.in_flight += 1
+        try:
+            # A cancelled request would otherwise close the session in get_db while
+            # ``fn`` is still using it on another thread.
+            if self.async_session is not None:
+                return await run_to_completion(self.async_session.run_sync(fn, *args))
+            return await run_to_completion(run_in_threadpool(fn, self.session, *args))
+        finally:
+            DB.in_flight -= 1
+
+
+def pool_queue_depth() -> int:
+    """``DB.run`` calls beyond what the pool can serve at once, i.e. waiting for a connection."""
+    return max(0, DB.in_flight - (config.DB_POOL_SIZE + config.DB_MAX_OVERFLOW))
+
+
+async def get_db():
+    if AsyncSessionLocal is not None:
+        async with AsyncSessionLocal() as async_session:
+            yield DB(async_session=async_session)
+        return
+    session = SessionLocal()
+    try:
+        yield DB(session)
+    finally:
+        session.close()
@@ -0,0 +1,154 @@
+"""Constant-memory export of everything stored for one user.
+
+Rows are read with ``yield_per`` (server-side cursors on Postgres) and encoded
+into bounded chunks as they arrive, so memory does not grow with history size.
+Two wire formats share one row source:
+
+* ``json``   - the same document shape as ``schemas.ExportResponse``
+* ``ndjson`` - one ``{"type": ..., "data": ...}`` object per line
+"""
+import itertools
+import json
+import uuid
+from typing import Callable, Dict, Iterator, List, Tuple
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from app.models import AuditLog, Message, QuestionnaireResponse, Session as DBSession, TranscriptTurn, User
+from app.transcripts import SENDERS
+
+BATCH_SIZE = 1000
+CHUNK_BYTES = 64 * 1024
+
+MEDIA_TYPES = {"json": "application/json", "ndjson": "application/x-ndjson"}
+
+
+def _isoformat(value):
+    return value.isoformat() if value is not None else None
+
+
+def _session_row(r) -> Dict:
+    return {"id": str(r.id), "country": r.country, "language": r.language, "age_band": r.age_band}
+
+
+def _audit_row(r) -> Dict:
+    return {"session_id": str(r.session_id), "event": r.event, "detail": r.detail, "created_at": _isoformat(r.created_at)}
+
+
+def _message_row(r) -> Dict:
+    return {"session_id": str(r.session_id), "sender": r.sender, "content": r.content, "created_at": _isoformat(r.created_at)}
+
+
+def _turn_row(r) -> Dict:
+    return {"session_id": str(r.session_id), "sender": SENDERS[r.sender], "content": r.content, "created_at": _isoformat(r.created_at)}
+
+
+def _response_row(r) -> Dict:
+    return {"session_id": str(r.session_id), "questionnaire": r.questionnaire, "question_index": r.question_index, "score": r.score}
+
+
+def _sections(db: Session, user_id: uuid.UUID) -> Iterator[Tuple[str, Iterator[Dict]]]:
+    """Yield ``(section, rows)`` in ``ExportResponse`` order; each query runs only when its rows are consumed.
+
+    Consecutive queries for the same section are concatenated: ``messages`` is
+    the legacy ``messages`` table followed by transcript turns.
+    """
+    owned = select(DBSession.id).where(DBSession.user_id == user_id)
+    queries = (
+        (
+            "sessions",
+            select(DBSession.id, DBSession.country, DBSession.language, DBSession.age_band).where(DBSession.user_id == user_id),
+            _session_row,
+        ),
+        (
+            "audit_logs",
+            select(AuditLog.session_id, AuditLog.event, AuditLog.detail, AuditLog.created_at).where(AuditLog.session_id.in_(owned)),
+            _audit_row,
+        ),
+        (
+            "messages",
+            select(Message.session_id, Message.sender, Message.content, Message.created_at).where(Message.session_id.in_(owned)),
+            _message_row,
+        ),
+        (
+            "messages",
+            select(TranscriptTurn.session_id, TranscriptTurn.sender, TranscriptTurn.content, TranscriptTurn.created_at)
+            .where(TranscriptTurn.session_id.in_(owned))
+            .order_by(TranscriptTurn.session_id, TranscriptTurn.id),
+            _turn_row,
+        ),
+        (
+            "questionnaire_responses",
+            select(
+                QuestionnaireResponse.session_id,
+                QuestionnaireResponse.questionnaire,
+                QuestionnaireResponse.question_index,
+                QuestionnaireResponse.score,
+            ).where(QuestionnaireResponse.session_id.in_(owned)),
+            _response_row,
+        ),
+    )
+    for section, group in itertools.groupby(queries, key=lambda query: query[0]):
+        sources = [(statement, to_dict) for _, statement, to_dict in group]
+        yield section, itertools.chain.from_iterable(_rows(db, statement, to_dict) for statement, to_dict in sources)
+
+
+def _rows(db: Session, statement, to_dict: Callable[..., Dict]) -> Iterator[Dict]:
+    result = db.execute(statement.execution_options(yield_per=BATCH_SIZE))
+    return (to_dict(row) for row in result)
+
+
+def _chunked(pieces: Iterator[str]) -> Iterator[bytes]:
+    buffer: List[str] = []
+    size = 0
+    for piece in pieces:
+        buffer.append(piece)
+        size += len(piece)
+        if size >= CHUNK_BYTES:
+            yield "".join(buffer).encode("utf-8")
+            buffer, size = [], 0
+    if buffer:
+        yield "".join(buffer).encode("utf-8")
+
+
+def _json_pieces(user: Dict, sections: Iterator[Tuple[str, Iterator[Dict]]]) -> Iterator[str]:
+    yield '{"user":' + json.dumps(user)
+    for section, rows in sections:
+        yield f',"{section}":['
+        separator = ""
+        for data in rows:
+            yield separator + json.dumps(data)
+            separator = ","
+        yield "]"
+    yield "}"
+
+
+def _ndjson_pieces(user: Dict, sections: Iterator[Tuple[str, Iterator[Dict]]]) -> Iterator[str]:
+    yield json.dumps({"type": "user", "data": user}) + "\n"
+    for section, rows in sections:
+        for data in rows:
+            yield json.dumps({"type": section, "data": data}) + "\n"
+
+
+FORMATS: Dict[str, Callable[[Dict, Iterator[Tuple[str, Iterator[Dict]]]], Iterator[str]]] = {
+    "json": _json_pieces,
+    "ndjson": _ndjson_pieces,
+}
+
+
+def find_user(db: Session, email: str) -> Dict:
+    """Return the exported user header, or an empty dict if there is no such user."""
+    row = db.execute(select(User.id, User.email, User.consent).where(User.email == email)).first()
+    if row is None:
+        return {}
+    return {"id": str(row.id), "email": row.email, "consent": row.consent}
+
+
+def stream_export(session_factory: Callable[[], Session], user: Dict, fmt: str = "json") -> Iterator[bytes]:
+    """Yield the encoded export for ``user`` (from ``find_user``) using a session of its own."""
+    db = session_factory()
+    try:
+        yield from _chunked(FORMATS[fmt](user, _sections(db, uuid.UUID(user["id"]))))
+    finally:
+        db.close()
@@ -0,0 +1,82 @@
+"""Directory of JSON files parsed once and reloaded when they change on disk.
+
+Shared by the resource and questionnaire registries: each ``<stem>.json`` is
+parsed into an entry (anything with an ``mtime`` attribute), re-parsed only when
+its mtime changes, and dropped when the file goes away. The directory is
+re-scanned at most once per ``reload_interval`` seconds, on lookup, so a
+request never does more than a handful of ``stat`` calls.
+"""
+import json
+import logging
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Generic, TypeVar
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+class FileRegistry(Generic[T]):
+    # Used in log messages ("Invalid resource file ...").
+    kind = "registry"
+
+    def __init__(self, directory: Path, reload_interval: float):
+        self.directory = Path(directory)
+        self.reload_interval = reload_interval
+        self._entries: Dict[str, T] = {}
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+
+    def _key(self, stem: str) -> str:
+        """Lookup key for ``<stem>.json``."""
+        return stem
+
+    def _parse(self, key: str, data: dict, mtime: float) -> T:
+        """Build the entry for one file; raise ``ValueError``/``TypeError`` if it is invalid."""
+        raise NotImplementedError
+
+    def _replace(self, current: Dict[str, T], entries: Dict[str, T]) -> None:
+        """Install a freshly scanned set of entries (``current`` is the previous one)."""
+        self._entries = entries
+
+    def load(self) -> None:
+        """Scan the directory, (re)parsing new or modified files and dropping removed ones."""
+        with self._lock:
+            current = self._entries
+            entries: Dict[str, T] = {}
+            with os.scandir(self.directory) as it:
+                for item in it:
+                    if not item.name.endswith(".json"):
+                        continue
+                    key = self._key(item.name[: -len(".json")])
+                    cached = current.get(key)
+                    try:
+                        if not item.is_file():
+                            continue
+                        mtime = item.stat().st_mtime
+                        if cached is not None and cached.mtime == mtime:
+                            entries[key] = cached
+                            continue
+                        with open(item.path, "r", encoding="utf-8") as f:
+                            entries[key] = self._parse(key, json.load(f), mtime)
+                    except OSError:
+                        # Removed or replaced between the scan and the read; the next scan settles it.
+                        logger.warning("Could not read %s file %s", self.kind, item.path, exc_info=True)
+                        if cached is not None:
+                            entries[key] = cached
+                    except (ValueError, TypeError):
+                        # Keep serving the last good version while a file is being edited.
+                        if not current:
+                            raise
+                        logger.exception("Invalid %s file %s", self.kind, item.path)
+                        if cached is not None:
+                            entries[key] = cached
+            self._replace(current, entries)
+            self._checked_at = time.monotonic()
+
+    def _maybe_reload(self) -> None:
+        if not self._entries or time.monotonic() - self._checked_at >= self.reload_interval:
+            self.load()
@@ -1,18 +1,269 @@
-from typing import Dict
+"""LLM access for ``/message``.
+
+One ``LLMService`` lives for the whole process. It wraps a provider client
+(``MockLLM`` or the pooled ``HTTPLLM``) with:
+
+* a per-call deadline (``LLM_TIMEOUT``) that also covers waiting for a slot,
+* a global concurrency cap (``LLM_MAX_CONCURRENCY``) enforced by a semaphore,
+* a fallback to the deterministic summary when the deadline passes or the
+  provider fails, so a slow model degrades the reply instead of the worker,
+* an optional LRU/TTL cache keyed on the normalized prompt
+  (``LLM_CACHE_SIZE=0`` disables it); only calls without conversation context
+  are cached.
+
+``context`` is the session's recent turns as ``{"role", "content"}`` messages,
+oldest first (see ``app.transcripts``).
+
+``stream`` yields the ``user_message`` as text chunks followed by the complete
+result dict, under the same deadline, cap and fallback rules.
+"""
+import asyncio
+import logging
+import re
+from typing import AsyncIterator, Dict, List, Optional, Sequence, Union
+
 from app import config
+from app.cache import TTLCache
+from app.safety import normalize
+
+logger = logging.getLogger(__name__)
+
+FALLBACK_RESULT: Dict = {
+    "intent": "summary",
+    "user_message": "Thank you for sharing. Here is a brief neutral summary of what you mentioned.",
+    "extracted_entities": {},
+    "next_action": {"type": "continue", "payload": {}},
+}
+
+
+Context = Sequence[Dict[str, str]]
+
+_TOKEN = re.compile(r"\S+\s*")
+
+
+def split_tokens(text: str) -> List[str]:
+    """Split ``text`` into word-sized chunks that join back to the original (minus leading whitespace)."""
+    return _TOKEN.findall(text)
 
 
 class MockLLM:
-    def generate(self, prompt: str) -> Dict:
-        return {
-            "intent": "summary",
-            "user_message": "Thank you for sharing. Here is a brief neutral summary of what you mentioned.",
-            "extracted_entities": {},
-            "next_action": {"type": "continue", "payload": {}},
-        }
+    """Deterministic summary. ``latency`` delays the first chunk and ``chunk_delay`` spaces the rest,
+    so streaming can be exercised; ``generate`` waits as long as a full stream would take."""
+
+    def __init__(self, latency: float = config.MOCK_LLM_LATENCY, chunk_delay: float = config.MOCK_LLM_CHUNK_DELAY):
+        self.latency = latency
+        self.chunk_delay = chunk_delay
+
+    async def generate(self, prompt: str, context: Context = ()) -> Dict:
+        result = dict(FALLBACK_RESULT)
+        delay = self.latency + self.chunk_delay * (len(split_tokens(result["user_message"])) - 1)
+        if delay > 0:
+            await asyncio.sleep(delay)
+        return result
+
+    async def stream(self, prompt: str, context: Context = ()) -> AsyncIterator[Union[str, Dict]]:
+        result = dict(FALLBACK_RESULT)
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        for i, token in enumerate(split_tokens(result["user_message"])):
+            if i and self.chunk_delay:
+                await asyncio.sleep(self.chunk_delay)
+            yield token
+        yield result
+
+    async def aclose(self) -> None:
+        pass
+
+
+class HTTPLLM:
+    """Provider reached over HTTP: POST ``{"prompt": ..., "context": [...]}`` to ``url``, expect the result dict back.
+
+    A single ``httpx.AsyncClient`` keeps connections alive across calls.
+    """
+
+    def __init__(self, url: str, max_connections: int = config.LLM_MAX_CONCURRENCY, transport=None):
+        import httpx
+
+        self.url = url
+        self._client = httpx.AsyncClient(
+            limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections),
+            timeout=None,  # the service enforces the deadline
+            transport=transport,
+        )
+
+    async def generate(self, prompt: str, context: Context = ()) -> Dict:
+        response = await self._client.post(self.url, json={"prompt": prompt, "context": list(context)})
+        response.raise_for_status()
+        return response.json()
 
+    async def stream(self, prompt: str, context: Context = ()) -> AsyncIterator[Union[str, Dict]]:
+        # The provider API answers in one piece; re-chunk it so callers see one interface.
+        result = await self.generate(prompt, context)
+        for token in split_tokens(result.get("user_message", "")):
+            yield token
+        yield result
 
-def get_llm_client():
+    async def aclose(self) -> None:
+        await self._client.aclose()
+
+
+class LLMService:
+    def __init__(
+        self,
+        client,
+        timeout: float = config.LLM_TIMEOUT,
+        max_concurrency: int = config.LLM_MAX_CONCURRENCY,
+        cache: Optional[TTLCache] = None,
+    ):
+        self.client = client
+        self.timeout = timeout
+        self.max_concurrency = max_concurrency
+        self.cache = cache
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        # Calls holding or waiting for a slot; read by admission control.
+        self.in_flight = 0
+        self.stats: Dict[str, int] = {"calls": 0, "cache_hits": 0, "timeouts": 0, "errors": 0}
+
+    @property
+    def queue_depth(self) -> int:
+        """Calls waiting for a slot."""
+        return max(0, self.in_flight - self.max_concurrency)
+
+    def _slots(self) -> asyncio.Semaphore:
+        # Created lazily so it binds to the event loop that serves requests.
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        return self._semaphore
+
+    async def _call(self, prompt: str, context: Context) -> Dict:
+        self.in_flight += 1
+        try:
+            async with self._slots():
+                return await self.client.generate(prompt, context)
+        finally:
+            self.in_flight -= 1
+
+    def _key(self, prompt: str, context: Context) -> Optional[str]:
+        return normalize(prompt) if self.cache is not None and not context else None
+
+    async def generate(self, prompt: str, context: Context = ()) -> Dict:
+        """Return the model result for ``prompt``, or ``FALLBACK_RESULT`` if it cannot be had in time.
+
+        Cached results are shared between callers and must not be mutated.
+        """
+        key = self._key(prompt, context)
+        if key is not None:
+            cached = self.cache.get(key)
+            if cached is not None:
+                self.stats["cache_hits"] += 1
+                return cached
+        self.stats["calls"] += 1
+        try:
+            result = await asyncio.wait_for(self._call(prompt, context), self.timeout)
+        except asyncio.TimeoutError:
+            self.stats["timeouts"] += 1
+            logger.warning("LLM call exceeded %.1fs; using fallback summary", self.timeout)
+            return FALLBACK_RESULT
+        except Exception:
+            self.stats["errors"] += 1
+            logger.exception("LLM call failed; using fallback summary")
+            return FALLBACK_RESULT
+        if key is not None:
+            self.cache.set(key, result)
+        return result
+
+    async def stream(self, prompt: str, context: Context = ()) -> AsyncIterator[Union[str, Dict]]:
+        """Yield ``user_message`` chunks, then the complete result dict.
+
+        If the deadline passes or the provider fails before any chunk was sent,
+        the fallback summary is streamed instead; after that, the final result
+        keeps the text already sent with the fallback's structured fields.
+        """
+        key = self._key(prompt, context)
+        if key is not None:
+            cached = self.cache.get(key)
+            if cached is not None:
+                self.stats["cache_hits"] += 1
+                for token in split_tokens(cached["user_message"]):
+                    yield token
+                yield cached
+                return
+        self.stats["calls"] += 1
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.timeout
+        sent: List[str] = []
+        result: Optional[Dict] = None
+        slots = self._slots()
+        self.in_flight += 1
+        try:
+            await asyncio.wait_for(slots.acquire(), self.timeout)
+        except asyncio.TimeoutError:
+            self.stats["timeouts"] += 1
+        else:
+            chunks = self.client.stream(prompt, context)
+            try:
+                while True:
+                    item = await asyncio.wait_for(chunks.__anext__(), max(deadline - loop.time(), 0))
+                    if isinstance(item, dict):
+                        result = item
+                        break
+                    sent.append(item)
+                    yield item
+            except StopAsyncIteration:
+                pass
+            except asyncio.TimeoutError:
+                self.stats["timeouts"] += 1
+                logger.warning("LLM stream exceeded %.1fs; using fallback summary", self.timeout)
+            except Exception:
+                self.stats["errors"] += 1
+                logger.exception("LLM stream failed; using fallback summary")
+            finally:
+                slots.release()
+                await chunks.aclose()
+        finally:
+            self.in_flight -= 1
+        if result is None:
+            if sent:
+                result = {**FALLBACK_RESULT, "user_message": "".join(sent)}
+            else:
+                result = FALLBACK_RESULT
+                for token in split_tokens(result["user_message"]):
+                    yield token
+        elif key is not None:
+            self.cache.set(key, result)
+        yield result
+
+    async def aclose(self) -> None:
+        await self.client.aclose()
+
+
+def _build_client():
     if config.MOCK_LLM_ENABLED:
         return MockLLM()
-    raise NotImplementedError("Only mock LLM is implemented in this MVP")
+    if config.LLM_URL:
+        return HTTPLLM(config.LLM_URL)
+    raise NotImplementedError("Set MOCK_LLM=true or LLM_URL")
+
+
+_service: Optional[LLMService] = None
+
+
+def queue_depth() -> int:
+    """LLM calls waiting for a slot in this process (0 before the service exists)."""
+    return _service.queue_depth if _service is not None else 0
+
+
+def get_llm_client() -> LLMService:
+    """Return the process-wide LLM service, creating it on first use."""
+    global _service
+    if _service is None:
+        cache = TTLCache(config.LLM_CACHE_SIZE, config.LLM_CACHE_TTL) if config.LLM_CACHE_SIZE > 0 else None
+        _service = LLMService(_build_client(), cache=cache)
+    return _service
+
+
+async def close_llm_client() -> None:
+    global _service
+    if _service is not None:
+        await _service.aclose()
+        _service = None
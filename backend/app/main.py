@@ -1,16 +1,69 @@
-from fastapi import FastAPI, Depends, HTTPException
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Depends, HTTPException, Query, Request, Response
+from fastapi.responses import PlainTextResponse, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
+from sqlalchemy import insert, select
 from sqlalchemy.orm import Session
-from app import schemas, safety, questionnaires, routing, resources as resource_loader
-from app.database import SessionLocal, engine, Base
-from app.models import User, Session as DBSession, Message, QuestionnaireResponse, AuditLog
-from app.llm import get_llm_client
-from app.config import DISCLAIMER
+from app import admission, audit, config, metrics, schemas, session_cache, safety, scores, questionnaires, routing, transcripts, resources as resource_loader
+from app.database import DB, SessionLocal, async_engine, engine, get_db, Base
+from app.models import User, Session as DBSession, AuditLog
+from app.llm import FALLBACK_RESULT, close_llm_client, get_llm_client
+from app.responses import DisclaimerMiddleware, ORJSONResponse, json_bytes, json_response
+from app.safety import DISCLAIMER
+import json
 import uuid
+from typing import AsyncIterator, List, Optional, Tuple
 
-Base.metadata.create_all(bind=engine)
+# Bodies that never change, encoded once.
+_ROOT_BODY = json_bytes({"message": "Mental Health Intake + Routing Assistant", "disclaimer": DISCLAIMER})
+_FALLBACK_BODY = json_bytes(schemas.MessageResponse(**FALLBACK_RESULT).dict())
 
-app = FastAPI(title="Mental Health Intake + Routing Assistant")
+
+def preload() -> None:
+    """Build the read-only state every request uses.
+
+    Called in the gunicorn master before forking (see ``gunicorn.conf.py``), so
+    workers share these objects copy-on-write; in a worker the calls only
+    confirm nothing changed on disk.
+    """
+    resource_loader.registry.load()
+    questionnaires.registry.load()
+    safety.get_matcher()
+    routing.get_table()
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Importing this module only defines routes; every startup step is here, timed
+    # as stage_duration_seconds{handler="startup"}, so the first request finds warm state.
+    if config.CREATE_SCHEMA:
+        with metrics.stage("startup", "schema"):
+            Base.metadata.create_all(bind=engine)
+            transcripts.ensure_partitions(engine)
+    with metrics.stage("startup", "preload"):
+        preload()
+    with metrics.stage("startup", "background"):
+        if config.AUDIT_WRITE_BEHIND:
+            audit.sink.start()
+        if config.TRANSCRIPT_WRITE_BEHIND:
+            transcripts.store.writer.start()
+        scheduler = None
+        if config.RETENTION_INTERVAL_MINUTES > 0:
+            from app import retention
+
+            scheduler = retention.scheduler
+            scheduler.start()
+    yield
+    if scheduler is not None:
+        scheduler.stop()
+    transcripts.store.writer.stop()
+    audit.sink.stop()
+    await close_llm_client()
+
+
+app = FastAPI(
+    title="Mental Health Intake + Routing Assistant", lifespan=lifespan, default_response_class=ORJSONResponse
+)
 
 app.add_middleware(
     CORSMiddleware,
@@ -19,122 +72,298 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+app.add_middleware(DisclaimerMiddleware)
 
 
-@app.middleware("http")
-async def add_disclaimer_header(request, call_next):
-    response = await call_next(request)
-    response.headers["X-Disclaimer"] = DISCLAIMER
-    return response
+if config.METRICS_ENABLED:
+    metrics.instrument_engine(engine, "sync")
+    if async_engine is not None:
+        metrics.instrument_engine(async_engine.sync_engine, "async")
+    metrics.instrument_writer(audit.sink)
+    metrics.instrument_writer(transcripts.store.writer)
+    app.add_middleware(metrics.MetricsMiddleware)
 
+    @app.get("/metrics", include_in_schema=False)
+    def get_metrics():
+        return PlainTextResponse(metrics.registry.render(), media_type=metrics.CONTENT_TYPE)
 
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
+
+def _session(db: Session, session_id: str) -> session_cache.SessionInfo:
+    """Session metadata from the cache (read from ``db`` on a miss); 404 for unknown sessions."""
+    info = session_cache.cache.fetch(db, uuid.UUID(session_id))
+    if info is None:
+        raise HTTPException(status_code=404, detail="Session not found")
+    return info
+
+
+def _record_audit(db: Session, session_id: uuid.UUID, *events: Tuple[str, dict]) -> None:
+    """Write audit rows with one multi-row INSERT inside the caller's transaction."""
+    db.execute(insert(AuditLog), [{"session_id": session_id, "event": event, "detail": detail} for event, detail in events])
 
 
 @app.post("/session/start", response_model=schemas.StartSessionResponse)
-def start_session(payload: schemas.StartSessionRequest, db: Session = Depends(get_db)):
-    user = None
+async def start_session(payload: schemas.StartSessionRequest, request: Request, db: DB = Depends(get_db)):
+    await admission.controller.check_session_start(request)
+    session_id = await db.run(_start_session, payload)
+    return schemas.StartSessionResponse(session_id=session_id, disclaimer=DISCLAIMER)
+
+
+def _start_session(db: Session, payload: schemas.StartSessionRequest) -> str:
+    # Primary keys are generated here so nothing needs a refresh; one commit.
+    user_id = None
     if payload.email:
-        user = db.query(User).filter(User.email == payload.email).first()
-        if not user:
-            user = User(email=payload.email, consent=payload.consent)
-            db.add(user)
-            db.commit()
-            db.refresh(user)
-    session = DBSession(
-        user_id=user.id if user else None,
-        language=payload.language,
-        country=payload.country,
-        age_band=payload.age_band,
-        consent=payload.consent,
+        with metrics.stage("start_session", "lookup_user"):
+            user_id = db.execute(select(User.id).where(User.email == payload.email)).scalar()
+        if user_id is None:
+            user_id = uuid.uuid4()
+            db.add(User(id=user_id, email=payload.email, consent=payload.consent))
+    session_id = uuid.uuid4()
+    db.add(
+        DBSession(
+            id=session_id,
+            user_id=user_id,
+            language=payload.language,
+            country=payload.country,
+            age_band=payload.age_band,
+            consent=payload.consent,
+        )
     )
-    db.add(session)
-    db.commit()
-    db.refresh(session)
-    db.add(AuditLog(session_id=session.id, event="session_started", detail=payload.dict()))
-    db.commit()
-    return schemas.StartSessionResponse(session_id=str(session.id), disclaimer=DISCLAIMER)
+    with metrics.stage("start_session", "commit"):
+        db.commit()
+    session_cache.cache.put(
+        session_cache.SessionInfo(session_id, payload.country, payload.language, payload.age_band)
+    )
+    transcripts.store.open(session_id)
+    with metrics.stage("start_session", "audit"):
+        audit.sink.record(session_id, "session_started", payload.dict())
+    return str(session_id)
 
 
 @app.post("/message", response_model=schemas.MessageResponse)
-def process_message(payload: schemas.MessageRequest, db: Session = Depends(get_db)):
-    session = db.query(DBSession).get(uuid.UUID(payload.session_id))
-    if not session:
-        raise HTTPException(status_code=404, detail="Session not found")
+async def process_message(payload: schemas.MessageRequest, request: Request, db: DB = Depends(get_db)):
+    with metrics.stage("message", "crisis_detection"):
+        crisis_pattern = safety.match_crisis(payload.message)
+    if crisis_pattern:
+        with metrics.stage("message", "store_message"):
+            session = await db.run(_store_crisis_message, payload, crisis_pattern)
+        metrics.CRISIS_OVERRIDES.inc("message")
+        with metrics.stage("message", "crisis_resources"):
+            return json_response(resource_loader.get_country_resources(session.country).crisis_body)
+    # Only non-crisis work is rate limited or shed.
+    await admission.controller.check_message("message", request, payload.session_id)
+    with metrics.stage("message", "context"):
+        session, context = await _conversation(db, payload.session_id)
+    await transcripts.store.aadd(session.id, transcripts.USER, payload.message)
+    with metrics.stage("message", "llm"):
+        llm_result = await get_llm_client().generate(payload.message, [turn.message() for turn in context])
+    await transcripts.store.aadd(session.id, transcripts.ASSISTANT, llm_result["user_message"])
+    with metrics.stage("message", "audit"):
+        await audit.sink.arecord(session.id, "llm_called", llm_result)
+    return _message_response(llm_result)
 
-    db.add(Message(session_id=session.id, sender="user", content=payload.message))
-    db.commit()
 
-    country_resources = resource_loader.load_resources(session.country)
+def _message_response(llm_result: dict) -> Response:
+    # Validated once here; returning a Response skips FastAPI's second pass over response_model.
+    if llm_result == FALLBACK_RESULT:
+        return json_response(_FALLBACK_BODY)
+    return ORJSONResponse(schemas.MessageResponse(**llm_result).dict())
 
-    if safety.detect_crisis(payload.message):
-        response_text = safety.crisis_response(country_resources)
-        db.add(AuditLog(session_id=session.id, event="crisis_override", detail={"message": payload.message}))
-        db.commit()
-        return schemas.MessageResponse(
-            intent="crisis",
-            user_message=response_text,
-            extracted_entities={},
-            next_action={"type": "stop", "payload": {}},
-        )
 
-    llm = get_llm_client()
-    llm_result = llm.generate(payload.message)
-    db.add(AuditLog(session_id=session.id, event="llm_called", detail=llm_result))
+async def _conversation(
+    db: DB, session_id: str
+) -> Tuple[session_cache.SessionInfo, Tuple[transcripts.Turn, ...]]:
+    """Session metadata and recent turns; no database round trip when both are in memory.
+
+    Runs on the event loop, so only the local LRU is consulted here; the shared
+    backend (a blocking Redis call) is read by ``_session`` on the threadpool.
+    """
+    session = session_cache.cache.get_local(uuid.UUID(session_id))
+    context = transcripts.store.recent(session.id) if session is not None else None
+    if context is None:
+        session, context = await db.run(_load_conversation, session_id)
+    return session, context
+
+
+def _load_conversation(
+    db: Session, session_id: str
+) -> Tuple[session_cache.SessionInfo, Tuple[transcripts.Turn, ...]]:
+    session = _session(db, session_id)
+    return session, transcripts.store.context(db, session.id)
+
+
+def _store_crisis_message(
+    db: Session, payload: schemas.MessageRequest, crisis_pattern: str
+) -> session_cache.SessionInfo:
+    # Crisis messages and their override are committed together, never buffered.
+    session = _session(db, payload.session_id)
+    transcripts.store.add(session.id, transcripts.USER, payload.message, db=db)
+    _record_audit(db, session.id, ("crisis_override", {"message": payload.message, "pattern": crisis_pattern}))
     db.commit()
-    return schemas.MessageResponse(**llm_result)
+    return session
+
+
+def _sse(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+@app.post("/message/stream")
+async def process_message_stream(payload: schemas.MessageRequest, request: Request, db: DB = Depends(get_db)):
+    """Server-sent events: ``safety`` at once, then ``token`` chunks of the reply, then ``done``.
+
+    ``done`` carries the full ``MessageResponse``. Crisis messages get ``safety``
+    and ``done`` only; no model output is produced for them. Other messages go
+    through ``app.admission`` first, as on ``/message``.
+    """
+    with metrics.stage("message_stream", "crisis_detection"):
+        crisis_pattern = safety.match_crisis(payload.message)
+    if crisis_pattern:
+        with metrics.stage("message_stream", "store_message"):
+            session = await db.run(_store_crisis_message, payload, crisis_pattern)
+        metrics.CRISIS_OVERRIDES.inc("message_stream")
+        events = _crisis_events(session.country)
+    else:
+        await admission.controller.check_message("message_stream", request, payload.session_id)
+        with metrics.stage("message_stream", "context"):
+            session, context = await _conversation(db, payload.session_id)
+        await transcripts.store.aadd(session.id, transcripts.USER, payload.message)
+        events = _message_events(session.id, payload.message, context)
+    return StreamingResponse(events, media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
+
+
+async def _crisis_events(country: str) -> AsyncIterator[str]:
+    yield _sse("safety", {"crisis": True})
+    yield _sse("done", resource_loader.get_country_resources(country).crisis_reply)
+
+
+async def _message_events(
+    session_id: uuid.UUID, message: str, context: Tuple[transcripts.Turn, ...]
+) -> AsyncIterator[str]:
+    yield _sse("safety", {"crisis": False})
+    sent: List[str] = []
+    llm_result = None
+    try:
+        async for item in get_llm_client().stream(message, [turn.message() for turn in context]):
+            if isinstance(item, dict):
+                llm_result = item
+            else:
+                sent.append(item)
+                yield _sse("token", {"text": item})
+        yield _sse("done", schemas.MessageResponse(**llm_result).dict())
+    finally:
+        # Runs once the stream is closed, including when the client disconnects early.
+        if llm_result is not None:
+            await transcripts.store.aadd(session_id, transcripts.ASSISTANT, llm_result["user_message"])
+            await audit.sink.arecord(session_id, "llm_called", llm_result)
+        else:
+            await audit.sink.arecord(session_id, "llm_stream_aborted", {"user_message": "".join(sent)})
 
 
 @app.get("/questionnaire/next", response_model=schemas.QuestionnaireNextResponse)
-def questionnaire_next(session_id: str, questionnaire: str, db: Session = Depends(get_db)):
-    session = db.query(DBSession).get(uuid.UUID(session_id))
-    if not session:
-        raise HTTPException(status_code=404, detail="Session not found")
-    questions = questionnaires.get_questionnaire(questionnaire)
-    answered_indices = {r.question_index for r in session.questionnaire_responses if r.questionnaire == questionnaire}
-    for idx, question in enumerate(questions):
-        if idx not in answered_indices:
-            return schemas.QuestionnaireNextResponse(questionnaire=questionnaire, question_index=idx, question=question)
-    raise HTTPException(status_code=404, detail="No more questions")
+async def questionnaire_next(
+    session_id: str, questionnaire: str, language: Optional[str] = None, db: DB = Depends(get_db)
+):
+    return await db.run(_questionnaire_next, session_id, questionnaire, language)
+
+
+def _definition(name: str) -> questionnaires.Questionnaire:
+    try:
+        return questionnaires.get_definition(name)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+
+
+def _questionnaire_next(
+    db: Session, session_id: str, questionnaire: str, language: Optional[str]
+) -> schemas.QuestionnaireNextResponse:
+    definition = _definition(questionnaire)
+    mask = scores.answered_mask(db, _session(db, session_id).id, definition.name)
+    questions = definition.items_for(language)
+    idx = scores.first_unanswered(mask, len(questions))
+    if idx is None:
+        raise HTTPException(status_code=404, detail="No more questions")
+    return schemas.QuestionnaireNextResponse(questionnaire=questionnaire, question_index=idx, question=questions[idx])
 
 
 @app.post("/questionnaire/answer")
-def questionnaire_answer(payload: schemas.QuestionnaireAnswerRequest, db: Session = Depends(get_db)):
-    session = db.query(DBSession).get(uuid.UUID(payload.session_id))
-    if not session:
-        raise HTTPException(status_code=404, detail="Session not found")
-    questions = questionnaires.get_questionnaire(payload.questionnaire)
-    if payload.question_index >= len(questions):
+async def questionnaire_answer(payload: schemas.QuestionnaireAnswerRequest, db: DB = Depends(get_db)):
+    return await db.run(_questionnaire_answer, payload)
+
+
+def _score_error(definition: questionnaires.Questionnaire, score: int) -> Optional[str]:
+    if definition.min_score <= score <= definition.max_item_score:
+        return None
+    return f"Score must be between {definition.min_score} and {definition.max_item_score}"
+
+
+def _questionnaire_answer(db: Session, payload: schemas.QuestionnaireAnswerRequest) -> dict:
+    session = _session(db, payload.session_id)
+    definition = _definition(payload.questionnaire)
+    if not 0 <= payload.question_index < definition.item_count:
         raise HTTPException(status_code=400, detail="Invalid question index")
-    db.add(
-        QuestionnaireResponse(
-            session_id=session.id,
-            questionnaire=payload.questionnaire,
-            question_index=payload.question_index,
-            score=payload.score,
+    error = _score_error(definition, payload.score)
+    if error:
+        raise HTTPException(status_code=422, detail=error)
+    scores.record_answer(db, session.id, definition.name, payload.question_index, payload.score)
+    return {"status": "recorded"}
+
+
+@app.post("/questionnaire/answers", response_model=schemas.QuestionnaireAnswersResponse)
+async def questionnaire_answers(payload: schemas.QuestionnaireAnswersRequest, db: DB = Depends(get_db)):
+    """Record several answers in one transaction. Nothing is stored if any item is invalid."""
+    errors = _answer_errors(payload.answers)
+    if errors:
+        raise HTTPException(status_code=422, detail=[error.dict() for error in errors])
+    return await db.run(_questionnaire_answers, payload)
+
+
+def _answer_errors(answers: List[schemas.QuestionnaireAnswerItem]) -> List[schemas.AnswerError]:
+    errors = []
+    for i, answer in enumerate(answers):
+        try:
+            definition = questionnaires.get_definition(answer.questionnaire)
+        except ValueError as exc:
+            message = str(exc)
+        else:
+            if not 0 <= answer.question_index < definition.item_count:
+                message = "Invalid question index"
+            else:
+                message = _score_error(definition, answer.score)
+                if message is None:
+                    continue
+        errors.append(
+            schemas.AnswerError(
+                item=i, questionnaire=answer.questionnaire, question_index=answer.question_index, error=message
+            )
         )
+    return errors
+
+
+def _questionnaire_answers(
+    db: Session, payload: schemas.QuestionnaireAnswersRequest
+) -> schemas.QuestionnaireAnswersResponse:
+    session = _session(db, payload.session_id)
+    scores.record_answers(
+        db,
+        session.id,
+        [(questionnaires.get_definition(a.questionnaire).name, a.question_index, a.score) for a in payload.answers],
     )
-    db.commit()
-    return {"status": "recorded"}
+    route = _compute_route(db, payload.session_id) if payload.include_route else None
+    return schemas.QuestionnaireAnswersResponse(status="recorded", recorded=len(payload.answers), route=route)
 
 
 @app.get("/route", response_model=schemas.RouteResponse)
-def compute_route(session_id: str, db: Session = Depends(get_db)):
-    session = db.query(DBSession).get(uuid.UUID(session_id))
-    if not session:
-        raise HTTPException(status_code=404, detail="Session not found")
-    phq9_scores = [r.score for r in session.questionnaire_responses if r.questionnaire.lower() == "phq9"]
-    gad7_scores = [r.score for r in session.questionnaire_responses if r.questionnaire.lower() == "gad7"]
-    phq9_total = sum(phq9_scores)
-    gad7_total = sum(gad7_scores)
-    result = routing.route_user(phq9_total, gad7_total, session.age_band)
-    db.add(AuditLog(session_id=session.id, event="routing", detail=result))
-    db.commit()
+async def compute_route(session_id: str, db: DB = Depends(get_db)):
+    return await db.run(_compute_route, session_id)
+
+
+def _compute_route(db: Session, session_id: str) -> schemas.RouteResponse:
+    session = _session(db, session_id)
+    with metrics.stage("route", "load_scores"):
+        totals = scores.totals(db, session.id)
+    with metrics.stage("route", "routing"):
+        result = routing.route_scores(totals, session.age_band)
+    with metrics.stage("route", "audit"):
+        audit.sink.record(session.id, "routing", result)
     return schemas.RouteResponse(
         bucket=result["bucket"],
         recommendation=result["recommendation"],
@@ -143,38 +372,50 @@ def compute_route(session_id: str, db: Session = Depends(get_db)):
     )
 
 
+def _etag_matches(etag: str, if_none_match: Optional[str]) -> bool:
+    """Weak comparison (RFC 9110): ``W/`` prefixes are ignored and ``*`` matches anything."""
+    if not if_none_match:
+        return False
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate == "*" or candidate.removeprefix("W/") == etag:
+            return True
+    return False
+
+
 @app.get("/resources", response_model=schemas.ResourceEntry)
-def get_resources(country: str = "tr"):
-    return resource_loader.load_resources(country)
+def get_resources(request: Request, country: str = "tr"):
+    entry = resource_loader.get_country_resources(country)
+    headers = {"ETag": entry.etag, "Cache-Control": "no-cache"}
+    if _etag_matches(entry.etag, request.headers.get("if-none-match")):
+        return Response(status_code=304, headers=headers)
+    return Response(content=entry.body, media_type="application/json", headers=headers)
+
 
+@app.get(
+    "/export",
+    response_class=StreamingResponse,
+    responses={
+        200: {
+            "model": schemas.ExportResponse,
+            "description": "The user's data as one JSON document, or with `format=ndjson` one "
+            '`{"type": <section>, "data": <row>}` object per line.',
+            "content": {"application/x-ndjson": {"schema": {"type": "string"}}},
+        }
+    },
+)
+async def export_data(email: str, fmt: str = Query("json", alias="format"), db: DB = Depends(get_db)):
+    from app import export  # rarely used; kept out of startup
 
-@app.get("/export", response_model=schemas.ExportResponse)
-def export_data(email: str, db: Session = Depends(get_db)):
-    user = db.query(User).filter(User.email == email).first()
+    if fmt not in export.FORMATS:
+        raise HTTPException(status_code=400, detail=f"format must be one of: {', '.join(export.FORMATS)}")
+    user = await db.run(export.find_user, email)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
-    sessions = db.query(DBSession).filter(DBSession.user_id == user.id).all()
-    session_ids = [s.id for s in sessions]
-    messages = db.query(Message).filter(Message.session_id.in_(session_ids)).all()
-    responses = db.query(QuestionnaireResponse).filter(QuestionnaireResponse.session_id.in_(session_ids)).all()
-    audits = db.query(AuditLog).filter(AuditLog.session_id.in_(session_ids)).all()
-    return schemas.ExportResponse(
-        user={"id": str(user.id), "email": user.email, "consent": user.consent},
-        sessions=[{"id": str(s.id), "country": s.country, "language": s.language, "age_band": s.age_band} for s in sessions],
-        messages=[{"session_id": str(m.session_id), "sender": m.sender, "content": m.content, "created_at": m.created_at.isoformat()} for m in messages],
-        questionnaire_responses=[
-            {
-                "session_id": str(r.session_id),
-                "questionnaire": r.questionnaire,
-                "question_index": r.question_index,
-                "score": r.score,
-            }
-            for r in responses
-        ],
-        audit_logs=[{"session_id": str(a.session_id), "event": a.event, "detail": a.detail, "created_at": a.created_at.isoformat()} for a in audits],
-    )
+    # Streamed from a dedicated session so rows are encoded as they are read.
+    return StreamingResponse(export.stream_export(SessionLocal, user, fmt), media_type=export.MEDIA_TYPES[fmt])
 
 
 @app.get("/")
 def root():
-    return {"message": "Mental Health Intake + Routing Assistant", "disclaimer": DISCLAIMER}
+    return json_response(_ROOT_BODY)
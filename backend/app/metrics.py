@@ -0,0 +1,341 @@
+"""In-process metrics, exposed in the Prometheus text format on ``/metrics``.
+
+Metrics are plain counters, gauges and histograms kept in memory; each update
+is one lock and a few arithmetic operations, so instrumentation stays on in
+production. Set ``METRICS_ENABLED=false`` to leave the middleware, the engine
+listeners and the stage timers out entirely.
+
+Besides per-route request histograms, ``instrument_engine`` counts SQL
+statements through SQLAlchemy events, attributing them to the request being
+served (``db_queries_per_request``), and reports the engine's connection pool
+on every scrape; ``instrument_writer`` does the same for a write-behind sink. ``stage`` times named steps inside a handler.
+"""
+import bisect
+import threading
+import time
+from contextvars import ContextVar
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from app import config
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.075, 0.1, 0.25, 0.5, 0.75, 1.0, 2.5, 5.0, 7.5, 10.0)
+FAST_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1.0)
+COUNT_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 50, 100)
+
+LabelValues = Tuple[str, ...]
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str]) -> str:
+    if not names:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(str(value))}"' for name, value in zip(names, values)) + "}"
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value))
+
+
+class _Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labels: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(labels)
+        self._lock = threading.Lock()
+
+    def header(self) -> List[str]:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+
+    def samples(self) -> Iterable[str]:
+        raise NotImplementedError
+
+    def render(self) -> List[str]:
+        return self.header() + list(self.samples())
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labels: Sequence[str] = ()):
+        super().__init__(name, documentation, labels)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, *labels: str, amount: float = 1) -> None:
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def value(self, *labels: str) -> float:
+        return self._values.get(labels, 0)
+
+    def samples(self) -> Iterable[str]:
+        with self._lock:
+            items = list(self._values.items())
+        for labels, value in items:
+            yield f"{self.name}{_format_labels(self.label_names, labels)} {_format_value(value)}"
+
+
+class Gauge(_Metric):
+    """Gauge whose values are read from ``collect`` at scrape time.
+
+    ``collect`` returns ``{label values: value}``; it runs only when ``/metrics``
+    is rendered, so nothing is paid on the request path.
+    """
+
+    kind = "gauge"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labels: Sequence[str] = (),
+        collect: Optional[Callable[[], Dict[LabelValues, float]]] = None,
+    ):
+        super().__init__(name, documentation, labels)
+        self.collect = collect
+
+    def samples(self) -> Iterable[str]:
+        values = self.collect() if self.collect is not None else {}
+        for labels, value in values.items():
+            yield f"{self.name}{_format_labels(self.label_names, labels)} {_format_value(value)}"
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(
+        self, name: str, documentation: str, labels: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS
+    ):
+        super().__init__(name, documentation, labels)
+        self.buckets = tuple(sorted(buckets))
+        # label values -> [per-bucket counts (last one is +Inf), sum]
+        self._series: Dict[LabelValues, list] = {}
+
+    def observe(self, value: float, *labels: str) -> None:
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][index] += 1
+            series[1] += value
+
+    def count(self, *labels: str) -> int:
+        series = self._series.get(labels)
+        return sum(series[0]) if series else 0
+
+    def total(self, *labels: str) -> float:
+        series = self._series.get(labels)
+        return series[1] if series else 0.0
+
+    def samples(self) -> Iterable[str]:
+        with self._lock:
+            items = [(labels, list(counts), total) for labels, (counts, total) in self._series.items()]
+        names = self.label_names + ("le",)
+        for labels, counts, total in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                yield f"{self.name}_bucket{_format_labels(names, labels + (_format_value(bound),))} {cumulative}"
+            label_text = _format_labels(self.label_names, labels)
+            yield f"{self.name}_sum{label_text} {_format_value(total)}"
+            yield f"{self.name}_count{label_text} {cumulative}"
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: List[_Metric] = []
+
+    def register(self, metric: _Metric) -> _Metric:
+        self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+REQUEST_SECONDS = registry.register(
+    Histogram("http_request_duration_seconds", "Time until the response starts, by route.", ("method", "route", "status"))
+)
+STAGE_SECONDS = registry.register(
+    Histogram("stage_duration_seconds", "Time spent in named stages of a handler.", ("handler", "stage"), FAST_BUCKETS)
+)
+DB_QUERY_SECONDS = registry.register(
+    Histogram("db_query_duration_seconds", "SQL statement execution time.", ("engine", "statement"), FAST_BUCKETS)
+)
+DB_QUERIES_PER_REQUEST = registry.register(
+    Histogram("db_queries_per_request", "SQL statements executed while serving one request.", ("route",), COUNT_BUCKETS)
+)
+DB_SECONDS_PER_REQUEST = registry.register(
+    Histogram("db_duration_per_request_seconds", "SQL execution time while serving one request.", ("route",), FAST_BUCKETS)
+)
+CRISIS_OVERRIDES = registry.register(
+    Counter("crisis_overrides_total", "Messages answered with crisis resources instead of the model.", ("endpoint",))
+)
+ADMISSION_REJECTIONS = registry.register(
+    Counter("admission_rejections_total", "Requests refused by rate limits (429) or load shedding (503).", ("endpoint", "reason"))
+)
+
+_engines: List[Tuple[str, object]] = []
+
+
+def _pool_stats() -> Dict[LabelValues, float]:
+    values: Dict[LabelValues, float] = {}
+    for name, engine in _engines:
+        pool = engine.pool
+        for state in ("size", "checkedin", "checkedout", "overflow"):
+            read = getattr(pool, state, None)
+            if read is not None:
+                values[(name, state)] = read()
+    return values
+
+
+registry.register(
+    Gauge("db_pool_connections", "Connection pool state per engine (QueuePool only).", ("engine", "state"), _pool_stats)
+)
+
+_writers: List[object] = []
+
+
+def _writer_stats() -> Dict[LabelValues, float]:
+    values: Dict[LabelValues, float] = {}
+    for writer in _writers:
+        for stat, value in writer.stats().items():
+            values[(writer.name, stat)] = value
+    return values
+
+
+registry.register(
+    Gauge(
+        "write_behind",
+        "Write-behind sink state per writer: queue_depth, enqueued, batches, written, sync_writes, "
+        "failed_batches, rejected, last_batch_rows, last_batch_ms, max_batch_ms.",
+        ("writer", "stat"),
+        _writer_stats,
+    )
+)
+
+
+class RequestStats:
+    """Per-request accumulator for SQL statements, shared with worker threads through a ContextVar."""
+
+    __slots__ = ("queries", "query_seconds")
+
+    def __init__(self):
+        self.queries = 0
+        self.query_seconds = 0.0
+
+
+_current: ContextVar[Optional[RequestStats]] = ContextVar("metrics_request", default=None)
+
+
+class MetricsMiddleware:
+    """ASGI middleware recording ``http_request_duration_seconds`` and the per-request SQL histograms.
+
+    Latency is taken when the response starts; SQL statements are counted until
+    the body has been sent, so streamed exports are included.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        stats = RequestStats()
+        token = _current.set(stats)
+        start = time.perf_counter()
+        started = [500, None]
+
+        async def send_and_time(message):
+            if message["type"] == "http.response.start":
+                started[0] = message["status"]
+                started[1] = time.perf_counter() - start
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_and_time)
+        finally:
+            _current.reset(token)
+            status, elapsed = started
+            if elapsed is None:
+                elapsed = time.perf_counter() - start
+            # Templated path, so session ids do not become label values.
+            route = getattr(scope.get("route"), "path", "unmatched")
+            REQUEST_SECONDS.observe(elapsed, scope["method"], route, str(status))
+            DB_QUERIES_PER_REQUEST.observe(stats.queries, route)
+            DB_SECONDS_PER_REQUEST.observe(stats.query_seconds, route)
+
+
+def instrument_writer(writer) -> None:
+    """Report a ``BatchWriter``'s ``stats()`` on scrape."""
+    _writers.append(writer)
+
+
+def instrument_engine(engine, name: str = "default") -> None:
+    """Time every statement run through ``engine`` and report its pool on scrape."""
+    from sqlalchemy import event
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("metrics_query_start", []).append(time.perf_counter())
+
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info["metrics_query_start"].pop()
+        DB_QUERY_SECONDS.observe(elapsed, name, statement.split(None, 1)[0].upper())
+        stats = _current.get()
+        if stats is not None:
+            stats.queries += 1
+            stats.query_seconds += elapsed
+
+    event.listen(engine, "before_cursor_execute", before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", after_cursor_execute)
+    _engines.append((name, engine))
+
+
+class _Stage:
+    __slots__ = ("handler", "name", "start")
+
+    def __init__(self, handler: str, name: str):
+        self.handler = handler
+        self.name = name
+
+    def __enter__(self) -> "_Stage":
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        STAGE_SECONDS.observe(time.perf_counter() - self.start, self.handler, self.name)
+
+
+class _NoStage:
+    __slots__ = ()
+
+    def __enter__(self) -> "_NoStage":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        pass
+
+
+_NO_STAGE = _NoStage()
+
+
+def stage(handler: str, name: str):
+    """Context manager recording the time spent in ``name`` of ``handler``."""
+    if not config.METRICS_ENABLED:
+        return _NO_STAGE
+    return _Stage(handler, name)
@@ -0,0 +1,46 @@
+"""Bring the database schema up to date: ``python -m app.migrate`` from ``backend/``.
+
+Run once per deployment, before the API workers start; with
+``CREATE_SCHEMA=false`` the workers never issue DDL themselves. Runs
+``alembic upgrade head`` (usable from any working directory), then creates the
+coming monthly ``transcript_turns`` partitions on Postgres.
+"""
+import argparse
+import logging
+from pathlib import Path
+
+from alembic import command
+from alembic.config import Config
+from sqlalchemy import create_engine
+
+from app import config, transcripts
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+
+
+def alembic_config(url: str = config.DATABASE_URL) -> Config:
+    cfg = Config(str(BACKEND_DIR / "alembic.ini"))
+    cfg.set_main_option("script_location", str(BACKEND_DIR / "migrations"))
+    cfg.set_main_option("sqlalchemy.url", url)
+    return cfg
+
+
+def migrate(url: str = config.DATABASE_URL, revision: str = "head") -> None:
+    command.upgrade(alembic_config(url), revision)
+    engine = create_engine(url)
+    try:
+        transcripts.ensure_partitions(engine)
+    finally:
+        engine.dispose()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--revision", default="head", help="target revision")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    migrate(revision=args.revision)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,6 @@
 import uuid
 from datetime import datetime
-from sqlalchemy import Column, String, DateTime, Boolean, ForeignKey, Integer, JSON
+from sqlalchemy import BigInteger, Column, String, DateTime, Boolean, ForeignKey, Index, Integer, JSON, SmallInteger, Text
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.orm import relationship
 from app.database import Base
@@ -19,11 +19,11 @@ class User(Base):
 class Session(Base):
     __tablename__ = "sessions"
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
-    user_id = Column(UUID(as_uuid=True), ForeignKey("users.id"), nullable=True)
+    user_id = Column(UUID(as_uuid=True), ForeignKey("users.id"), nullable=True, index=True)
     language = Column(String, default="TR")
     country = Column(String, default="TR")
     age_band = Column(String, default="18+")
-    created_at = Column(DateTime, default=datetime.utcnow)
+    created_at = Column(DateTime, default=datetime.utcnow, index=True)
     consent = Column(Boolean, default=False)
 
     user = relationship("User", back_populates="sessions")
@@ -35,22 +35,26 @@ class Session(Base):
 class Message(Base):
     __tablename__ = "messages"
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
-    session_id = Column(UUID(as_uuid=True), ForeignKey("sessions.id"))
+    session_id = Column(UUID(as_uuid=True), ForeignKey("sessions.id"), index=True)
     sender = Column(String)
     content = Column(String)
-    created_at = Column(DateTime, default=datetime.utcnow)
+    created_at = Column(DateTime, default=datetime.utcnow, index=True)
 
     session = relationship("Session", back_populates="messages")
 
 
 class QuestionnaireResponse(Base):
     __tablename__ = "questionnaire_responses"
+    # Leading session_id column also serves the per-session lookups.
+    __table_args__ = (
+        Index("uq_questionnaire_responses_answer", "session_id", "questionnaire", "question_index", unique=True),
+    )
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     session_id = Column(UUID(as_uuid=True), ForeignKey("sessions.id"))
     questionnaire = Column(String)
     question_index = Column(Integer)
     score = Column(Integer)
-    created_at = Column(DateTime, default=datetime.utcnow)
+    created_at = Column(DateTime, default=datetime.utcnow, index=True)
 
     session = relationship("Session", back_populates="questionnaire_responses")
 
@@ -58,9 +62,42 @@ class QuestionnaireResponse(Base):
 class AuditLog(Base):
     __tablename__ = "audit_logs"
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
-    session_id = Column(UUID(as_uuid=True), ForeignKey("sessions.id"))
+    session_id = Column(UUID(as_uuid=True), ForeignKey("sessions.id"), index=True)
     event = Column(String)
     detail = Column(JSON)
-    created_at = Column(DateTime, default=datetime.utcnow)
+    created_at = Column(DateTime, default=datetime.utcnow, index=True)
 
     session = relationship("Session", back_populates="audit_logs")
+
+
+class SessionScore(Base):
+    """Running questionnaire totals per session, maintained by ``app.scores.record_answer``."""
+
+    __tablename__ = "session_scores"
+    session_id = Column(UUID(as_uuid=True), ForeignKey("sessions.id"), primary_key=True)
+    questionnaire = Column(String, primary_key=True)
+    total = Column(Integer, nullable=False, default=0)
+    # Bit i is set once question i has an answer.
+    answered_mask = Column(BigInteger, nullable=False, default=0)
+    updated_at = Column(DateTime, default=datetime.utcnow)
+
+
+class TranscriptTurn(Base):
+    """One conversation turn, written append-only by ``app.transcripts``.
+
+    On Postgres the table is partitioned by month of ``created_at``, which is
+    why it is part of the primary key. ``id`` is time ordered, so the
+    per-session index returns turns in order.
+    """
+
+    __tablename__ = "transcript_turns"
+    __table_args__ = (
+        Index("ix_transcript_turns_session", "session_id", "id"),
+        {"postgresql_partition_by": "RANGE (created_at)"},
+    )
+    id = Column(BigInteger, primary_key=True, autoincrement=False)
+    created_at = Column(DateTime, primary_key=True, default=datetime.utcnow, index=True)
+    session_id = Column(UUID(as_uuid=True), ForeignKey("sessions.id"), nullable=False)
+    # app.transcripts.USER or ASSISTANT
+    sender = Column(SmallInteger, nullable=False)
+    content = Column(Text, nullable=False)
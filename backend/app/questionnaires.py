@@ -1,22 +1,179 @@
-from typing import List
+"""Questionnaire definitions loaded from ``backend/questionnaires/<name>.json``.
+
+Each file is validated and compiled once into an immutable ``Questionnaire``
+indexed by normalized name (``PHQ-9``, ``phq 9`` and ``phq9`` are the same
+instrument) with its items per normalized language. Files are re-checked by
+mtime like the resource files, so instruments can be added or edited without
+a restart.
+"""
+import re
+from bisect import bisect_right
+from dataclasses import dataclass
+from itertools import count
+from pathlib import Path
+from types import MappingProxyType
+from typing import Dict, List, Mapping, Optional, Sequence, Tuple
+
 from app import config
+from app.file_registry import FileRegistry
+from app.schemas import QuestionnaireDefinition
+
+QUESTIONNAIRE_DIR = Path(__file__).resolve().parent.parent / "questionnaires"
+# Routing levels from least to most urgent; thresholds may use any subset.
+LEVELS = ("low", "moderate", "high")
+# Answered questions are tracked in a BIGINT bitmask (``session_scores.answered_mask``).
+MAX_ITEMS = 63
+
+_NON_ALNUM = re.compile(r"[^0-9a-z]")
+# Shared by all registries so a generation number never repeats within the process.
+_generations = count(1)
+
+
+def normalize_name(name: str) -> str:
+    return _NON_ALNUM.sub("", name.lower())
+
+
+def normalize_language(language: str) -> str:
+    return re.split(r"[-_]", language.strip().lower(), 1)[0]
+
+
+@dataclass(frozen=True)
+class Questionnaire:
+    """One compiled instrument. ``cutoffs`` are ascending and parallel to ``levels``."""
+
+    __slots__ = (
+        "name", "title", "min_score", "max_item_score", "items", "default_language",
+        "thresholds", "levels", "cutoffs", "core", "priority", "mtime",
+    )
+
+    name: str
+    title: str
+    min_score: int
+    max_item_score: int
+    items: Mapping[str, Tuple[str, ...]]
+    default_language: str
+    thresholds: Mapping[str, int]
+    levels: Tuple[str, ...]
+    cutoffs: Tuple[int, ...]
+    core: bool
+    priority: int
+    mtime: float
+
+    @property
+    def item_count(self) -> int:
+        return len(self.items[self.default_language])
+
+    @property
+    def max_score(self) -> int:
+        return self.max_item_score * self.item_count
+
+    def items_for(self, language: Optional[str] = None) -> Tuple[str, ...]:
+        """Items in ``language``, falling back to the default language."""
+        if language:
+            found = self.items.get(normalize_language(language))
+            if found is not None:
+                return found
+        return self.items[self.default_language]
+
+    def level_for(self, score: int) -> str:
+        """Highest level whose cutoff ``score`` reaches (``low`` below every cutoff)."""
+        idx = bisect_right(self.cutoffs, score) - 1
+        return self.levels[idx] if idx >= 0 else "low"
+
 
+def compile_definition(name: str, definition: QuestionnaireDefinition, mtime: float = 0.0) -> Questionnaire:
+    min_score, max_item_score = definition.score_range
+    if not 0 <= min_score < max_item_score:
+        raise ValueError(f"{name}: score_range must be increasing and non-negative")
+    unknown = set(definition.thresholds) - set(LEVELS)
+    if unknown:
+        raise ValueError(f"{name}: unknown threshold levels {sorted(unknown)}")
+    items = {normalize_language(language): tuple(texts) for language, texts in definition.items.items()}
+    default_language = normalize_language(definition.default_language)
+    if default_language not in items:
+        raise ValueError(f"{name}: no items for default language {default_language!r}")
+    counts = {len(texts) for texts in items.values()}
+    if len(counts) != 1 or not 0 < counts.pop() <= MAX_ITEMS:
+        raise ValueError(f"{name}: every language needs the same number of items (1-{MAX_ITEMS})")
+    ordered = sorted(definition.thresholds.items(), key=lambda item: (item[1], LEVELS.index(item[0])))
+    return Questionnaire(
+        name=name,
+        title=definition.title,
+        min_score=min_score,
+        max_item_score=max_item_score,
+        items=MappingProxyType(items),
+        default_language=default_language,
+        thresholds=MappingProxyType(dict(ordered)),
+        levels=tuple(level for level, _ in ordered),
+        cutoffs=tuple(cutoff for _, cutoff in ordered),
+        core=definition.core,
+        priority=definition.priority,
+        mtime=mtime,
+    )
 
-def get_questionnaire(name: str) -> List[str]:
-    if name.lower() == "phq9":
-        return config.PHQ9_QUESTIONS
-    if name.lower() == "gad7":
-        return config.GAD7_QUESTIONS
-    raise ValueError("Unknown questionnaire")
+
+class QuestionnaireRegistry(FileRegistry[Questionnaire]):
+    """Compiled definitions for every ``<name>.json``.
+
+    ``generation`` changes whenever the set of definitions does, so derived
+    tables (``routing.get_table``) know when to rebuild.
+    """
+
+    kind = "questionnaire"
+
+    def __init__(self, directory: Path = QUESTIONNAIRE_DIR, reload_interval: float = config.QUESTIONNAIRE_RELOAD_INTERVAL):
+        super().__init__(directory, reload_interval)
+        self.generation = 0
+        self._ordered: Tuple[Questionnaire, ...] = ()
+
+    def _key(self, stem: str) -> str:
+        return normalize_name(stem)
+
+    def _parse(self, key: str, data: dict, mtime: float) -> Questionnaire:
+        return compile_definition(key, QuestionnaireDefinition(**data), mtime)
+
+    def _replace(self, current: Dict[str, Questionnaire], entries: Dict[str, Questionnaire]) -> None:
+        if entries != current:
+            self._entries = entries
+            self._ordered = tuple(sorted(entries.values(), key=lambda q: (q.priority, q.name)))
+            self.generation = next(_generations)
+
+    def get(self, name: str) -> Questionnaire:
+        self._maybe_reload()
+        found = self._entries.get(normalize_name(name))
+        if found is None:
+            raise ValueError("Unknown questionnaire")
+        return found
+
+    def all(self) -> Tuple[Questionnaire, ...]:
+        """Every definition, in routing priority order."""
+        self._maybe_reload()
+        return self._ordered
+
+
+registry = QuestionnaireRegistry()
+
+
+def get_definition(name: str) -> Questionnaire:
+    return registry.get(name)
+
+
+def get_questionnaire(name: str, language: Optional[str] = None) -> Sequence[str]:
+    return registry.get(name).items_for(language)
 
 
 def score_questionnaire(responses: List[int]) -> int:
     return sum(responses)
 
 
+def bucket_for(totals: Dict[str, int]) -> str:
+    """Most urgent level reached by any known instrument in ``totals``."""
+    rank = 0
+    for questionnaire in registry.all():
+        if questionnaire.name in totals:
+            rank = max(rank, LEVELS.index(questionnaire.level_for(totals[questionnaire.name])))
+    return LEVELS[rank]
+
+
 def bucket_for_scores(phq9: int, gad7: int) -> str:
-    if phq9 >= config.PHQ9_THRESHOLDS["high"] or gad7 >= config.GAD7_THRESHOLDS["high"]:
-        return "high"
-    if phq9 >= config.PHQ9_THRESHOLDS["moderate"] or gad7 >= config.GAD7_THRESHOLDS["moderate"]:
-        return "moderate"
-    return "low"
+    return bucket_for({"phq9": phq9, "gad7": gad7})
@@ -0,0 +1,404 @@
+"""Offline re-scoring: how would routing buckets shift under different thresholds?
+
+Streams ``questionnaire_responses`` (with each session's age band) ordered by
+session through one server-side cursor, totals them per session and
+instrument with NumPy, and maps the totals to levels with ``searchsorted``
+against the current and the proposed cutoffs. Sessions whose bucket changes
+are written to a CSV or Parquet report (``--all`` keeps unchanged ones too);
+nothing is written to the database and no audit rows are produced.
+
+    python -m app.rescore --set phq9.moderate=12 --output shifts.csv
+    python -m app.rescore --definitions /path/to/proposed/questionnaires --output shifts.parquet --workers 8
+
+Proposed thresholds come from a directory of definition files
+(``--definitions``, default: the current ones) plus ``--set`` overrides.
+Memory stays constant: rows are processed ``--chunk-size`` at a time and only
+the last, possibly incomplete, session is carried into the next chunk.
+``--workers`` splits the session id space into equal ranges, one cursor and
+one partial report per process; the parts are concatenated at the end.
+"""
+import argparse
+import csv
+import os
+import shutil
+import tempfile
+import uuid
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from sqlalchemy import create_engine, select
+
+from app import config
+from app.models import QuestionnaireResponse, Session as DBSession
+from app.questionnaires import LEVELS, QUESTIONNAIRE_DIR, Questionnaire, QuestionnaireRegistry, normalize_name
+
+FORMATS = ("csv", "parquet")
+
+
+@dataclass(frozen=True)
+class Cutoffs:
+    """The routing-relevant part of one instrument; small and picklable for worker processes."""
+
+    name: str
+    core: bool
+    cutoffs: Tuple[int, ...]
+    # LEVELS index reached at each cutoff.
+    ranks: Tuple[int, ...]
+
+    @classmethod
+    def of(cls, questionnaire: Questionnaire, overrides: Optional[Dict[str, int]] = None) -> "Cutoffs":
+        thresholds = {**questionnaire.thresholds, **(overrides or {})}
+        ordered = sorted(thresholds.items(), key=lambda item: (item[1], LEVELS.index(item[0])))
+        return cls(
+            questionnaire.name,
+            questionnaire.core,
+            tuple(cutoff for _, cutoff in ordered),
+            tuple(LEVELS.index(level) for level, _ in ordered),
+        )
+
+    def rank(self, totals: np.ndarray) -> np.ndarray:
+        """Level index for every total; same rule as ``Questionnaire.level_for``."""
+        idx = np.searchsorted(np.asarray(self.cutoffs, dtype=np.int64), totals, side="right")
+        # idx 0 is below every cutoff ("low").
+        return np.asarray((0,) + self.ranks, dtype=np.int8)[idx]
+
+
+Scheme = Tuple[Optional[Cutoffs], ...]
+
+
+def parse_overrides(values: Sequence[str]) -> Dict[str, Dict[str, int]]:
+    """``["PHQ-9.moderate=12", ...]`` -> ``{"phq9": {"moderate": 12}}`` (names as the registry keys them)."""
+    overrides: Dict[str, Dict[str, int]] = {}
+    for value in values:
+        key, sep, cutoff = value.partition("=")
+        name, dot, level = key.partition(".")
+        if not sep or not dot or level not in LEVELS:
+            raise ValueError(f"expected NAME.LEVEL=CUTOFF with LEVEL one of {', '.join(LEVELS)}, got {value!r}")
+        overrides.setdefault(normalize_name(name), {})[level] = int(cutoff)
+    return overrides
+
+
+def schemes(
+    current: Sequence[Questionnaire], proposed: Sequence[Questionnaire], overrides: Dict[str, Dict[str, int]]
+) -> Tuple[Tuple[str, ...], Scheme, Scheme]:
+    """Instrument columns and, per column, the current and proposed cutoffs (None: not routed)."""
+    by_name = {q.name: q for q in proposed}
+    unknown = set(overrides) - set(by_name)
+    if unknown:
+        raise ValueError(f"unknown questionnaires: {', '.join(sorted(unknown))}")
+    names = tuple(dict.fromkeys([q.name for q in current] + [q.name for q in proposed]))
+    old = {q.name: Cutoffs.of(q) for q in current}
+    new = {q.name: Cutoffs.of(q, overrides.get(q.name)) for q in proposed}
+    return names, tuple(old.get(name) for name in names), tuple(new.get(name) for name in names)
+
+
+def bucket_ranks(totals: np.ndarray, answered: np.ndarray, scheme: Scheme) -> np.ndarray:
+    """Most urgent level per session: core instruments always count, others once answered."""
+    ranks = np.zeros(totals.shape[0], dtype=np.int8)
+    for column, cutoffs in enumerate(scheme):
+        if cutoffs is None:
+            continue
+        level = cutoffs.rank(totals[:, column])
+        if not cutoffs.core:
+            level = np.where(answered[:, column], level, 0).astype(np.int8)
+        np.maximum(ranks, level, out=ranks)
+    return ranks
+
+
+@dataclass
+class Batch:
+    """Response rows ordered by session: ids as (high, low) 64-bit halves, instrument column codes, scores."""
+
+    ids: np.ndarray
+    age_bands: np.ndarray
+    codes: np.ndarray
+    scores: np.ndarray
+
+    @classmethod
+    def from_rows(cls, rows, columns: Dict[str, int]) -> "Batch":
+        n = len(rows)
+        ids = np.frombuffer(b"".join(row.session_id.bytes for row in rows), dtype=">u8").reshape(n, 2)
+        return cls(
+            ids=ids,
+            age_bands=np.array([row.age_band for row in rows], dtype=object),
+            codes=np.fromiter((columns.get(row.questionnaire, -1) for row in rows), dtype=np.int64, count=n),
+            scores=np.fromiter((row.score or 0 for row in rows), dtype=np.int64, count=n),
+        )
+
+    def __len__(self) -> int:
+        return len(self.codes)
+
+    def concat(self, other: "Batch") -> "Batch":
+        return Batch(*(np.concatenate(pair) for pair in zip(self.fields(), other.fields())))
+
+    def fields(self):
+        return self.ids, self.age_bands, self.codes, self.scores
+
+    def split_last_session(self) -> Tuple["Batch", "Batch"]:
+        """(complete sessions, rows of the last session), which may continue in the next chunk."""
+        earlier = np.flatnonzero((self.ids != self.ids[-1]).any(axis=1))
+        start = int(earlier[-1]) + 1 if len(earlier) else 0
+        return self.slice(0, start), self.slice(start, len(self))
+
+    def slice(self, start: int, stop: int) -> "Batch":
+        return Batch(*(array[start:stop] for array in self.fields()))
+
+
+class Report:
+    """Writes diff rows to CSV or Parquet."""
+
+    def __init__(self, path: Path, fmt: str, columns: Sequence[str]):
+        self.path = Path(path)
+        self.fmt = fmt
+        self.columns = list(columns)
+        if fmt == "csv":
+            self._file = open(self.path, "w", newline="", encoding="utf-8")
+            self._csv = csv.writer(self._file)
+            self._csv.writerow(self.columns)
+        else:
+            pa, pq = _pyarrow()
+            totals = [pa.field(name, pa.int64()) for name in self.columns[2:-2]]
+            self.schema = pa.schema(
+                [pa.field("session_id", pa.string()), pa.field("age_band", pa.string())]
+                + totals
+                + [pa.field("old_bucket", pa.string()), pa.field("new_bucket", pa.string())]
+            )
+            self._parquet = pq.ParquetWriter(str(self.path), self.schema)
+
+    def write(self, rows: List[Sequence]) -> None:
+        if not rows:
+            return
+        if self.fmt == "csv":
+            self._csv.writerows(rows)
+            return
+        pa, _ = _pyarrow()
+        self._parquet.write_table(pa.Table.from_arrays([list(column) for column in zip(*rows)], schema=self.schema))
+
+    def append(self, part: Path) -> None:
+        """Copy the rows of another report in the same format (without its header)."""
+        if self.fmt == "csv":
+            self._file.flush()
+            with open(part, "r", newline="", encoding="utf-8") as f:
+                f.readline()
+                shutil.copyfileobj(f, self._file)
+            return
+        pa, pq = _pyarrow()
+        for batch in pq.ParquetFile(str(part)).iter_batches():
+            self._parquet.write_table(pa.Table.from_batches([batch], schema=self.schema))
+
+    def close(self) -> None:
+        if self.fmt == "csv":
+            self._file.close()
+        else:
+            self._parquet.close()
+
+
+def _pyarrow():
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise SystemExit("Parquet output needs the optional pyarrow package (pip install pyarrow)")
+    return pa, pq
+
+
+@dataclass
+class PartitionStats:
+    sessions: int = 0
+    changed: int = 0
+    # (old level, new level) -> sessions, ignoring the minor suffix
+    transitions: Counter = field(default_factory=Counter)
+
+    def merge(self, other: "PartitionStats") -> None:
+        self.sessions += other.sessions
+        self.changed += other.changed
+        self.transitions.update(other.transitions)
+
+
+def _bucket(rank: int, age_band: Optional[str]) -> str:
+    minor = (age_band or "").lower() == "under 18"
+    return LEVELS[rank] + ("_minor" if minor else "")
+
+
+def score_batch(
+    batch: Batch, old: Scheme, new: Scheme, include_unchanged: bool, stats: PartitionStats
+) -> List[Sequence]:
+    """Totals and old/new buckets for every session in ``batch``; returns the report rows."""
+    if not len(batch):
+        return []
+    starts = np.ones(len(batch), dtype=bool)
+    starts[1:] = (batch.ids[1:] != batch.ids[:-1]).any(axis=1)
+    session_index = np.cumsum(starts) - 1
+    sessions = int(session_index[-1]) + 1
+    width = len(old)
+    known = batch.codes >= 0
+    flat = session_index[known] * width + batch.codes[known]
+    totals = np.bincount(flat, weights=batch.scores[known], minlength=sessions * width)
+    totals = totals.astype(np.int64).reshape(sessions, width)
+    answered = np.bincount(flat, minlength=sessions * width).reshape(sessions, width) > 0
+
+    old_ranks = bucket_ranks(totals, answered, old)
+    new_ranks = bucket_ranks(totals, answered, new)
+    pairs, counts = np.unique(old_ranks.astype(np.int64) * len(LEVELS) + new_ranks, return_counts=True)
+    for pair, count in zip(pairs.tolist(), counts.tolist()):
+        stats.transitions[(LEVELS[pair // len(LEVELS)], LEVELS[pair % len(LEVELS)])] += count
+    changed = old_ranks != new_ranks
+    stats.sessions += sessions
+    stats.changed += int(changed.sum())
+
+    selected = np.arange(sessions) if include_unchanged else np.flatnonzero(changed)
+    first_rows = np.flatnonzero(starts)[selected]
+    ids = batch.ids[first_rows]
+    rows = []
+    for session, (high, low), age_band in zip(selected.tolist(), ids.tolist(), batch.age_bands[first_rows]):
+        rows.append(
+            [str(uuid.UUID(int=high << 64 | low)), age_band]
+            + totals[session].tolist()
+            + [_bucket(int(old_ranks[session]), age_band), _bucket(int(new_ranks[session]), age_band)]
+        )
+    return rows
+
+
+def _query(low: Optional[uuid.UUID], high: Optional[uuid.UUID]):
+    # Ordered by the leading columns of uq_questionnaire_responses_answer.
+    query = (
+        select(
+            QuestionnaireResponse.session_id,
+            DBSession.age_band,
+            QuestionnaireResponse.questionnaire,
+            QuestionnaireResponse.score,
+        )
+        .join(DBSession, DBSession.id == QuestionnaireResponse.session_id)
+        .order_by(QuestionnaireResponse.session_id)
+    )
+    if low is not None:
+        query = query.where(QuestionnaireResponse.session_id >= low)
+    if high is not None:
+        query = query.where(QuestionnaireResponse.session_id < high)
+    return query
+
+
+def id_ranges(parts: int) -> List[Tuple[Optional[uuid.UUID], Optional[uuid.UUID]]]:
+    """Split the UUID space into ``parts`` contiguous ranges (open at both ends)."""
+    bounds = [uuid.UUID(int=(i << 128) // parts) for i in range(1, parts)]
+    return list(zip([None] + bounds, bounds + [None]))
+
+
+def run_partition(
+    url: str,
+    low: Optional[uuid.UUID],
+    high: Optional[uuid.UUID],
+    names: Tuple[str, ...],
+    old: Scheme,
+    new: Scheme,
+    output: str,
+    fmt: str,
+    chunk_size: int,
+    include_unchanged: bool,
+) -> PartitionStats:
+    """Score the sessions with ids in ``[low, high)`` and write their report rows to ``output``."""
+    stats = PartitionStats()
+    columns = {name: i for i, name in enumerate(names)}
+    report = Report(Path(output), fmt, ["session_id", "age_band", *names, "old_bucket", "new_bucket"])
+    engine = create_engine(url)
+    try:
+        with engine.connect() as conn:
+            result = conn.execution_options(stream_results=True, yield_per=chunk_size).execute(_query(low, high))
+            pending: Optional[Batch] = None
+            for rows in result.partitions():
+                batch = Batch.from_rows(rows, columns)
+                if pending is not None:
+                    batch = pending.concat(batch)
+                complete, pending = batch.split_last_session()
+                report.write(score_batch(complete, old, new, include_unchanged, stats))
+            if pending is not None:
+                report.write(score_batch(pending, old, new, include_unchanged, stats))
+    finally:
+        engine.dispose()
+        report.close()
+    return stats
+
+
+def rescore(
+    proposed: Sequence[Questionnaire],
+    output: Path,
+    fmt: str = "csv",
+    overrides: Optional[Dict[str, Dict[str, int]]] = None,
+    current: Optional[Sequence[Questionnaire]] = None,
+    url: str = config.DATABASE_URL,
+    workers: int = 1,
+    chunk_size: int = 50_000,
+    include_unchanged: bool = False,
+) -> PartitionStats:
+    if current is None:
+        current = QuestionnaireRegistry(QUESTIONNAIRE_DIR).all()
+    names, old, new = schemes(current, proposed, overrides or {})
+    common = (names, old, new)
+    if workers <= 1:
+        return run_partition(url, None, None, *common, str(output), fmt, chunk_size, include_unchanged)
+
+    stats = PartitionStats()
+    with tempfile.TemporaryDirectory(dir=Path(output).resolve().parent) as parts_dir:
+        parts = [os.path.join(parts_dir, f"part-{i:04d}.{fmt}") for i in range(workers)]
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = [
+                pool.submit(run_partition, url, low, high, *common, part, fmt, chunk_size, include_unchanged)
+                for (low, high), part in zip(id_ranges(workers), parts)
+            ]
+            for future in futures:
+                stats.merge(future.result())
+        report = Report(Path(output), fmt, ["session_id", "age_band", *names, "old_bucket", "new_bucket"])
+        try:
+            for part in parts:
+                report.append(Path(part))
+        finally:
+            report.close()
+    return stats
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--output", required=True, type=Path, help="report file (.csv or .parquet)")
+    parser.add_argument("--format", choices=FORMATS, help="defaults to the output file's suffix")
+    parser.add_argument("--definitions", type=Path, default=QUESTIONNAIRE_DIR, help="proposed definitions")
+    parser.add_argument("--set", dest="overrides", action="append", default=[], metavar="NAME.LEVEL=CUTOFF")
+    parser.add_argument("--workers", type=int, default=1, help="processes, each scanning one session id range")
+    parser.add_argument("--chunk-size", type=int, default=50_000, help="rows fetched per cursor round-trip")
+    parser.add_argument("--all", action="store_true", help="also report sessions whose bucket does not change")
+    parser.add_argument("--database-url", default=config.DATABASE_URL)
+    args = parser.parse_args()
+
+    fmt = args.format or args.output.suffix.lstrip(".").lower()
+    if fmt not in FORMATS:
+        parser.error(f"--format must be one of: {', '.join(FORMATS)}")
+    current = QuestionnaireRegistry(QUESTIONNAIRE_DIR).all()
+    proposed = QuestionnaireRegistry(args.definitions).all()
+    try:
+        overrides = parse_overrides(args.overrides)
+        schemes(current, proposed, overrides)  # rejects unknown questionnaire names
+    except ValueError as exc:
+        parser.error(str(exc))
+    stats = rescore(
+        proposed,
+        args.output,
+        fmt,
+        overrides,
+        current=current,
+        url=args.database_url,
+        workers=args.workers,
+        chunk_size=args.chunk_size,
+        include_unchanged=args.all,
+    )
+    print(f"sessions={stats.sessions} changed={stats.changed} report={args.output}")
+    ordered = sorted(stats.transitions.items(), key=lambda item: tuple(LEVELS.index(level) for level in item[0]))
+    for (old, new), count in ordered:
+        marker = "" if old == new else "  *"
+        print(f"{old:>8} -> {new:<8} {count}{marker}")
+
+
+if __name__ == "__main__":
+    main()
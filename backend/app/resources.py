@@ -1,12 +1,75 @@
+import hashlib
 import json
 from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+from app import config, safety
+from app.file_registry import FileRegistry
+from app.schemas import MessageResponse, ResourceEntry
 
 RESOURCE_DIR = Path(__file__).resolve().parent.parent / "resources"
+DEFAULT_COUNTRY = "default"
+
+
+class CountryResources:
+    """Validated resources for one country plus everything derived from them."""
+
+    __slots__ = ("country", "entry", "data", "crisis_text", "crisis_reply", "crisis_body", "body", "etag", "mtime")
+
+    def __init__(self, country: str, entry: ResourceEntry, mtime: float):
+        self.country = country
+        self.entry = entry
+        self.data = entry.dict()
+        self.crisis_text = safety.crisis_response(self.data)
+        # The complete /message reply for a crisis in this country, ready to send.
+        self.crisis_reply = MessageResponse(
+            intent="crisis",
+            user_message=self.crisis_text,
+            extracted_entities={},
+            next_action={"type": "stop", "payload": {}},
+        ).dict()
+        self.crisis_body = json.dumps(self.crisis_reply, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+        self.body = json.dumps(self.data, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+        self.etag = '"' + hashlib.sha1(self.body).hexdigest() + '"'
+        self.mtime = mtime
+
+
+class ResourceRegistry(FileRegistry[CountryResources]):
+    """Resources for every ``<country>.json``; ``default.json`` is required."""
+
+    kind = "resource"
+
+    def __init__(self, directory: Path = RESOURCE_DIR, reload_interval: float = config.RESOURCE_RELOAD_INTERVAL):
+        super().__init__(directory, reload_interval)
+
+    def _key(self, stem: str) -> str:
+        return stem.lower()
+
+    def _parse(self, key: str, data: dict, mtime: float) -> CountryResources:
+        return CountryResources(key, ResourceEntry(**data), mtime)
+
+    def _replace(self, current: Dict[str, CountryResources], entries: Dict[str, CountryResources]) -> None:
+        if DEFAULT_COUNTRY not in entries:
+            raise FileNotFoundError(f"{self.directory / (DEFAULT_COUNTRY + '.json')} is required")
+        self._entries = entries
+
+    def get(self, country: Optional[str]) -> CountryResources:
+        self._maybe_reload()
+        entries = self._entries
+        return entries.get((country or DEFAULT_COUNTRY).lower()) or entries[DEFAULT_COUNTRY]
+
+    def countries(self) -> Tuple[str, ...]:
+        self._maybe_reload()
+        return tuple(sorted(self._entries))
+
+
+registry = ResourceRegistry()
+
+
+def get_country_resources(country: Optional[str]) -> CountryResources:
+    return registry.get(country)
 
 
 def load_resources(country: str) -> dict:
-    path = RESOURCE_DIR / f"{country.lower()}.json"
-    if not path.exists():
-        path = RESOURCE_DIR / "default.json"
-    with open(path, "r", encoding="utf-8") as f:
-        return json.load(f)
+    """Return the resource dict for ``country``; the result is shared and must not be mutated."""
+    return registry.get(country).data
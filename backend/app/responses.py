@@ -0,0 +1,57 @@
+"""Response helpers for the hot paths.
+
+``ORJSONResponse`` is the app's default response class. Bodies that never
+change (``GET /``, the fallback reply, per-country crisis replies and
+``/resources``) are encoded once and sent as bytes. The disclaimer header is
+added by a plain ASGI middleware, which does not wrap the request in the extra
+task and body streams ``BaseHTTPMiddleware`` sets up per request.
+"""
+from typing import Any
+
+import orjson
+from fastapi import Response
+from fastapi.responses import JSONResponse
+
+from app.safety import DISCLAIMER
+
+__all__ = ["DisclaimerMiddleware", "ORJSONResponse", "json_bytes", "json_response"]
+
+
+class ORJSONResponse(JSONResponse):
+    """``JSONResponse`` encoded with orjson.
+
+    Defined here rather than imported from ``fastapi.responses``, whose
+    ``ORJSONResponse`` is deprecated and warns on every response.
+    """
+
+    def render(self, content: Any) -> bytes:
+        return orjson.dumps(content)
+
+
+def json_bytes(content: Any) -> bytes:
+    return orjson.dumps(content)
+
+
+def json_response(body: bytes, status_code: int = 200) -> Response:
+    """Send an already encoded JSON ``body``."""
+    return Response(content=body, status_code=status_code, media_type="application/json")
+
+
+class DisclaimerMiddleware:
+    """Adds ``X-Disclaimer`` to every HTTP response."""
+
+    def __init__(self, app, disclaimer: str = DISCLAIMER):
+        self.app = app
+        self.header = (b"x-disclaimer", disclaimer.encode("latin-1"))
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        async def send_with_header(message):
+            if message["type"] == "http.response.start":
+                message["headers"] = list(message.get("headers", ())) + [self.header]
+            await send(message)
+
+        await self.app(scope, receive, send_with_header)
@@ -0,0 +1,245 @@
+"""Retention purge: delete data older than ``config.RETENTION_DELTA``.
+
+Expired messages, transcript turns, questionnaire responses and audit logs
+are deleted in chunks of ``chunk_size`` rows selected through the
+``created_at`` indexes, each chunk in its own short transaction, optionally
+pausing between chunks. On Postgres, monthly ``transcript_turns`` partitions
+that lie entirely before the cutoff are dropped first, so only the current
+month goes through row deletes. Sessions older than the cutoff with nothing
+newer left under them are removed last, together with their score aggregates,
+``session_cache`` entries and buffered transcripts.
+
+    python -m app.retention --dry-run
+    python -m app.retention --chunk-size 500 --pause 0.1
+    python -m app.retention --every 60
+
+``--every`` keeps purging at that interval in the foreground, the way to run it
+next to a multi-worker server. A single-process server (``uvicorn``) can run
+it periodically itself; see ``RETENTION_INTERVAL_MINUTES``.
+"""
+import argparse
+import logging
+import threading
+import time
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List, Optional
+
+from sqlalchemy import delete, exists, func, select
+from sqlalchemy.engine import Engine
+
+from app import config, scores, session_cache, transcripts
+from app.database import engine as default_engine
+from app.models import AuditLog, Message, QuestionnaireResponse, Session as DBSession, SessionScore, TranscriptTurn
+
+logger = logging.getLogger(__name__)
+
+CHILD_TABLES = (Message, TranscriptTurn, QuestionnaireResponse, AuditLog)
+
+
+@dataclass
+class PurgeStats:
+    cutoff: datetime
+    dry_run: bool = False
+    deleted: Dict[str, int] = field(default_factory=dict)
+    dropped_partitions: List[str] = field(default_factory=list)
+    chunks: int = 0
+    elapsed: float = 0.0
+    interrupted: bool = False
+
+    def add(self, table: str, rows: int) -> None:
+        self.deleted[table] = self.deleted.get(table, 0) + rows
+
+
+def _orphaned_sessions(cutoff: datetime):
+    """Sessions created before ``cutoff`` with no message, turn, answer or audit entry at or after it."""
+    newer = [
+        exists().where(model.session_id == DBSession.id, model.created_at >= cutoff) for model in CHILD_TABLES
+    ]
+    return select(DBSession.id).where(DBSession.created_at < cutoff, *[~clause for clause in newer])
+
+
+def _count(engine: Engine, statement) -> int:
+    with engine.connect() as conn:
+        return conn.execute(select(func.count()).select_from(statement.subquery())).scalar()
+
+
+class Purger:
+    def __init__(
+        self,
+        engine: Engine = default_engine,
+        chunk_size: int = config.RETENTION_CHUNK_SIZE,
+        pause: float = config.RETENTION_PAUSE,
+        progress: Optional[Callable[[str, int, PurgeStats], None]] = None,
+        cache: Optional[session_cache.SessionCache] = session_cache.cache,
+        buffer: Optional[transcripts.TranscriptBuffer] = transcripts.store.buffer,
+    ):
+        self.engine = engine
+        self.cache = cache
+        self.buffer = buffer
+        self.chunk_size = chunk_size
+        self.pause = pause
+        self.progress = progress
+        self._stop = threading.Event()
+
+    def run(
+        self, cutoff: Optional[datetime] = None, dry_run: bool = False, stop: Optional[threading.Event] = None
+    ) -> PurgeStats:
+        """Purge (or count) everything older than ``cutoff``.
+
+        Once ``stop`` is set the purge ends after the chunk in progress; the
+        rest is picked up by the next run.
+        """
+        stats = PurgeStats(cutoff=cutoff or datetime.utcnow() - config.RETENTION_DELTA, dry_run=dry_run)
+        self._stop = stop or threading.Event()
+        start = time.perf_counter()
+        if not dry_run:
+            self._drop_partitions(stats)
+        for model in CHILD_TABLES:
+            if self._stop.is_set():
+                break
+            expired = select(model.id).where(model.created_at < stats.cutoff)
+            if dry_run:
+                stats.add(model.__tablename__, _count(self.engine, expired))
+            else:
+                self._purge_children(model, stats)
+        if not self._stop.is_set():
+            orphaned = _orphaned_sessions(stats.cutoff)
+            if dry_run:
+                stats.add(DBSession.__tablename__, _count(self.engine, orphaned))
+            else:
+                self._purge_sessions(orphaned, stats)
+        stats.interrupted = self._stop.is_set()
+        stats.elapsed = time.perf_counter() - start
+        logger.info(
+            "retention %s before %s: %s in %.1fs%s",
+            "dry run" if dry_run else "purge",
+            stats.cutoff.isoformat(),
+            stats.deleted,
+            stats.elapsed,
+            " (stopped early)" if stats.interrupted else "",
+        )
+        return stats
+
+    def _chunk_done(self, table: str, rows: int, stats: PurgeStats) -> None:
+        stats.add(table, rows)
+        stats.chunks += 1
+        if self.progress is not None:
+            self.progress(table, rows, stats)
+        logger.debug("retention: deleted %d rows from %s (%s so far)", rows, table, stats.deleted[table])
+        if self.pause:
+            self._stop.wait(self.pause)
+
+    def _drop_partitions(self, stats: PurgeStats) -> None:
+        for name, rows in transcripts.drop_partitions_before(self.engine, stats.cutoff):
+            stats.dropped_partitions.append(name)
+            self._chunk_done(TranscriptTurn.__tablename__, rows, stats)
+        # Keeps the coming months' partitions in place for long-running deployments.
+        transcripts.ensure_partitions(self.engine)
+
+    def _purge_children(self, model, stats: PurgeStats) -> None:
+        table = model.__tablename__
+        stats.add(table, 0)
+        while not self._stop.is_set():
+            with self.engine.begin() as conn:
+                rows = conn.execute(
+                    select(model.id, model.session_id)
+                    .where(model.created_at < stats.cutoff)
+                    .order_by(model.created_at)
+                    .limit(self.chunk_size)
+                ).all()
+                if not rows:
+                    return
+                conn.execute(delete(model).where(model.id.in_([row.id for row in rows])))
+                if model is QuestionnaireResponse:
+                    scores.refresh_sessions(conn, {row.session_id for row in rows})
+            self._chunk_done(table, len(rows), stats)
+
+    def _purge_sessions(self, orphaned, stats: PurgeStats) -> None:
+        table = DBSession.__tablename__
+        stats.add(table, 0)
+        while not self._stop.is_set():
+            with self.engine.begin() as conn:
+                ids = conn.execute(orphaned.order_by(DBSession.created_at).limit(self.chunk_size)).scalars().all()
+                if not ids:
+                    return
+                conn.execute(delete(SessionScore).where(SessionScore.session_id.in_(ids)))
+                conn.execute(delete(DBSession).where(DBSession.id.in_(ids)))
+            if self.cache is not None:
+                self.cache.invalidate(ids)
+            if self.buffer is not None:
+                self.buffer.discard(ids)
+            self._chunk_done(table, len(ids), stats)
+
+
+class RetentionScheduler:
+    """Runs a purge every ``interval`` seconds on a daemon thread."""
+
+    def __init__(self, purger: Purger, interval: float):
+        self.purger = purger
+        self.interval = interval
+        self.last_stats: Optional[PurgeStats] = None
+        self._stopping = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        if self._thread is not None:
+            return
+        self._stopping.clear()
+        self._thread = threading.Thread(target=self._run, name="retention", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: Optional[float] = 10.0) -> None:
+        """Stop after the chunk being deleted, waiting at most ``timeout`` seconds for it."""
+        if self._thread is None:
+            return
+        self._stopping.set()
+        self._thread.join(timeout)
+        if self._thread.is_alive():
+            logger.warning("retention purge still running after %.0fs; not waiting for it", timeout)
+        self._thread = None
+
+    def _run(self) -> None:
+        while not self._stopping.wait(self.interval):
+            try:
+                self.last_stats = self.purger.run(stop=self._stopping)
+            except Exception:
+                logger.exception("retention purge failed")
+
+
+scheduler = RetentionScheduler(Purger(), interval=config.RETENTION_INTERVAL_MINUTES * 60)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--dry-run", action="store_true", help="count what would be deleted")
+    parser.add_argument("--days", type=int, default=config.RETENTION_DAYS, help="retention window in days")
+    parser.add_argument("--chunk-size", type=int, default=config.RETENTION_CHUNK_SIZE)
+    parser.add_argument("--pause", type=float, default=config.RETENTION_PAUSE, help="seconds to sleep between chunks")
+    parser.add_argument("--every", type=float, default=0, help="repeat every N minutes until interrupted")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    purger = Purger(
+        chunk_size=args.chunk_size,
+        pause=args.pause,
+        progress=lambda table, rows, stats: print(f"{table}: -{rows} (total {stats.deleted[table]})"),
+    )
+    try:
+        while True:
+            cutoff = datetime.utcnow() - timedelta(days=args.days)
+            stats = purger.run(cutoff=cutoff, dry_run=args.dry_run)
+            label = "would delete" if stats.dry_run else "deleted"
+            for table, rows in stats.deleted.items():
+                print(f"{label} {rows} {table}")
+            for name in stats.dropped_partitions:
+                print(f"dropped partition {name}")
+            if args.every <= 0:
+                break
+            time.sleep(args.every * 60)
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -1,11 +1,20 @@
+from dataclasses import dataclass
 from datetime import datetime
-from typing import Dict, List
+from itertools import product
+from typing import Dict, List, Mapping, Optional, Sequence, Tuple
 
-from app import config
-from app.questionnaires import bucket_for_scores
+from app import questionnaires
+from app.questionnaires import LEVELS, Questionnaire
 
+RECOMMENDATIONS = {
+    "low": "Based on what you shared, here are some self-help options and public resources that may be supportive.",
+    "moderate": "We suggest speaking with a licensed professional or trusted clinician. Here are referral options.",
+    "high": "We recommend connecting with professional support as soon as possible. If you feel unsafe, please use crisis resources.",
+}
+MINOR_NOTE = " As you are under 18, please involve a trusted guardian or appropriate youth service."
 
-def _evaluate_thresholds(score: int, thresholds: Dict[str, int]) -> Dict:
+
+def _evaluate_thresholds(score: int, thresholds: Mapping[str, int]) -> Dict:
     """Return a per-threshold comparison for transparency."""
 
     def sort_key(item):
@@ -28,48 +37,129 @@ def _evaluate_thresholds(score: int, thresholds: Dict[str, int]) -> Dict:
     }
 
 
-def route_user(phq9_score: int, gad7_score: int, age_band: str) -> dict:
-    bucket = bucket_for_scores(phq9_score, gad7_score)
-    recommendation = ""
-    if bucket == "low":
-        recommendation = (
-            "Based on what you shared, here are some self-help options and public resources that may be supportive."
-        )
-    elif bucket == "moderate":
-        recommendation = (
-            "We suggest speaking with a licensed professional or trusted clinician. Here are referral options."
-        )
-    else:
-        recommendation = (
-            "We recommend connecting with professional support as soon as possible. If you feel unsafe, please use crisis resources."
-        )
-
-    if age_band.lower() == "under 18":
-        recommendation += " As you are under 18, please involve a trusted guardian or appropriate youth service."
-        bucket = f"{bucket}_minor"
+def _is_minor(age_band: str) -> bool:
+    return age_band.lower() == "under 18"
 
-    phq9_explanation = _evaluate_thresholds(phq9_score, config.PHQ9_THRESHOLDS)
-    gad7_explanation = _evaluate_thresholds(gad7_score, config.GAD7_THRESHOLDS)
 
-    decision_basis = "phq9"
-    if bucket.startswith("high"):
-        decision_basis = "phq9" if phq9_explanation["highest_met"] == "high" else "gad7"
-    elif bucket.startswith("moderate"):
-        decision_basis = "phq9" if phq9_explanation["highest_met"] == "moderate" else "gad7"
+def _decide(
+    instruments: Sequence[Questionnaire], scores: Dict[str, int], minor: bool, explanations: Dict[str, Dict]
+) -> Dict:
+    ranks = {q.name: LEVELS.index(q.level_for(scores[q.name])) for q in instruments}
+    rank = max(ranks.values(), default=0)
+    bucket = LEVELS[rank]
+    recommendation = RECOMMENDATIONS[bucket]
+    if minor:
+        recommendation += MINOR_NOTE
+        bucket = f"{bucket}_minor"
 
+    # The first instrument (by priority) that reached the selected level explains the decision.
+    decision_basis = next((q.name for q in instruments if ranks[q.name] == rank), "")
+    decision = {"selected_bucket": bucket, "basis": decision_basis}
+    decision.update({f"{name}_bucket": explanation["highest_met"] for name, explanation in explanations.items()})
     return {
         "bucket": bucket,
         "recommendation": recommendation,
-        "scores": {"phq9": phq9_score, "gad7": gad7_score},
-        "timestamp": datetime.utcnow().isoformat(),
-        "explanation": {
-            "decision": {
-                "selected_bucket": bucket,
-                "basis": decision_basis,
-                "phq9_bucket": phq9_explanation["highest_met"],
-                "gad7_bucket": gad7_explanation["highest_met"],
-            },
-            "phq9": phq9_explanation,
-            "gad7": gad7_explanation,
-        },
+        "scores": scores,
+        "explanation": {"decision": decision, **explanations},
     }
+
+
+@dataclass(frozen=True)
+class RoutingDecision:
+    """One precomputed routing outcome. Nested dicts are shared between callers and must not be mutated."""
+
+    __slots__ = ("bucket", "recommendation", "scores", "explanation")
+
+    bucket: str
+    recommendation: str
+    scores: Dict[str, int]
+    explanation: Dict
+
+    def as_result(self, timestamp: str) -> dict:
+        return {
+            "bucket": self.bucket,
+            "recommendation": self.recommendation,
+            "scores": self.scores,
+            "timestamp": timestamp,
+            "explanation": self.explanation,
+        }
+
+
+def _routed(instruments: Sequence[Questionnaire], totals: Dict[str, int]) -> Tuple[Questionnaire, ...]:
+    """Core instruments plus every other instrument the session has answered, in priority order."""
+    return tuple(q for q in instruments if q.core or q.name in totals)
+
+
+class DecisionTable:
+    """Routing decisions for one generation of the questionnaire registry.
+
+    Threshold explanations are precomputed for every reachable score of every
+    instrument, and decisions for the whole grid of core instruments are built
+    up front; combinations involving optional instruments are built on first
+    use and kept.
+    """
+
+    __slots__ = ("generation", "instruments", "_explanations", "_decisions")
+
+    def __init__(self, instruments: Sequence[Questionnaire], generation: int = 0):
+        self.generation = generation
+        self.instruments = tuple(instruments)
+        self._explanations: Dict[str, Tuple[Dict, ...]] = {
+            q.name: tuple(_evaluate_thresholds(score, q.thresholds) for score in range(q.max_score + 1))
+            for q in self.instruments
+        }
+        self._decisions: Dict[Tuple, RoutingDecision] = {}
+        core = [q for q in self.instruments if q.core]
+        for grid in product(*(range(q.max_score + 1) for q in core)):
+            totals = {q.name: score for q, score in zip(core, grid)}
+            for minor in (False, True):
+                self.lookup(totals, minor)
+
+    def lookup(self, totals: Dict[str, int], minor: bool) -> Optional[RoutingDecision]:
+        """Decision for ``totals``, or None if a score is outside its instrument's range."""
+        instruments = _routed(self.instruments, totals)
+        scores = {q.name: totals.get(q.name, 0) for q in instruments}
+        key = (minor, tuple(scores.items()))
+        decision = self._decisions.get(key)
+        if decision is None:
+            explanations = {}
+            for name, score in scores.items():
+                per_score = self._explanations[name]
+                if not 0 <= score < len(per_score):
+                    return None
+                explanations[name] = per_score[score]
+            decision = RoutingDecision(**_decide(instruments, scores, minor, explanations))
+            self._decisions[key] = decision
+        return decision
+
+
+_table: Optional[DecisionTable] = None
+
+
+def get_table() -> DecisionTable:
+    """Return the decision table, rebuilding it when the questionnaire definitions changed."""
+    global _table
+    instruments = questionnaires.registry.all()
+    if _table is None or _table.generation != questionnaires.registry.generation:
+        _table = DecisionTable(instruments, questionnaires.registry.generation)
+    return _table
+
+
+def _route_uncached(totals: Dict[str, int], age_band: str) -> dict:
+    instruments = _routed(questionnaires.registry.all(), totals)
+    scores = {q.name: totals.get(q.name, 0) for q in instruments}
+    explanations = {q.name: _evaluate_thresholds(scores[q.name], q.thresholds) for q in instruments}
+    decision = RoutingDecision(**_decide(instruments, scores, _is_minor(age_band), explanations))
+    return decision.as_result(datetime.utcnow().isoformat())
+
+
+def route_scores(totals: Dict[str, int], age_band: str) -> dict:
+    """Route on per-questionnaire totals (as returned by ``scores.totals``)."""
+    decision = get_table().lookup(totals, _is_minor(age_band))
+    if decision is None:
+        return _route_uncached(totals, age_band)
+    return decision.as_result(datetime.utcnow().isoformat())
+
+
+def route_user(phq9_score: int, gad7_score: int, age_band: str) -> dict:
+    return route_scores({"phq9": phq9_score, "gad7": gad7_score}, age_band)
@@ -1,7 +1,11 @@
 import re
-from typing import List
+import unicodedata
+from typing import Dict, List, Optional, Sequence, Tuple
 
-CRISIS_PATTERNS = [
+# Literal phrases; matching is done on normalized text (see ``normalize``), so
+# entries only need one spelling per phrase regardless of case or diacritics.
+# A tuple: replace it (``set_crisis_patterns``), never edit it in place.
+CRISIS_PATTERNS = (
     r"suicide",
     r"kill myself",
     r"hurt myself",
@@ -10,19 +14,102 @@ CRISIS_PATTERNS = [
     r"intihar",
     r"ölmek istiyorum",
     r"kendimi öldürmek",
-]
+)
 
 DISCLAIMER = (
     "Not a medical professional. Not a diagnosis. If you are in immediate danger call local emergency services."
 )
 
+# str.lower() turns "İ" into "i" + combining dot and leaves "ı" alone, so the
+# Turkish letters are folded explicitly before the generic casefold.
+_TURKISH_FOLD = str.maketrans({"İ": "i", "I": "i", "ı": "i"})
+_COMBINING_MARKS = re.compile("[\u0300-\u036f]")
+
+
+def normalize(text: str) -> str:
+    """Case-fold, strip diacritics and collapse whitespace for phrase matching."""
+    folded = " ".join(text.translate(_TURKISH_FOLD).casefold().split())
+    if folded.isascii():
+        return folded
+    return _COMBINING_MARKS.sub("", unicodedata.normalize("NFKD", folded))
+
+
+def _trie_pattern(phrases: Sequence[str]) -> str:
+    """Build a prefix-factored alternation so the regex engine branches per character, not per phrase."""
+    trie: Dict[str, dict] = {}
+    for phrase in phrases:
+        node = trie
+        for char in phrase:
+            node = node.setdefault(char, {})
+        node[""] = {}
+
+    def render(node: Dict[str, dict]) -> str:
+        branches = [re.escape(char) + render(child) for char, child in sorted(node.items()) if char]
+        if not branches:
+            return ""
+        terminal = "" in node
+        if len(branches) == 1 and not terminal:
+            return branches[0]
+        group = "(?:" + "|".join(branches) + ")"
+        return group + "?" if terminal else group
+
+    return render(trie)
+
+
+class CrisisMatcher:
+    """Single-pass matcher over a fixed set of crisis phrases."""
+
+    __slots__ = ("patterns", "_regex", "_by_phrase")
+
+    def __init__(self, patterns: Sequence[str]):
+        self.patterns: Tuple[str, ...] = tuple(patterns)
+        self._by_phrase: Dict[str, str] = {}
+        for pattern in self.patterns:
+            phrase = normalize(pattern)
+            if phrase:
+                self._by_phrase.setdefault(phrase, pattern)
+        self._regex = re.compile(_trie_pattern(list(self._by_phrase))) if self._by_phrase else None
+
+    def match(self, text: str) -> Optional[str]:
+        """Return the first configured pattern found in ``text``, if any."""
+        if self._regex is None:
+            return None
+        found = self._regex.search(normalize(text))
+        return self._by_phrase[found.group(0)] if found else None
+
+    def find_all(self, text: str) -> List[str]:
+        if self._regex is None:
+            return []
+        return [self._by_phrase[m.group(0)] for m in self._regex.finditer(normalize(text))]
+
+
+_matcher: Optional[CrisisMatcher] = None
+# The CRISIS_PATTERNS object _matcher was built from; an identity check keeps get_matcher O(1).
+_matcher_source: Optional[Sequence[str]] = None
+
+
+def get_matcher() -> CrisisMatcher:
+    """Return the shared matcher, rebuilding it only when ``CRISIS_PATTERNS`` is replaced."""
+    global _matcher, _matcher_source
+    source = CRISIS_PATTERNS
+    if _matcher is None or source is not _matcher_source:
+        _matcher = CrisisMatcher(source)
+        _matcher_source = source
+    return _matcher
+
+
+def set_crisis_patterns(patterns: Sequence[str]) -> None:
+    global CRISIS_PATTERNS
+    CRISIS_PATTERNS = tuple(patterns)
+    get_matcher()
+
+
+def match_crisis(text: str) -> Optional[str]:
+    return get_matcher().match(text)
+
 
 def detect_crisis(text: str) -> bool:
-    lower = text.lower()
-    for pattern in CRISIS_PATTERNS:
-        if re.search(pattern, lower):
-            return True
-    return False
+    return match_crisis(text) is not None
 
 
 def crisis_response(country_resources: dict) -> str:
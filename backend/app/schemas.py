@@ -1,5 +1,5 @@
 from datetime import datetime
-from typing import List, Optional
+from typing import Dict, List, Optional, Tuple
 from pydantic import BaseModel, Field
 
 
@@ -38,7 +38,8 @@ class QuestionnaireAnswerRequest(BaseModel):
     session_id: str
     questionnaire: str
     question_index: int
-    score: int = Field(ge=0, le=3)
+    # Upper bound depends on the questionnaire's score_range and is checked by the endpoint.
+    score: int = Field(ge=0)
 
 
 class RouteResponse(BaseModel):
@@ -49,6 +50,32 @@ class RouteResponse(BaseModel):
     explanation: dict = Field(default_factory=dict)
 
 
+class QuestionnaireAnswerItem(BaseModel):
+    questionnaire: str
+    question_index: int
+    # Range is checked per item by the endpoint so every bad answer is reported at once.
+    score: int
+
+
+class QuestionnaireAnswersRequest(BaseModel):
+    session_id: str
+    answers: List[QuestionnaireAnswerItem]
+    include_route: bool = False
+
+
+class AnswerError(BaseModel):
+    item: int
+    questionnaire: str
+    question_index: int
+    error: str
+
+
+class QuestionnaireAnswersResponse(BaseModel):
+    status: str
+    recorded: int
+    route: Optional[RouteResponse] = None
+
+
 class ResourceEntry(BaseModel):
     emergency_number: str
     crisis_lines: List[str]
@@ -56,6 +83,19 @@ class ResourceEntry(BaseModel):
     private_options: List[str] = []
 
 
+class QuestionnaireDefinition(BaseModel):
+    """Contents of ``backend/questionnaires/<name>.json``."""
+
+    title: str
+    score_range: Tuple[int, int]
+    thresholds: Dict[str, int]
+    items: Dict[str, List[str]]
+    default_language: str = "en"
+    # Core instruments are always part of routing (scored 0 until answered); others only once answered.
+    core: bool = False
+    priority: int = 100
+
+
 class ExportResponse(BaseModel):
     user: dict
     sessions: List[dict]
@@ -0,0 +1,206 @@
+"""Per-session questionnaire aggregates.
+
+``session_scores`` keeps a running total and an answered-question bitmask per
+(session, questionnaire) so routing and "next question" never read the raw
+responses. ``record_answer`` is the only writer during normal operation;
+``rebuild`` recomputes everything from ``questionnaire_responses``:
+
+    python -m app.scores --check      # report drift, change nothing
+    python -m app.scores              # rewrite aggregates from raw responses
+"""
+import argparse
+import uuid
+from datetime import datetime
+from typing import Dict, Iterable, Optional, Tuple, Union
+
+from sqlalchemy import BigInteger, bindparam, delete, func, insert, literal, select, update
+from sqlalchemy.engine import Connection
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app.models import QuestionnaireResponse, SessionScore
+
+
+def first_unanswered(mask: int, question_count: int) -> Optional[int]:
+    """Index of the lowest clear bit below ``question_count``, or None when all are set."""
+    idx = (~mask & (mask + 1)).bit_length() - 1
+    return idx if idx < question_count else None
+
+
+def _apply(db: Session, session_id: uuid.UUID, questionnaire: str, delta: int, bit: int) -> None:
+    now = datetime.utcnow()
+    updated = db.execute(
+        update(SessionScore)
+        .where(SessionScore.session_id == session_id, SessionScore.questionnaire == questionnaire)
+        .values(
+            total=SessionScore.total + delta,
+            answered_mask=SessionScore.answered_mask.op("|")(bit),
+            updated_at=now,
+        )
+        .execution_options(synchronize_session=False)
+    )
+    if updated.rowcount == 0:
+        db.execute(
+            insert(SessionScore).values(
+                session_id=session_id, questionnaire=questionnaire, total=delta, answered_mask=bit, updated_at=now
+            )
+        )
+
+
+def record_answers(db: Session, session_id: uuid.UUID, answers: Iterable[Tuple[str, int, int]]) -> None:
+    """Store ``(questionnaire, question_index, score)`` answers and update the aggregates in one transaction.
+
+    An answer replaces an earlier answer to the same question (within the batch
+    the last one wins). A concurrent first answer to the same question surfaces
+    as an IntegrityError and the batch is retried once as re-answers.
+    """
+    latest: Dict[Tuple[str, int], int] = {(name, idx): score for name, idx, score in answers}
+    if not latest:
+        return
+    names = {name for name, _ in latest}
+    for attempt in range(2):
+        try:
+            rows = db.execute(
+                select(
+                    QuestionnaireResponse.id,
+                    QuestionnaireResponse.questionnaire,
+                    QuestionnaireResponse.question_index,
+                    QuestionnaireResponse.score,
+                )
+                .where(QuestionnaireResponse.session_id == session_id, QuestionnaireResponse.questionnaire.in_(names))
+                .with_for_update()
+            ).all()
+            previous = {(row.questionnaire, row.question_index): row for row in rows}
+            now = datetime.utcnow()
+            inserts, updates = [], []
+            deltas: Dict[str, Tuple[int, int]] = {}
+            for (name, idx), score in latest.items():
+                row = previous.get((name, idx))
+                if row is None:
+                    inserts.append(
+                        {"id": uuid.uuid4(), "session_id": session_id, "questionnaire": name, "question_index": idx, "score": score}
+                    )
+                    delta = score
+                else:
+                    updates.append({"_id": row.id, "_score": score})
+                    delta = score - row.score
+                total, mask = deltas.get(name, (0, 0))
+                deltas[name] = (total + delta, mask | 1 << idx)
+            if inserts:
+                db.execute(insert(QuestionnaireResponse), inserts)
+            if updates:
+                db.execute(
+                    update(QuestionnaireResponse.__table__)
+                    .where(QuestionnaireResponse.id == bindparam("_id"))
+                    .values(score=bindparam("_score"), created_at=now),
+                    updates,
+                )
+            for name, (delta, mask) in deltas.items():
+                _apply(db, session_id, name, delta, mask)
+            db.commit()
+            return
+        except IntegrityError:
+            db.rollback()
+            if attempt:
+                raise
+
+
+def record_answer(db: Session, session_id: uuid.UUID, questionnaire: str, question_index: int, score: int) -> None:
+    """Store one answer; see ``record_answers``."""
+    record_answers(db, session_id, [(questionnaire, question_index, score)])
+
+
+def totals(db: Session, session_id: uuid.UUID) -> Dict[str, int]:
+    """``{questionnaire: total}`` for a session already known to exist (see ``session_cache``)."""
+    rows = db.execute(
+        select(SessionScore.questionnaire, SessionScore.total).where(SessionScore.session_id == session_id)
+    )
+    return {name: total for name, total in rows}
+
+
+def answered_mask(db: Session, session_id: uuid.UUID, questionnaire: str) -> int:
+    """Answered bitmask for one questionnaire of a session already known to exist (0 if none yet)."""
+    mask = db.execute(
+        select(SessionScore.answered_mask).where(
+            SessionScore.session_id == session_id, SessionScore.questionnaire == questionnaire
+        )
+    ).scalar()
+    return mask or 0
+
+
+def _aggregated():
+    # Answers are unique per question, so summing the bits is the same as OR-ing them.
+    bit = literal(1, BigInteger).op("<<")(QuestionnaireResponse.question_index)
+    return select(
+        QuestionnaireResponse.session_id,
+        QuestionnaireResponse.questionnaire,
+        func.sum(QuestionnaireResponse.score),
+        func.sum(bit),
+    ).group_by(QuestionnaireResponse.session_id, QuestionnaireResponse.questionnaire)
+
+
+def refresh_sessions(db: Union[Session, Connection], session_ids: Iterable[uuid.UUID]) -> None:
+    """Recompute the aggregates of ``session_ids`` from their remaining responses (used after purges)."""
+    ids = list(session_ids)
+    db.execute(delete(SessionScore).where(SessionScore.session_id.in_(ids)))
+    remaining = _aggregated().where(QuestionnaireResponse.session_id.in_(ids)).add_columns(literal(datetime.utcnow()))
+    db.execute(
+        insert(SessionScore).from_select(
+            ["session_id", "questionnaire", "total", "answered_mask", "updated_at"], remaining
+        )
+    )
+
+
+def _expected(db: Session) -> Dict[Tuple[uuid.UUID, str], Tuple[int, int]]:
+    rows = db.execute(_aggregated())
+    return {(session_id, name): (int(total), int(mask)) for session_id, name, total, mask in rows}
+
+
+def rebuild(db: Session, check_only: bool = False) -> Dict[str, int]:
+    """Compare aggregates with raw responses and, unless ``check_only``, rewrite the ones that drifted."""
+    expected = _expected(db)
+    rows = db.execute(
+        select(SessionScore.session_id, SessionScore.questionnaire, SessionScore.total, SessionScore.answered_mask)
+    )
+    actual = {(session_id, name): (total, mask) for session_id, name, total, mask in rows}
+    mismatched = [key for key, value in expected.items() if actual.get(key) != value]
+    stale = [key for key in actual if key not in expected]
+    if not check_only:
+        now = datetime.utcnow()
+        for session_id, questionnaire in stale + mismatched:
+            db.execute(
+                delete(SessionScore).where(SessionScore.session_id == session_id, SessionScore.questionnaire == questionnaire)
+            )
+        if mismatched:
+            db.execute(
+                insert(SessionScore),
+                [
+                    {
+                        "session_id": session_id,
+                        "questionnaire": questionnaire,
+                        "total": expected[(session_id, questionnaire)][0],
+                        "answered_mask": expected[(session_id, questionnaire)][1],
+                        "updated_at": now,
+                    }
+                    for session_id, questionnaire in mismatched
+                ],
+            )
+        db.commit()
+    return {"checked": len(expected), "mismatched": len(mismatched), "stale": len(stale)}
+
+
+def main() -> None:
+    from app.database import SessionLocal
+
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--check", action="store_true", help="report drift without writing")
+    args = parser.parse_args()
+    with SessionLocal() as db:
+        result = rebuild(db, check_only=args.check)
+    print(" ".join(f"{key}={value}" for key, value in result.items()))
+    if args.check and (result["mismatched"] or result["stale"]):
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,180 @@
+"""Cache of immutable session metadata (country, language, age band).
+
+Nothing on a session row changes after ``/session/start``, so handlers confirm
+that a session exists, and read its routing inputs, from here instead of the
+database. Lookups go to a per-process LRU with a TTL first, then to an
+optional shared backend (``SESSION_CACHE_URL``, e.g. ``redis://...``) that all
+workers see, and only then to the ``sessions`` table. ``/session/start`` fills
+the cache; retention purges invalidate the sessions they delete.
+
+Unknown sessions are not cached, so a session created by another worker is
+found on the next lookup.
+
+Invalidation only reaches the shared backend and the local LRU of the process
+that ran the purge. Other workers, and every worker when retention runs from
+cron (``python -m app.retention``), keep serving a purged session from their
+LRU for up to ``SESSION_CACHE_TTL`` seconds; writes for it in that window fail
+their foreign key. Purged sessions have been idle for ``RETENTION_DAYS``, so
+this only matters for a client returning just as its session expires. Keep the
+TTL short (the default is 5 minutes) or set ``SESSION_CACHE_SIZE=0`` where that
+window is unacceptable.
+"""
+import json
+import threading
+import time
+import uuid
+from dataclasses import dataclass
+from typing import Callable, Dict, Iterable, Optional, Protocol, Tuple
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from app import config
+from app.cache import TTLCache
+from app.models import Session as DBSession
+
+KEY_PREFIX = "session:"
+
+
+@dataclass(frozen=True)
+class SessionInfo:
+    __slots__ = ("id", "country", "language", "age_band")
+
+    id: uuid.UUID
+    country: Optional[str]
+    language: Optional[str]
+    age_band: Optional[str]
+
+    def dumps(self) -> str:
+        return json.dumps([str(self.id), self.country, self.language, self.age_band])
+
+    @classmethod
+    def loads(cls, value: str) -> "SessionInfo":
+        session_id, country, language, age_band = json.loads(value)
+        return cls(uuid.UUID(session_id), country, language, age_band)
+
+
+class SharedBackend(Protocol):
+    """Key/value store shared between worker processes. Values are strings."""
+
+    def get(self, key: str) -> Optional[str]: ...
+
+    def set(self, key: str, value: str, ttl: float) -> None: ...
+
+    def delete(self, keys: Iterable[str]) -> None: ...
+
+
+class MemoryBackend:
+    """In-process ``SharedBackend``; stands in for Redis in tests and single-process runs."""
+
+    def __init__(self, clock: Callable[[], float] = time.monotonic):
+        self._clock = clock
+        self._data: Dict[str, Tuple[float, str]] = {}
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+            if item[0] <= self._clock():
+                del self._data[key]
+                return None
+            return item[1]
+
+    def set(self, key: str, value: str, ttl: float) -> None:
+        with self._lock:
+            self._data[key] = (self._clock() + ttl, value)
+
+    def delete(self, keys: Iterable[str]) -> None:
+        with self._lock:
+            for key in keys:
+                self._data.pop(key, None)
+
+
+class RedisBackend:
+    """``SharedBackend`` on Redis; needs the optional ``redis`` package."""
+
+    def __init__(self, url: str):
+        import redis
+
+        self._client = redis.Redis.from_url(url, decode_responses=True)
+
+    def get(self, key: str) -> Optional[str]:
+        return self._client.get(key)
+
+    def set(self, key: str, value: str, ttl: float) -> None:
+        self._client.set(key, value, px=int(ttl * 1000))
+
+    def delete(self, keys: Iterable[str]) -> None:
+        keys = list(keys)
+        if keys:
+            self._client.delete(*keys)
+
+
+def load(db: Session, session_id: uuid.UUID) -> Optional[SessionInfo]:
+    row = db.execute(
+        select(DBSession.country, DBSession.language, DBSession.age_band).where(DBSession.id == session_id)
+    ).first()
+    if row is None:
+        return None
+    return SessionInfo(session_id, row.country, row.language, row.age_band)
+
+
+class SessionCache:
+    def __init__(
+        self,
+        maxsize: int = config.SESSION_CACHE_SIZE,
+        ttl: float = config.SESSION_CACHE_TTL,
+        shared: Optional[SharedBackend] = None,
+    ):
+        self.ttl = ttl
+        self.local = TTLCache(maxsize, ttl)
+        self.shared = shared
+
+    def get_local(self, session_id: uuid.UUID) -> Optional[SessionInfo]:
+        """Metadata from this process's LRU only; never blocks, so safe on the event loop."""
+        return self.local.get(session_id)
+
+    def get(self, session_id: uuid.UUID) -> Optional[SessionInfo]:
+        """Cached metadata for ``session_id``, without touching the database."""
+        info = self.local.get(session_id)
+        if info is None and self.shared is not None:
+            value = self.shared.get(KEY_PREFIX + str(session_id))
+            if value is not None:
+                info = SessionInfo.loads(value)
+                self.local.set(session_id, info)
+        return info
+
+    def fetch(self, db: Session, session_id: uuid.UUID) -> Optional[SessionInfo]:
+        """Cached metadata, read from ``db`` (and cached) on a miss; None for an unknown session."""
+        info = self.get(session_id)
+        if info is None:
+            info = load(db, session_id)
+            if info is not None:
+                self.put(info)
+        return info
+
+    def put(self, info: SessionInfo) -> None:
+        self.local.set(info.id, info)
+        if self.shared is not None:
+            self.shared.set(KEY_PREFIX + str(info.id), info.dumps(), self.ttl)
+
+    def invalidate(self, session_ids: Iterable[uuid.UUID]) -> None:
+        ids = list(session_ids)
+        for session_id in ids:
+            self.local.pop(session_id)
+        if self.shared is not None:
+            self.shared.delete(KEY_PREFIX + str(session_id) for session_id in ids)
+
+    def clear(self) -> None:
+        self.local.clear()
+
+
+def _build_shared() -> Optional[SharedBackend]:
+    if config.SESSION_CACHE_URL:
+        return RedisBackend(config.SESSION_CACHE_URL)
+    return None
+
+
+cache = SessionCache(shared=_build_shared())
@@ -0,0 +1,318 @@
+"""Conversation transcripts: recent turns in memory, every turn appended to ``transcript_turns``.
+
+Each active session keeps its last ``TRANSCRIPT_TURNS`` turns in a ring buffer
+(a bounded ``deque`` of slotted ``Turn`` records); at most
+``TRANSCRIPT_SESSIONS`` sessions are held, least recently used first out. A
+session is buffered from ``/session/start``, or from its first context lookup
+after that (one indexed query), so building the prompt context for an active
+session does not touch the database.
+
+Turns are persisted append-only: non-crisis turns go through a write-behind
+``BatchWriter``; crisis messages are written in the request's transaction like
+the crisis audit row. Ids are time ordered, so inserts land at the right edge
+of the indexes.
+
+On Postgres ``transcript_turns`` is partitioned by month (``transcript_turns_YYYYMM``
+plus a DEFAULT partition); ``ensure_partitions`` creates the coming months and
+retention drops whole months with ``drop_partitions_before`` instead of
+deleting their rows. SQLite keeps a single table.
+
+The buffer is per process: with several workers, pin sessions to a worker
+(or accept that the context only holds turns that worker served).
+"""
+import logging
+import os
+import random
+import re
+import threading
+import time
+import uuid
+from collections import OrderedDict, deque
+from dataclasses import dataclass
+from datetime import date, datetime
+from typing import Callable, Deque, Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import insert, select, text
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.orm import Session
+
+from app import config
+from app.batching import BatchWriter
+from app.database import engine as default_engine
+from app.models import TranscriptTurn
+
+logger = logging.getLogger(__name__)
+
+USER = 0
+ASSISTANT = 1
+SENDERS = {USER: "user", ASSISTANT: "assistant"}
+
+TABLE = TranscriptTurn.__tablename__
+DEFAULT_PARTITION = f"{TABLE}_default"
+_MONTHLY = re.compile(rf"^{TABLE}_(\d{{4}})(\d{{2}})$")
+
+
+@dataclass(frozen=True)
+class Turn:
+    __slots__ = ("id", "session_id", "sender", "content", "created_at")
+
+    id: int
+    session_id: uuid.UUID
+    sender: int
+    content: str
+    created_at: datetime
+
+    def row(self) -> dict:
+        return {
+            "id": self.id,
+            "session_id": self.session_id,
+            "sender": self.sender,
+            "content": self.content,
+            "created_at": self.created_at,
+        }
+
+    def message(self) -> Dict[str, str]:
+        """The turn as a ``{"role", "content"}`` prompt message."""
+        return {"role": SENDERS[self.sender], "content": self.content}
+
+
+class TurnIds:
+    """63-bit time-ordered ids: milliseconds since ``EPOCH_MS`` (41 bits), a random node (10 bits), a counter (12 bits).
+
+    The node is drawn again in forked children so preloaded workers do not share it.
+    """
+
+    EPOCH_MS = 1_767_225_600_000  # 2026-01-01T00:00:00Z
+
+    def __init__(self, clock: Callable[[], float] = time.time):
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._last = 0
+        self._sequence = 0
+        self.reseed()
+
+    def reseed(self) -> None:
+        self.node = random.getrandbits(10)
+
+    def next(self) -> int:
+        with self._lock:
+            now = int(self._clock() * 1000) - self.EPOCH_MS
+            if now <= self._last:
+                # Same millisecond (or the clock stepped back): count on, borrowing the next millisecond on overflow.
+                self._sequence = (self._sequence + 1) & 0xFFF
+                if self._sequence == 0:
+                    self._last += 1
+                now = self._last
+            else:
+                self._sequence = 0
+            self._last = now
+            return (now << 22) | (self.node << 12) | self._sequence
+
+
+ids = TurnIds()
+os.register_at_fork(after_in_child=ids.reseed)
+
+
+class TranscriptBuffer:
+    """Last ``turns`` turns of up to ``max_sessions`` sessions. Thread-safe.
+
+    Only sessions whose buffer is known to be complete are held: ``open`` (new
+    session) and ``fill`` (loaded from the database) add them; ``append`` to a
+    session that is not held is ignored.
+    """
+
+    def __init__(self, turns: int = config.TRANSCRIPT_TURNS, max_sessions: int = config.TRANSCRIPT_SESSIONS):
+        self.turns = turns
+        self.max_sessions = max_sessions
+        self._sessions: "OrderedDict[uuid.UUID, Deque[Turn]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def recent(self, session_id: uuid.UUID) -> Optional[Tuple[Turn, ...]]:
+        """The buffered turns, oldest first, or None if the session is not held."""
+        with self._lock:
+            ring = self._sessions.get(session_id)
+            if ring is None:
+                return None
+            self._sessions.move_to_end(session_id)
+            return tuple(ring)
+
+    def open(self, session_id: uuid.UUID) -> None:
+        self.fill(session_id, ())
+
+    def fill(self, session_id: uuid.UUID, turns: Iterable[Turn]) -> None:
+        if self.max_sessions <= 0:
+            return
+        with self._lock:
+            self._sessions[session_id] = deque(turns, maxlen=self.turns)
+            self._sessions.move_to_end(session_id)
+            while len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+
+    def append(self, turn: Turn) -> None:
+        with self._lock:
+            ring = self._sessions.get(turn.session_id)
+            if ring is not None:
+                ring.append(turn)
+
+    def discard(self, session_ids: Iterable[uuid.UUID]) -> None:
+        with self._lock:
+            for session_id in session_ids:
+                self._sessions.pop(session_id, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._sessions.clear()
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+
+class TranscriptWriter(BatchWriter):
+    def __init__(
+        self,
+        engine=default_engine,
+        max_queue: int = config.TRANSCRIPT_QUEUE_SIZE,
+        batch_size: int = config.TRANSCRIPT_BATCH_SIZE,
+        flush_interval: float = config.TRANSCRIPT_FLUSH_INTERVAL,
+    ):
+        super().__init__(TranscriptTurn.__table__, "transcript", engine, max_queue, batch_size, flush_interval)
+
+
+def load(db: Session, session_id: uuid.UUID, limit: int) -> Tuple[Turn, ...]:
+    """The last ``limit`` stored turns of a session, oldest first."""
+    rows = db.execute(
+        select(TranscriptTurn.id, TranscriptTurn.sender, TranscriptTurn.content, TranscriptTurn.created_at)
+        .where(TranscriptTurn.session_id == session_id)
+        .order_by(TranscriptTurn.id.desc())
+        .limit(limit)
+    ).all()
+    return tuple(Turn(row.id, session_id, row.sender, row.content, row.created_at) for row in reversed(rows))
+
+
+class Transcripts:
+    def __init__(self, buffer: TranscriptBuffer, writer: TranscriptWriter):
+        self.buffer = buffer
+        self.writer = writer
+
+    def open(self, session_id: uuid.UUID) -> None:
+        """Start buffering a session that has no turns yet."""
+        self.buffer.open(session_id)
+
+    def recent(self, session_id: uuid.UUID) -> Optional[Tuple[Turn, ...]]:
+        return self.buffer.recent(session_id)
+
+    def context(self, db: Session, session_id: uuid.UUID) -> Tuple[Turn, ...]:
+        """Recent turns from the buffer, read from ``db`` (and buffered) if the session is not held."""
+        turns = self.buffer.recent(session_id)
+        if turns is None:
+            turns = load(db, session_id, self.buffer.turns)
+            self.buffer.fill(session_id, turns)
+        return turns
+
+    def add(self, session_id: uuid.UUID, sender: int, content: str, db: Optional[Session] = None) -> Turn:
+        """Append a turn. With ``db`` the row is written in that session's transaction, otherwise write-behind."""
+        turn = self._append(session_id, sender, content)
+        if db is not None:
+            db.execute(insert(TranscriptTurn), [turn.row()])
+        else:
+            self.writer.put(turn.row())
+        return turn
+
+    async def aadd(self, session_id: uuid.UUID, sender: int, content: str) -> Turn:
+        """``add`` (write-behind) for callers on the event loop."""
+        turn = self._append(session_id, sender, content)
+        await self.writer.aput(turn.row())
+        return turn
+
+    def _append(self, session_id: uuid.UUID, sender: int, content: str) -> Turn:
+        turn = Turn(ids.next(), session_id, sender, content, datetime.utcnow())
+        self.buffer.append(turn)
+        return turn
+
+
+store = Transcripts(TranscriptBuffer(), TranscriptWriter())
+
+
+def _month_start(day: date, offset: int = 0) -> date:
+    months = day.year * 12 + day.month - 1 + offset
+    return date(months // 12, months % 12 + 1, 1)
+
+
+def is_partitioned(conn: Connection) -> bool:
+    if conn.dialect.name != "postgresql":
+        return False
+    return conn.execute(
+        text("SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass(:table)"), {"table": TABLE}
+    ).first() is not None
+
+
+def monthly_partitions(conn: Connection) -> List[Tuple[str, date, date]]:
+    """``(name, first day, first day of the next month)`` of each monthly partition, oldest first."""
+    names = conn.execute(
+        text(
+            "SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+            "WHERE i.inhparent = to_regclass(:table)"
+        ),
+        {"table": TABLE},
+    ).scalars()
+    partitions = []
+    for name in names:
+        match = _MONTHLY.match(name)
+        if match:
+            start = date(int(match.group(1)), int(match.group(2)), 1)
+            partitions.append((name, start, _month_start(start, 1)))
+    return sorted(partitions, key=lambda partition: partition[1])
+
+
+def ensure_partitions(
+    engine: Engine = default_engine, today: Optional[date] = None, ahead: int = config.TRANSCRIPT_PARTITIONS_AHEAD
+) -> List[str]:
+    """Create the DEFAULT partition and monthly ones from this month to ``ahead`` months on; returns the names created.
+
+    A no-op unless ``transcript_turns`` is a partitioned Postgres table.
+    """
+    with engine.connect() as conn:
+        if not is_partitioned(conn):
+            return []
+        existing = {name for name, _, _ in monthly_partitions(conn)}
+    first = _month_start(today or datetime.utcnow().date())
+    statements = [(DEFAULT_PARTITION, f"CREATE TABLE IF NOT EXISTS {DEFAULT_PARTITION} PARTITION OF {TABLE} DEFAULT")]
+    for offset in range(ahead + 1):
+        start, end = _month_start(first, offset), _month_start(first, offset + 1)
+        name = f"{TABLE}_{start:%Y%m}"
+        if name not in existing:
+            statements.append(
+                (name, f"CREATE TABLE IF NOT EXISTS {name} PARTITION OF {TABLE} FOR VALUES FROM ('{start}') TO ('{end}')")
+            )
+    created = []
+    for name, statement in statements:
+        try:
+            with engine.begin() as conn:
+                conn.execute(text(statement))
+        except DBAPIError:
+            # Typically rows for that month already sit in the DEFAULT partition; they stay readable there.
+            logger.warning("could not create partition %s", name, exc_info=True)
+        else:
+            created.append(name)
+    return created
+
+
+def drop_partitions_before(engine: Engine, cutoff: datetime) -> List[Tuple[str, int]]:
+    """Drop monthly partitions that end at or before ``cutoff``; returns ``(name, rows)`` for each.
+
+    Rows of the partially expired month, and any in the DEFAULT partition, are
+    left for the chunked delete.
+    """
+    with engine.connect() as conn:
+        if not is_partitioned(conn):
+            return []
+        partitions = monthly_partitions(conn)
+    expired = [name for name, _, end in partitions if datetime.combine(end, datetime.min.time()) <= cutoff]
+    dropped = []
+    for name in expired:
+        with engine.begin() as conn:
+            rows = conn.execute(text(f"SELECT count(*) FROM {name}")).scalar()
+            conn.execute(text(f"DROP TABLE {name}"))
+        dropped.append((name, rows))
+    return dropped
@@ -0,0 +1,45 @@
+"""Production server profile.
+
+Run from ``backend/`` after ``python -m app.migrate``::
+
+    gunicorn -c gunicorn.conf.py app.main:app
+
+The app is imported and its read-only state (resources, questionnaires, crisis
+matcher, routing table) built once in the master; workers are forked from it
+and share those pages copy-on-write. Each worker opens its own database
+connections (``app.database`` resets the pools after fork) and runs the
+lifespan itself, so the audit flusher and LLM client are per process.
+
+Retention must not run in the workers (N schedulers would purge the same rows
+at once): schedule ``python -m app.retention`` from cron, or run one
+``python -m app.retention --every MINUTES`` process next to the server.
+"""
+import gc
+import multiprocessing
+import os
+
+# Workers must not run DDL; the schema comes from the one-shot migrate step.
+os.environ.setdefault("CREATE_SCHEMA", "false")
+# Nor purge: RETENTION_INTERVAL_MINUTES would start one retention scheduler per worker.
+if float(os.getenv("RETENTION_INTERVAL_MINUTES", "0")) > 0:
+    raise RuntimeError(
+        "RETENTION_INTERVAL_MINUTES is not supported under gunicorn; run `python -m app.retention` "
+        "from cron or as one `python -m app.retention --every MINUTES` process"
+    )
+
+bind = os.getenv("BIND", "0.0.0.0:8000")
+workers = int(os.getenv("WEB_CONCURRENCY", str(multiprocessing.cpu_count())))
+worker_class = "uvicorn.workers.UvicornWorker"
+preload_app = True
+timeout = int(os.getenv("WORKER_TIMEOUT", "30"))
+graceful_timeout = int(os.getenv("GRACEFUL_TIMEOUT", "30"))
+keepalive = 5
+
+
+def when_ready(server):
+    from app import main
+
+    main.preload()
+    # Move everything built so far out of the collector's reach, so a worker's
+    # first GC pass does not touch (and copy) the shared pages.
+    gc.freeze()
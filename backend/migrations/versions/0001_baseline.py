@@ -0,0 +1,67 @@
+"""Baseline schema as created by Base.metadata.create_all before migrations existed.
+
+Deployments created that way should run `alembic stamp 0001` once, then
+`alembic upgrade head`.
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects.postgresql import UUID
+
+revision = "0001"
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "users",
+        sa.Column("id", UUID(as_uuid=True), primary_key=True),
+        sa.Column("email", sa.String(), unique=True, nullable=True),
+        sa.Column("created_at", sa.DateTime()),
+        sa.Column("consent", sa.Boolean()),
+    )
+    op.create_table(
+        "sessions",
+        sa.Column("id", UUID(as_uuid=True), primary_key=True),
+        sa.Column("user_id", UUID(as_uuid=True), sa.ForeignKey("users.id"), nullable=True),
+        sa.Column("language", sa.String()),
+        sa.Column("country", sa.String()),
+        sa.Column("age_band", sa.String()),
+        sa.Column("created_at", sa.DateTime()),
+        sa.Column("consent", sa.Boolean()),
+    )
+    op.create_table(
+        "messages",
+        sa.Column("id", UUID(as_uuid=True), primary_key=True),
+        sa.Column("session_id", UUID(as_uuid=True), sa.ForeignKey("sessions.id")),
+        sa.Column("sender", sa.String()),
+        sa.Column("content", sa.String()),
+        sa.Column("created_at", sa.DateTime()),
+    )
+    op.create_table(
+        "questionnaire_responses",
+        sa.Column("id", UUID(as_uuid=True), primary_key=True),
+        sa.Column("session_id", UUID(as_uuid=True), sa.ForeignKey("sessions.id")),
+        sa.Column("questionnaire", sa.String()),
+        sa.Column("question_index", sa.Integer()),
+        sa.Column("score", sa.Integer()),
+        sa.Column("created_at", sa.DateTime()),
+    )
+    op.create_table(
+        "audit_logs",
+        sa.Column("id", UUID(as_uuid=True), primary_key=True),
+        sa.Column("session_id", UUID(as_uuid=True), sa.ForeignKey("sessions.id")),
+        sa.Column("event", sa.String()),
+        sa.Column("detail", sa.JSON()),
+        sa.Column("created_at", sa.DateTime()),
+    )
+
+
+def downgrade() -> None:
+    for table in ("audit_logs", "questionnaire_responses", "messages", "sessions", "users"):
+        op.drop_table(table)
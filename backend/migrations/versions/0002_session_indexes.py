@@ -0,0 +1,53 @@
+"""Index foreign keys and created_at; reject duplicate questionnaire answers.
+
+Existing duplicate answers are collapsed to the most recent one before the
+unique index is built. On Postgres the indexes are built CONCURRENTLY, outside
+a transaction, so writes are not blocked while they build.
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-18
+"""
+from alembic import op
+
+revision = "0002"
+down_revision = "0001"
+branch_labels = None
+depends_on = None
+
+INDEXES = [
+    ("ix_sessions_user_id", "sessions", ["user_id"], False),
+    ("ix_sessions_created_at", "sessions", ["created_at"], False),
+    ("ix_messages_session_id", "messages", ["session_id"], False),
+    ("ix_messages_created_at", "messages", ["created_at"], False),
+    ("uq_questionnaire_responses_answer", "questionnaire_responses", ["session_id", "questionnaire", "question_index"], True),
+    ("ix_questionnaire_responses_created_at", "questionnaire_responses", ["created_at"], False),
+    ("ix_audit_logs_session_id", "audit_logs", ["session_id"], False),
+    ("ix_audit_logs_created_at", "audit_logs", ["created_at"], False),
+]
+
+
+def upgrade() -> None:
+    op.execute("UPDATE questionnaire_responses SET questionnaire = lower(questionnaire)")
+    op.execute(
+        """
+        DELETE FROM questionnaire_responses WHERE id IN (
+            SELECT id FROM (
+                SELECT id, ROW_NUMBER() OVER (
+                    PARTITION BY session_id, questionnaire, question_index
+                    ORDER BY created_at DESC, id DESC
+                ) AS position
+                FROM questionnaire_responses
+            ) ranked WHERE position > 1
+        )
+        """
+    )
+    with op.get_context().autocommit_block():
+        for name, table, columns, unique in INDEXES:
+            op.create_index(name, table, columns, unique=unique, postgresql_concurrently=True)
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        for name, table, _, _ in reversed(INDEXES):
+            op.drop_index(name, table_name=table, postgresql_concurrently=True)
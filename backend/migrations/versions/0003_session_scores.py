@@ -0,0 +1,38 @@
+"""Per-session questionnaire aggregates, backfilled from existing answers.
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects.postgresql import UUID
+
+revision = "0003"
+down_revision = "0002"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "session_scores",
+        sa.Column("session_id", UUID(as_uuid=True), sa.ForeignKey("sessions.id"), primary_key=True),
+        sa.Column("questionnaire", sa.String(), primary_key=True),
+        sa.Column("total", sa.Integer(), nullable=False),
+        sa.Column("answered_mask", sa.BigInteger(), nullable=False),
+        sa.Column("updated_at", sa.DateTime()),
+    )
+    # question_index is unique per (session, questionnaire), so SUM of bits equals OR.
+    op.execute(
+        """
+        INSERT INTO session_scores (session_id, questionnaire, total, answered_mask, updated_at)
+        SELECT session_id, questionnaire, SUM(score), SUM(CAST(1 AS BIGINT) << question_index), MAX(created_at)
+        FROM questionnaire_responses
+        GROUP BY session_id, questionnaire
+        """
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("session_scores")
@@ -0,0 +1,35 @@
+"""Append-only transcript turns, partitioned by month on Postgres.
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects.postgresql import UUID
+
+revision = "0004"
+down_revision = "0003"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "transcript_turns",
+        sa.Column("id", sa.BigInteger(), primary_key=True, autoincrement=False),
+        sa.Column("created_at", sa.DateTime(), primary_key=True),
+        sa.Column("session_id", UUID(as_uuid=True), sa.ForeignKey("sessions.id"), nullable=False),
+        sa.Column("sender", sa.SmallInteger(), nullable=False),
+        sa.Column("content", sa.Text(), nullable=False),
+        postgresql_partition_by="RANGE (created_at)",
+    )
+    op.create_index("ix_transcript_turns_created_at", "transcript_turns", ["created_at"])
+    op.create_index("ix_transcript_turns_session", "transcript_turns", ["session_id", "id"])
+    if op.get_bind().dialect.name == "postgresql":
+        # Catches rows outside the monthly partitions that app.transcripts.ensure_partitions creates.
+        op.execute("CREATE TABLE transcript_turns_default PARTITION OF transcript_turns DEFAULT")
+
+
+def downgrade() -> None:
+    op.drop_table("transcript_turns")
@@ -0,0 +1,153 @@
+"""Cold start: import profile of ``app.main`` and time from process start to the first served request.
+
+``python -X importtime -c "import app.main"`` is run in a fresh interpreter and
+the slowest imports are listed by cumulative time. Then ``uvicorn`` is started
+``--runs`` times against a new SQLite file, and each run reports the time from
+spawning the process until ``GET /`` answers, and the latency of the first
+``/resources`` and ``/questionnaire/next`` requests (cheap when the lifespan
+has already warmed the registries). ``eager`` repeats the runs with
+``FORMERLY_EAGER`` imported up front, which is what startup paid before those
+modules were moved to the paths that use them.
+
+Run from ``backend/``: ``python -m tests.benchmarks.cold_start [--runs 5 --top 15]``
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, Iterable, Optional, Sequence, Tuple
+
+import httpx
+
+from tests.benchmarks.llm_client import _free_port
+
+BACKEND_DIR = Path(__file__).resolve().parents[2]
+
+# Modules importing app.main must not load: rarely used paths import them when first needed.
+DEFERRED = (
+    "app.export",
+    "app.retention",
+    "app.rescore",
+    "app.migrate",
+    "alembic",
+    "httpx",
+    "numpy",
+    "redis",
+    "sqlalchemy.ext.asyncio",
+)
+# Imported by app.main itself until they were deferred.
+FORMERLY_EAGER = ("app.export", "app.retention")
+
+_LAUNCH = """
+import sys
+for name in sys.argv[2:]:
+    __import__(name)
+import uvicorn
+uvicorn.run("app.main:app", host="127.0.0.1", port=int(sys.argv[1]), log_level="warning")
+"""
+
+
+def _env(database_url: str, extra: Optional[Dict[str, str]] = None) -> Dict[str, str]:
+    env = dict(os.environ, DATABASE_URL=database_url, ASYNC_DB="false", MOCK_LLM="true", PYTHONPATH=str(BACKEND_DIR))
+    for name in ("SESSION_CACHE_URL", "RATE_LIMIT_URL"):
+        env.pop(name, None)
+    env.update(extra or {})
+    return env
+
+
+def import_times(module: str = "app.main", env: Optional[Dict[str, str]] = None) -> Dict[str, Tuple[int, int]]:
+    """Module name -> (self, cumulative) import time in microseconds, from a fresh interpreter."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=BACKEND_DIR,
+        env=env if env is not None else _env("sqlite://"),
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    times = {}
+    for line in result.stderr.splitlines():
+        # "import time:       123 |        456 |   package.module"
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        own, cumulative, name = line[len("import time:"):].split("|")
+        if own.strip().isdigit():
+            times[name.strip()] = (int(own), int(cumulative))
+    return times
+
+
+def first_requests(database_url: str, preimport: Iterable[str] = (), timeout: float = 60.0) -> Dict[str, float]:
+    """Seconds from spawning uvicorn to the first answered ``GET /``, then the first request of two warm paths."""
+    port = _free_port()
+    start = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, "-c", _LAUNCH, str(port), *preimport], cwd=BACKEND_DIR, env=_env(database_url)
+    )
+    try:
+        base = f"http://127.0.0.1:{port}"
+        deadline = time.monotonic() + timeout
+        while True:
+            if server.poll() is not None:
+                raise RuntimeError("uvicorn exited during startup")
+            try:
+                httpx.get(base + "/", timeout=0.5).raise_for_status()
+                break
+            except httpx.HTTPError:
+                if time.monotonic() > deadline:
+                    raise TimeoutError(f"no response after {timeout}s")
+                time.sleep(0.005)
+        timings = {"first_response": time.perf_counter() - start}
+        with httpx.Client(base_url=base) as client:
+            session_id = client.post("/session/start", json={}).json()["session_id"]
+            for label, path, params in (
+                ("resources", "/resources", {"country": "tr"}),
+                ("questionnaire", "/questionnaire/next", {"session_id": session_id, "questionnaire": "phq9"}),
+            ):
+                t = time.perf_counter()
+                client.get(path, params=params).raise_for_status()
+                timings[label] = time.perf_counter() - t
+        return timings
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def _runs(runs: int, preimport: Sequence[str]) -> Dict[str, float]:
+    samples: Dict[str, list] = {}
+    for _ in range(runs):
+        database_url = "sqlite:///" + os.path.join(tempfile.mkdtemp(), "cold_start.db")
+        for label, seconds in first_requests(database_url, preimport).items():
+            samples.setdefault(label, []).append(seconds)
+    return {label: statistics.median(values) for label, values in samples.items()}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=15, help="slowest imports to list")
+    args = parser.parse_args()
+
+    times = import_times()
+    print(f"import app.main: {times['app.main'][1] / 1000:.1f} ms")
+    print(f"{'cumulative ms':>13}  {'self ms':>7}  module")
+    for name, (own, cumulative) in sorted(times.items(), key=lambda item: -item[1][1])[: args.top]:
+        print(f"{cumulative / 1000:>13.1f}  {own / 1000:>7.1f}  {name}")
+    loaded = [name for name in DEFERRED if name in times]
+    print(f"deferred modules loaded by the import: {', '.join(loaded) or 'none'}")
+
+    header = f"{'mode':>8}  {'start -> first response ms':>26}  {'first /resources ms':>19}  {'first /questionnaire ms':>23}"
+    print("\n" + header)
+    for mode, preimport in (("deferred", ()), ("eager", FORMERLY_EAGER)):
+        row = _runs(args.runs, preimport)
+        print(
+            f"{mode:>8}  {row['first_response'] * 1000:>26.1f}  {row['resources'] * 1000:>19.2f}"
+            f"  {row['questionnaire'] * 1000:>23.2f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
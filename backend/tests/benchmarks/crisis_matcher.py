@@ -0,0 +1,81 @@
+"""Per-message crisis detection latency as the phrase list grows.
+
+Each list is installed with ``safety.set_crisis_patterns`` and timed through
+``safety.match_crisis``, the path ``/message`` takes, so the per-call matcher
+lookup is included. ``growth`` is the per-message time relative to the smallest
+list; the single compiled matcher should stay close to flat while per-pattern
+search grows linearly.
+
+Run from ``backend/``: ``python -m tests.benchmarks.crisis_matcher``
+"""
+import random
+import re
+import string
+import time
+from typing import Callable, List, Optional
+
+from app import safety
+
+MESSAGE = (
+    "Bu hafta işte çok yoğundum ve uykularım bozuldu. I have been feeling tired and a bit low, "
+    "but talking to friends helps. Yarın doktora gitmeyi düşünüyorum."
+)
+SIZES = [8, 100, 500, 1000, 2000]
+
+
+def synthetic_patterns(count: int, seed: int = 7) -> List[str]:
+    rng = random.Random(seed)
+    words = ["".join(rng.choices(string.ascii_lowercase + "çğıöşü", k=rng.randint(3, 9))) for _ in range(400)]
+    patterns = list(safety.CRISIS_PATTERNS)
+    while len(patterns) < count:
+        patterns.append(" ".join(rng.sample(words, rng.randint(1, 3))))
+    return patterns[:count]
+
+
+def per_message_seconds(
+    match: Callable[[str], Optional[str]], message: str = MESSAGE, rounds: int = 5, loops: int = 2000
+) -> float:
+    """Best-of-``rounds`` average time for one ``match`` call."""
+    best = float("inf")
+    for _ in range(rounds):
+        start = time.perf_counter()
+        for _ in range(loops):
+            match(message)
+        best = min(best, (time.perf_counter() - start) / loops)
+    return best
+
+
+class _PerPatternSearch:
+    """The previous implementation: one ``re.search`` per pattern on lowercased text."""
+
+    def __init__(self, patterns: List[str]):
+        self.patterns = patterns
+
+    def match(self, text: str):
+        lower = text.lower()
+        for pattern in self.patterns:
+            if re.search(pattern, lower):
+                return pattern
+        return None
+
+
+def main() -> None:
+    print(f"{'patterns':>8}  {'build ms':>9}  {'per msg us':>10}  {'growth':>6}  {'per-pattern us':>14}")
+    smallest = None
+    original = safety.CRISIS_PATTERNS
+    try:
+        for size in SIZES:
+            patterns = synthetic_patterns(size)
+            start = time.perf_counter()
+            safety.set_crisis_patterns(patterns)
+            build_ms = (time.perf_counter() - start) * 1000
+            compiled_us = per_message_seconds(safety.match_crisis) * 1e6
+            naive_us = per_message_seconds(_PerPatternSearch(patterns).match, loops=200) * 1e6
+            smallest = smallest or compiled_us
+            print(f"{size:>8}  {build_ms:>9.2f}  {compiled_us:>10.2f}  {compiled_us / smallest:>5.1f}x  {naive_us:>14.2f}")
+    finally:
+        safety.set_crisis_patterns(original)
+
+
+if __name__ == "__main__":
+    main()
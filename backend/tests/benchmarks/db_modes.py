@@ -0,0 +1,88 @@
+"""Requests/second and p99 latency for the sync vs async DB modes.
+
+Each mode runs in its own interpreter (``ASYNC_DB`` is read at import time)
+against the same SQLite file, driving the app in-process over ASGI.
+
+Run from ``backend/``: ``python -m tests.benchmarks.db_modes [--requests 2000 --concurrency 200]``
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from typing import List
+
+
+def percentile(samples: List[float], pct: float) -> float:
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+async def drive(requests: int, concurrency: int) -> dict:
+    import httpx
+
+    from app.database import Base, engine
+    from app.main import app
+
+    # ASGITransport does not run the lifespan, so the schema is created here.
+    Base.metadata.create_all(bind=engine)
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        session_ids = []
+        for _ in range(concurrency):
+            response = await client.post("/session/start", json={"country": "TR", "language": "TR"})
+            session_ids.append(response.json()["session_id"])
+
+        latencies: List[float] = []
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def one(i: int) -> None:
+            async with semaphore:
+                start = time.perf_counter()
+                response = await client.post(
+                    "/message", json={"session_id": session_ids[i % concurrency], "message": f"Bugün yorgunum {i}"}
+                )
+                latencies.append(time.perf_counter() - start)
+                response.raise_for_status()
+
+        start = time.perf_counter()
+        await asyncio.gather(*(one(i) for i in range(requests)))
+        elapsed = time.perf_counter() - start
+    return {
+        "rps": requests / elapsed,
+        "p50_ms": statistics.median(latencies) * 1000,
+        "p99_ms": percentile(latencies, 99) * 1000,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=200)
+    parser.add_argument("--mode", choices=["sync", "async"])
+    args = parser.parse_args()
+
+    if args.mode:
+        print(json.dumps(asyncio.run(drive(args.requests, args.concurrency))))
+        return
+
+    database = os.path.join(tempfile.mkdtemp(), "bench.db")
+    print(f"{'mode':>6}  {'req/s':>8}  {'p50 ms':>8}  {'p99 ms':>8}")
+    for mode in ("sync", "async"):
+        env = dict(os.environ, DATABASE_URL=f"sqlite:///{database}", ASYNC_DB=str(mode == "async").lower())
+        output = subprocess.run(
+            [sys.executable, "-m", "tests.benchmarks.db_modes", "--mode", mode,
+             "--requests", str(args.requests), "--concurrency", str(args.concurrency)],
+            env=env, check=True, capture_output=True, text=True,
+        ).stdout
+        result = json.loads(output.strip().splitlines()[-1])
+        print(f"{mode:>6}  {result['rps']:>8.0f}  {result['p50_ms']:>8.1f}  {result['p99_ms']:>8.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,44 @@
+"""Stand-in LLM provider for ``HTTPLLM``: answers every prompt after a fixed delay.
+
+Run from ``backend/``: ``python -m tests.benchmarks.fake_llm [--port 8100 --latency 0.2]``
+then start the API with ``MOCK_LLM=false LLM_URL=http://127.0.0.1:8100/generate``.
+"""
+import argparse
+import asyncio
+from typing import Dict, List
+
+from fastapi import FastAPI
+from pydantic import BaseModel
+
+from app.llm import FALLBACK_RESULT
+
+
+class GenerateRequest(BaseModel):
+    prompt: str
+    context: List[Dict[str, str]] = []
+
+
+def create_app(latency: float = 0.2) -> FastAPI:
+    fake = FastAPI(title="fake LLM")
+
+    @fake.post("/generate")
+    async def generate(payload: GenerateRequest):
+        await asyncio.sleep(latency)
+        return {**FALLBACK_RESULT, "user_message": f"Summary of {len(payload.prompt)} characters you shared."}
+
+    return fake
+
+
+def main() -> None:
+    import uvicorn
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8100)
+    parser.add_argument("--latency", type=float, default=0.2, help="seconds to wait before answering")
+    args = parser.parse_args()
+    uvicorn.run(create_app(args.latency), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
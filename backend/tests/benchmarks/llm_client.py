@@ -0,0 +1,115 @@
+"""Throughput of LLM calls against the fake provider: per-call blocking client vs the pooled async service.
+
+``blocking`` reproduces the previous pattern (a new synchronous client per
+turn, run on Starlette's worker threadpool); ``pooled`` is ``LLMService`` over
+one keep-alive ``HTTPLLM``; ``pooled+cache`` additionally caches normalized
+prompts while half of the traffic repeats a handful of boilerplate turns.
+
+Run from ``backend/``: ``python -m tests.benchmarks.llm_client [--requests 1000 --concurrency 200 --latency 0.2]``
+"""
+import argparse
+import asyncio
+import random
+import socket
+import statistics
+import subprocess
+import sys
+import time
+from typing import Awaitable, Callable, List
+
+from app.cache import TTLCache
+from app.llm import HTTPLLM, LLMService
+from tests.benchmarks.db_modes import percentile
+
+BOILERPLATE = ["Merhaba", "merhaba ", "Hello", "hello!", "Teşekkürler", "thanks", "OK", "tamam"]
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _wait_for(port: int, timeout: float = 10.0) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=0.2).close()
+            return
+        except OSError:
+            time.sleep(0.05)
+    raise RuntimeError("fake LLM server did not start")
+
+
+def _prompts(requests: int, repeated: float) -> List[str]:
+    rng = random.Random(7)
+    return [rng.choice(BOILERPLATE) if rng.random() < repeated else f"Bugün kendimi yorgun hissediyorum {i}" for i in range(requests)]
+
+
+async def drive(call: Callable[[str], Awaitable[dict]], prompts: List[str], concurrency: int) -> dict:
+    latencies: List[float] = []
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(prompt: str) -> None:
+        async with semaphore:
+            start = time.perf_counter()
+            await call(prompt)
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(prompt) for prompt in prompts))
+    elapsed = time.perf_counter() - start
+    return {"rps": len(prompts) / elapsed, "p50_ms": statistics.median(latencies) * 1000, "p99_ms": percentile(latencies, 99) * 1000}
+
+
+def blocking_call(url: str) -> Callable[[str], Awaitable[dict]]:
+    import httpx
+    from starlette.concurrency import run_in_threadpool
+
+    def generate(prompt: str) -> dict:
+        with httpx.Client() as client:
+            return client.post(url, json={"prompt": prompt}).json()
+
+    async def call(prompt: str) -> dict:
+        return await run_in_threadpool(generate, prompt)
+
+    return call
+
+
+async def run_all(url: str, args) -> None:
+    varied = _prompts(args.requests, 0.0)
+    repeated = _prompts(args.requests, 0.5)
+    print(f"{'mode':>13}  {'rps':>8}  {'p50 ms':>8}  {'p99 ms':>8}")
+
+    def show(label: str, result: dict) -> None:
+        print(f"{label:>13}  {result['rps']:>8.0f}  {result['p50_ms']:>8.1f}  {result['p99_ms']:>8.1f}")
+
+    show("blocking", await drive(blocking_call(url), varied, args.concurrency))
+    service = LLMService(HTTPLLM(url, max_connections=args.concurrency), timeout=30, max_concurrency=args.concurrency)
+    show("pooled", await drive(service.generate, varied, args.concurrency))
+    service.cache = TTLCache(1024, 300)
+    show("pooled+cache", await drive(service.generate, repeated, args.concurrency))
+    await service.aclose()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, default=200)
+    parser.add_argument("--latency", type=float, default=0.2)
+    args = parser.parse_args()
+
+    port = _free_port()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "tests.benchmarks.fake_llm", "--port", str(port), "--latency", str(args.latency)]
+    )
+    try:
+        _wait_for(port)
+        asyncio.run(run_all(f"http://127.0.0.1:{port}/generate", args))
+    finally:
+        server.terminate()
+        server.wait()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+"""Time to first byte, first reply text and completion: ``/message`` vs ``/message/stream``.
+
+The API runs under uvicorn in a subprocess with the mock LLM slowed down
+(``MOCK_LLM_LATENCY`` before the first chunk, ``MOCK_LLM_CHUNK_DELAY`` between
+chunks), so both endpoints see the same simulated model.
+
+Run from ``backend/``: ``python -m tests.benchmarks.message_stream [--requests 20 --latency 0.3 --chunk-delay 0.03]``
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Dict, List
+
+import httpx
+
+from tests.benchmarks.llm_client import _free_port, _wait_for
+
+
+def measure(client: httpx.Client, path: str, session_id: str) -> Dict[str, float]:
+    start = time.perf_counter()
+    timings: Dict[str, float] = {}
+    with client.stream("POST", path, json={"session_id": session_id, "message": "Bugün çok yorgunum"}) as response:
+        response.raise_for_status()
+        for chunk in response.iter_text():
+            now = time.perf_counter() - start
+            timings.setdefault("first_byte", now)
+            if "user_message" in chunk or "event: token" in chunk:
+                timings.setdefault("first_text", now)
+    timings["total"] = time.perf_counter() - start
+    return timings
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=20)
+    parser.add_argument("--latency", type=float, default=0.3)
+    parser.add_argument("--chunk-delay", type=float, default=0.03)
+    args = parser.parse_args()
+
+    port = _free_port()
+    env = dict(
+        os.environ,
+        DATABASE_URL="sqlite:///" + os.path.join(tempfile.mkdtemp(), "stream.db"),
+        MOCK_LLM_LATENCY=str(args.latency),
+        MOCK_LLM_CHUNK_DELAY=str(args.chunk_delay),
+    )
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port), "--log-level", "warning"], env=env
+    )
+    try:
+        _wait_for(port)
+        with httpx.Client(base_url=f"http://127.0.0.1:{port}", timeout=30) as client:
+            session_id = client.post("/session/start", json={"language": "TR", "country": "TR"}).json()["session_id"]
+            print(f"{'endpoint':>16}  {'ttfb ms':>8}  {'text ms':>8}  {'total ms':>8}")
+            for path in ("/message", "/message/stream"):
+                runs: List[Dict[str, float]] = [measure(client, path, session_id) for _ in range(args.requests)]
+                p50 = {key: statistics.median(run[key] for run in runs) * 1000 for key in runs[0]}
+                print(f"{path:>16}  {p50['first_byte']:>8.1f}  {p50['first_text']:>8.1f}  {p50['total']:>8.1f}")
+    finally:
+        server.terminate()
+        server.wait()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""Request latency with and without the metrics layer (``METRICS_ENABLED``).
+
+Each mode runs the API under uvicorn in its own subprocess against a fresh
+SQLite file and replays the same intake flow (session start, a message,
+questionnaire answers, ``/route``); the p50 and mean per request are compared.
+
+Run from ``backend/``: ``python -m tests.benchmarks.metrics_overhead [--sessions 200]``
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from typing import List
+
+import httpx
+
+from tests.benchmarks.llm_client import _free_port, _wait_for
+
+
+def run_flow(client: httpx.Client, sessions: int) -> List[float]:
+    latencies: List[float] = []
+
+    def timed(method: str, path: str, **kwargs) -> httpx.Response:
+        start = time.perf_counter()
+        response = client.request(method, path, **kwargs)
+        latencies.append(time.perf_counter() - start)
+        response.raise_for_status()
+        return response
+
+    for _ in range(sessions):
+        session_id = timed("POST", "/session/start", json={"country": "TR"}).json()["session_id"]
+        timed("POST", "/message", json={"session_id": session_id, "message": "Bugün çok yorgunum"})
+        for i in range(3):
+            answer = {"session_id": session_id, "questionnaire": "phq9", "question_index": i, "score": 1}
+            timed("POST", "/questionnaire/answer", json=answer)
+        timed("GET", "/route", params={"session_id": session_id})
+    return latencies
+
+
+def measure(enabled: bool, sessions: int) -> List[float]:
+    port = _free_port()
+    env = dict(
+        os.environ,
+        DATABASE_URL="sqlite:///" + os.path.join(tempfile.mkdtemp(), "metrics.db"),
+        METRICS_ENABLED=str(enabled).lower(),
+    )
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port), "--log-level", "warning"], env=env
+    )
+    try:
+        _wait_for(port)
+        with httpx.Client(base_url=f"http://127.0.0.1:{port}", timeout=30) as client:
+            run_flow(client, max(sessions // 10, 1))  # warm-up
+            return run_flow(client, sessions)
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sessions", type=int, default=200)
+    args = parser.parse_args()
+
+    print(f"{'metrics':>8}  {'p50 ms':>7}  {'mean ms':>7}")
+    results = {}
+    for enabled in (False, True):
+        latencies = measure(enabled, args.sessions)
+        results[enabled] = statistics.mean(latencies)
+        label = "on" if enabled else "off"
+        print(f"{label:>8}  {statistics.median(latencies) * 1000:>7.2f}  {results[enabled] * 1000:>7.2f}")
+    print(f"overhead: {(results[True] / results[False] - 1) * 100:+.1f}% mean latency")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,155 @@
+"""Crisis-path latency while non-crisis ``/message`` traffic overloads the LLM, with and without load shedding.
+
+A steady probe sends one crisis message every ``--interval`` seconds. Three
+phases run for ``--duration`` seconds each against the same app (in process
+over ASGI):
+
+* ``idle``        - the probe alone
+* ``shedding``    - plus ``--flood`` clients sending non-crisis messages as fast
+                    as they are answered, with admission control on
+* ``no shedding`` - the same flood with admission control off
+
+The mock model answers after ``--llm-latency`` seconds with at most
+``--llm-slots`` calls at once, so the flood queues on the LLM. Flood clients
+honour ``Retry-After``. Rate limits are off unless ``--rate-limits`` is given,
+so the phases compare admission control alone. Reported: crisis p50/p99,
+flood response counts by status, and the cost of one admission decision.
+
+Run from ``backend/``: ``python -m tests.benchmarks.overload [--flood 300 --duration 10]``
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import tempfile
+import time
+import timeit
+from collections import Counter
+from typing import Dict, List
+
+from tests.benchmarks.db_modes import percentile
+
+CRISIS_MESSAGE = "I want to end my life"
+
+
+async def _start(client) -> str:
+    response = await client.post("/session/start", json={})
+    response.raise_for_status()
+    return response.json()["session_id"]
+
+
+async def probe(client, session_ids: List[str], interval: float, stop: asyncio.Event, latencies: List[float]) -> None:
+    i = 0
+    while not stop.is_set():
+        start = time.perf_counter()
+        payload = {"session_id": session_ids[i % len(session_ids)], "message": CRISIS_MESSAGE}
+        response = await client.post("/message", json=payload)
+        latencies.append(time.perf_counter() - start)
+        if response.status_code != 200 or response.json()["intent"] != "crisis":
+            sys.exit(f"crisis message answered {response.status_code}: {response.text}")
+        i += 1
+        await asyncio.sleep(interval)
+
+
+async def flooder(client, session_id: str, stop: asyncio.Event, statuses: Counter) -> None:
+    while not stop.is_set():
+        response = await client.post("/message", json={"session_id": session_id, "message": "Work has been stressful"})
+        statuses[response.status_code] += 1
+        if response.status_code in (429, 503):
+            await asyncio.sleep(float(response.headers.get("retry-after", "1")))
+
+
+async def run(args) -> Dict[str, Dict[str, float]]:
+    import httpx
+
+    from app import admission
+    from app.database import Base, engine
+    from app.main import app
+
+    Base.metadata.create_all(bind=engine)
+    results = {}
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://overload", timeout=None) as client:
+            rate_limits, admission.controller.rate_limits = admission.controller.rate_limits, False
+            probe_sessions = [await _start(client) for _ in range(20)]
+            flood_sessions = [await _start(client) for _ in range(args.flood)]
+            admission.controller.rate_limits = rate_limits
+            phases = (("idle", 0, True), ("shedding", args.flood, True), ("no shedding", args.flood, False))
+            for label, flood, shedding in phases:
+                admission.controller.shedding = shedding
+                admission.controller.limiter.store.clear()
+                stop = asyncio.Event()
+                latencies: List[float] = []
+                statuses: Counter = Counter()
+                tasks = [
+                    asyncio.ensure_future(flooder(client, session_id, stop, statuses))
+                    for session_id in flood_sessions[:flood]
+                ]
+                tasks.append(asyncio.ensure_future(probe(client, probe_sessions, args.interval, stop, latencies)))
+                await asyncio.sleep(args.duration)
+                stop.set()
+                await asyncio.gather(*tasks)
+                results[label] = {
+                    "crisis": len(latencies),
+                    "p50_ms": statistics.median(latencies) * 1000,
+                    "p99_ms": percentile(latencies, 99) * 1000,
+                    **{f"flood_{status}": count for status, count in sorted(statuses.items())},
+                }
+    return results
+
+
+def decision_cost_us() -> float:
+    from starlette.requests import Request
+
+    from app import admission
+
+    unlimited = admission.Limit(10**9, 1)
+    controller = admission.Admission(
+        admission.RateLimiter(admission.MemoryBucketStore()),
+        message_per_session=unlimited,
+        message_per_ip=unlimited,
+        rate_limits=True,
+        shedding=True,
+    )
+    request = Request({"type": "http", "headers": [], "client": ("10.0.0.1", 1)})
+    number = 20000
+
+    def check() -> None:
+        # The in-process store never suspends, so one send() runs the whole check without an event loop.
+        try:
+            controller.check_message("message", request, "s").send(None)
+        except StopIteration:
+            pass
+
+    return min(timeit.repeat(check, number=number, repeat=3)) / number * 1e6
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--flood", type=int, default=300, help="concurrent non-crisis clients")
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds per phase")
+    parser.add_argument("--interval", type=float, default=0.02, help="seconds between crisis probes")
+    parser.add_argument("--llm-latency", type=float, default=0.5)
+    parser.add_argument("--llm-slots", type=int, default=16)
+    parser.add_argument("--rate-limits", action="store_true")
+    args = parser.parse_args()
+
+    # Read by app.config at import time, so they must be set before the app is imported.
+    os.environ["DATABASE_URL"] = "sqlite:///" + os.path.join(tempfile.mkdtemp(), "overload.db")
+    os.environ["MOCK_LLM_LATENCY"] = str(args.llm_latency)
+    os.environ["LLM_MAX_CONCURRENCY"] = str(args.llm_slots)
+    os.environ["LLM_TIMEOUT"] = "30"
+    os.environ["RATE_LIMIT_ENABLED"] = "true" if args.rate_limits else "false"
+
+    results = asyncio.run(run(args))
+    print(f"{'phase':>12}  {'crisis':>6}  {'p50 ms':>7}  {'p99 ms':>7}  flood responses")
+    for label, row in results.items():
+        flood = ", ".join(f"{key[6:]}: {value}" for key, value in row.items() if key.startswith("flood_")) or "-"
+        print(f"{label:>12}  {row['crisis']:>6}  {row['p50_ms']:>7.2f}  {row['p99_ms']:>7.2f}  {flood}")
+    print(f"admission decision: {decision_cost_us():.2f} us (rate limits + shedding, in-process buckets)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+"""CPU per request for the response layer: the previous style vs ``app.responses``.
+
+Two small apps serve the same payloads without touching the database:
+``legacy`` builds Pydantic models, encodes with FastAPI's default JSON
+response and adds the disclaimer in an ``@app.middleware("http")`` function;
+``fast`` uses ORJSON, the bodies encoded once and ``DisclaimerMiddleware``.
+Requests go through ``httpx.ASGITransport`` one at a time; client overhead is
+the same in both columns, so the difference is what each request saves.
+
+Run from ``backend/``: ``python -m tests.benchmarks.responses [--requests 3000]``
+"""
+import argparse
+import asyncio
+import time
+
+import httpx
+from fastapi import FastAPI
+
+from app import resources, schemas
+from app.llm import FALLBACK_RESULT
+from app.responses import DisclaimerMiddleware, ORJSONResponse, json_bytes, json_response
+from app.safety import DISCLAIMER
+
+ROOT = {"message": "Mental Health Intake + Routing Assistant", "disclaimer": DISCLAIMER}
+ENDPOINTS = [("GET", "/"), ("GET", "/resources"), ("POST", "/message/crisis"), ("POST", "/message/summary")]
+
+
+def legacy_app() -> FastAPI:
+    app = FastAPI()
+
+    @app.middleware("http")
+    async def add_disclaimer_header(request, call_next):
+        response = await call_next(request)
+        response.headers["X-Disclaimer"] = DISCLAIMER
+        return response
+
+    @app.get("/")
+    def root():
+        return ROOT
+
+    @app.get("/resources", response_model=schemas.ResourceEntry)
+    def get_resources(country: str = "tr"):
+        return resources.get_country_resources(country).data
+
+    @app.post("/message/crisis", response_model=schemas.MessageResponse)
+    async def crisis():
+        return schemas.MessageResponse(
+            intent="crisis",
+            user_message=resources.get_country_resources("tr").crisis_text,
+            extracted_entities={},
+            next_action={"type": "stop", "payload": {}},
+        )
+
+    @app.post("/message/summary", response_model=schemas.MessageResponse)
+    async def summary():
+        return schemas.MessageResponse(**dict(FALLBACK_RESULT))
+
+    return app
+
+
+def fast_app() -> FastAPI:
+    app = FastAPI(default_response_class=ORJSONResponse)
+    app.add_middleware(DisclaimerMiddleware)
+    root_body = json_bytes(ROOT)
+    fallback_body = json_bytes(schemas.MessageResponse(**FALLBACK_RESULT).dict())
+
+    @app.get("/")
+    def root():
+        return json_response(root_body)
+
+    @app.get("/resources", response_model=schemas.ResourceEntry)
+    def get_resources(country: str = "tr"):
+        return json_response(resources.get_country_resources(country).body)
+
+    @app.post("/message/crisis", response_model=schemas.MessageResponse)
+    async def crisis():
+        return json_response(resources.get_country_resources("tr").crisis_body)
+
+    @app.post("/message/summary", response_model=schemas.MessageResponse)
+    async def summary():
+        result = dict(FALLBACK_RESULT)
+        return json_response(fallback_body) if result == FALLBACK_RESULT else ORJSONResponse(result)
+
+    return app
+
+
+async def cpu_per_request(app: FastAPI, method: str, path: str, requests: int) -> float:
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench") as client:
+        for _ in range(50):
+            (await client.request(method, path)).raise_for_status()
+        start = time.process_time()
+        for _ in range(requests):
+            await client.request(method, path)
+        return (time.process_time() - start) / requests
+
+
+async def run(requests: int) -> None:
+    resources.registry.load()
+    apps = {"legacy": legacy_app(), "fast": fast_app()}
+    print(f"{'endpoint':>18}  {'legacy us':>9}  {'fast us':>9}  {'saved us':>9}")
+    for method, path in ENDPOINTS:
+        legacy = await cpu_per_request(apps["legacy"], method, path, requests) * 1e6
+        fast = await cpu_per_request(apps["fast"], method, path, requests) * 1e6
+        print(f"{path:>18}  {legacy:>9.1f}  {fast:>9.1f}  {legacy - fast:>9.1f}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=3000)
+    args = parser.parse_args()
+    asyncio.run(run(args.requests))
+
+
+if __name__ == "__main__":
+    main()
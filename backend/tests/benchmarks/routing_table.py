@@ -0,0 +1,51 @@
+"""route_scores via the decision table vs evaluating thresholds on every call.
+
+``baseline`` is ``route_user`` as it was before the table (the oracle in
+``tests/test_routing.py``), timed on the PHQ-9/GAD-7 inputs it supports.
+
+Run from ``backend/``: ``python -m tests.benchmarks.routing_table``
+"""
+import random
+import timeit
+
+from app import questionnaires, routing
+from tests.test_routing import baseline_route_user
+
+
+def main() -> None:
+    rng = random.Random(3)
+    instruments = questionnaires.registry.all()
+    by_name = {q.name: q for q in instruments}
+    inputs = []
+    for _ in range(1000):
+        totals = {"phq9": rng.randint(0, by_name["phq9"].max_score), "gad7": rng.randint(0, by_name["gad7"].max_score)}
+        if rng.random() < 0.2:
+            totals["phq2"] = rng.randint(0, by_name["phq2"].max_score)
+        inputs.append((totals, rng.choice(["18+", "under 18"])))
+    routing.get_table()
+
+    def with_table():
+        for args in inputs:
+            routing.route_scores(*args)
+
+    def direct():
+        for args in inputs:
+            routing._route_uncached(*args)
+
+    core = [(totals["phq9"], totals["gad7"], age_band) for totals, age_band in inputs if "phq2" not in totals]
+
+    def baseline():
+        for args in core:
+            baseline_route_user(*args)
+
+    per_call_us = min(timeit.repeat(baseline, number=20, repeat=5)) / (20 * len(core)) * 1e6
+    print(f"{'baseline':>8}: {per_call_us:.2f} us/call")
+    for label, fn in (("direct", direct), ("table", with_table)):
+        per_call_us = min(timeit.repeat(fn, number=20, repeat=5)) / (20 * len(inputs)) * 1e6
+        print(f"{label:>8}: {per_call_us:.2f} us/call")
+    build_ms = min(timeit.repeat(lambda: routing.DecisionTable(instruments), number=1, repeat=5)) * 1000
+    print(f"   build: {build_ms:.1f} ms for the core-instrument grid")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+"""Startup time, memory per worker and throughput of the gunicorn profile at 1, 2, 4 and 8 workers.
+
+The schema is created once with ``python -m app.migrate``; then, for each
+worker count, ``gunicorn -c gunicorn.conf.py`` is started against that SQLite
+file. Startup is the time until every worker has been forked and a request is
+answered. Memory is read from ``/proc`` (Linux only): RSS counts shared pages
+in every worker, PSS splits them between the processes sharing them, so a low
+PSS next to a high RSS means the preloaded state is being shared. Throughput
+is a read-mostly intake mix (``/route``, ``/questionnaire/next``, ``/resources``)
+over keep-alive connections.
+
+Run from ``backend/``: ``python -m tests.benchmarks.server_workers [--workers 1 2 4 8 --requests 4000 --concurrency 64]``
+"""
+import argparse
+import asyncio
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, List
+
+import httpx
+
+from tests.benchmarks.db_modes import percentile
+from tests.benchmarks.llm_client import _free_port
+
+BACKEND_DIR = Path(__file__).resolve().parents[2]
+
+
+def _children(pid: int) -> List[int]:
+    with open(f"/proc/{pid}/task/{pid}/children") as f:
+        return [int(child) for child in f.read().split()]
+
+
+def _memory_kb(pid: int) -> Dict[str, int]:
+    values = {}
+    with open(f"/proc/{pid}/smaps_rollup") as f:
+        for line in f:
+            key, _, rest = line.partition(":")
+            if key in ("Rss", "Pss"):
+                values[key] = int(rest.split()[0])
+    return values
+
+
+def _wait_ready(master: subprocess.Popen, port: int, workers: int, timeout: float = 60.0) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if master.poll() is not None:
+            raise RuntimeError("gunicorn exited during startup")
+        if len(_children(master.pid)) >= workers:
+            try:
+                httpx.get(f"http://127.0.0.1:{port}/", timeout=0.5).raise_for_status()
+                return
+            except httpx.HTTPError:
+                pass
+        time.sleep(0.02)
+    raise TimeoutError(f"{workers} workers not ready after {timeout}s")
+
+
+async def drive(port: int, requests: int, concurrency: int) -> Dict[str, float]:
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}", limits=limits, timeout=30) as client:
+        session_ids = []
+        for _ in range(32):
+            session_ids.append((await client.post("/session/start", json={"country": "TR"})).json()["session_id"])
+        paths = [
+            ("/route", lambda i: {"session_id": session_ids[i % 32]}),
+            ("/questionnaire/next", lambda i: {"session_id": session_ids[i % 32], "questionnaire": "phq9"}),
+            ("/resources", lambda i: {"country": "tr"}),
+        ]
+        latencies: List[float] = []
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def one(i: int) -> None:
+            path, params = paths[i % len(paths)]
+            async with semaphore:
+                start = time.perf_counter()
+                response = await client.get(path, params=params(i))
+                latencies.append(time.perf_counter() - start)
+                response.raise_for_status()
+
+        start = time.perf_counter()
+        await asyncio.gather(*(one(i) for i in range(requests)))
+        elapsed = time.perf_counter() - start
+    return {"rps": requests / elapsed, "p99_ms": percentile(latencies, 99) * 1000}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--requests", type=int, default=4000)
+    parser.add_argument("--concurrency", type=int, default=64)
+    args = parser.parse_args()
+
+    database = os.path.join(tempfile.mkdtemp(), "workers.db")
+    env = dict(os.environ, DATABASE_URL=f"sqlite:///{database}", AUDIT_WRITE_BEHIND="true")
+    subprocess.run([sys.executable, "-m", "app.migrate"], cwd=BACKEND_DIR, env=env, check=True, capture_output=True)
+
+    print(f"{'workers':>7}  {'startup s':>9}  {'RSS MB/w':>8}  {'PSS MB/w':>8}  {'req/s':>8}  {'p99 ms':>7}")
+    for workers in args.workers:
+        port = _free_port()
+        start = time.perf_counter()
+        master = subprocess.Popen(
+            [sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py", "--log-level", "warning", "app.main:app"],
+            cwd=BACKEND_DIR,
+            env=dict(env, WEB_CONCURRENCY=str(workers), BIND=f"127.0.0.1:{port}"),
+        )
+        try:
+            _wait_ready(master, port, workers)
+            startup = time.perf_counter() - start
+            memory = [_memory_kb(pid) for pid in _children(master.pid)]
+            rss = sum(m["Rss"] for m in memory) / len(memory) / 1024
+            pss = sum(m["Pss"] for m in memory) / len(memory) / 1024
+            result = asyncio.run(drive(port, args.requests, args.concurrency))
+        finally:
+            master.terminate()
+            master.wait()
+        print(f"{workers:>7}  {startup:>9.2f}  {rss:>8.1f}  {pss:>8.1f}  {result['rps']:>8.0f}  {result['p99_ms']:>7.1f}")
+
+
+if __name__ == "__main__":
+    main()
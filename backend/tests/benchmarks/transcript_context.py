@@ -0,0 +1,77 @@
+"""Prompt context per turn: querying and sorting ``messages`` vs the transcript ring buffer.
+
+Seeds sessions of growing length into a SQLite file, then times building the
+last ``--turns`` turns of context from the database (what each turn would cost
+without a buffer) and from ``TranscriptBuffer``.
+
+Run from ``backend/``: ``python -m tests.benchmarks.transcript_context [--turns 20]``
+"""
+import argparse
+import os
+import tempfile
+import timeit
+import uuid
+from datetime import datetime, timedelta
+
+os.environ.setdefault("DATABASE_URL", "sqlite:///" + os.path.join(tempfile.mkdtemp(), "transcripts.db"))
+
+from sqlalchemy import insert, select  # noqa: E402
+
+from app import transcripts  # noqa: E402
+from app.database import Base, SessionLocal, engine  # noqa: E402
+from app.models import Message, Session as DBSession  # noqa: E402
+
+
+def seed(length: int) -> uuid.UUID:
+    session_id = uuid.uuid4()
+    start = datetime.utcnow()
+    rows = [
+        {
+            "id": uuid.uuid4(),
+            "session_id": session_id,
+            "sender": "user" if i % 2 == 0 else "assistant",
+            "content": f"turn {i} " * 20,
+            "created_at": start + timedelta(seconds=i),
+        }
+        for i in range(length)
+    ]
+    with engine.begin() as conn:
+        conn.execute(insert(DBSession.__table__).values(id=session_id))
+        conn.execute(insert(Message.__table__), rows)
+    return session_id
+
+
+def from_messages(session_id: uuid.UUID, turns: int) -> list:
+    with SessionLocal() as db:
+        rows = db.execute(
+            select(Message.sender, Message.content)
+            .where(Message.session_id == session_id)
+            .order_by(Message.created_at.desc())
+            .limit(turns)
+        ).all()
+    return [{"role": row.sender, "content": row.content} for row in reversed(rows)]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--turns", type=int, default=20)
+    args = parser.parse_args()
+
+    Base.metadata.create_all(bind=engine)
+    buffer = transcripts.TranscriptBuffer(turns=args.turns, max_sessions=100)
+    print(f"{'session turns':>13}  {'db ms':>7}  {'buffer us':>9}")
+    for length in (10, 100, 1000, 5000):
+        session_id = seed(length)
+        buffer.open(session_id)
+        for i in range(length):
+            sender = transcripts.USER if i % 2 == 0 else transcripts.ASSISTANT
+            buffer.append(transcripts.Turn(i, session_id, sender, f"turn {i} " * 20, datetime.utcnow()))
+        db_ms = min(timeit.repeat(lambda: from_messages(session_id, args.turns), number=50, repeat=3)) / 50 * 1000
+        buffer_us = min(
+            timeit.repeat(lambda: [turn.message() for turn in buffer.recent(session_id)], number=2000, repeat=3)
+        ) / 2000 * 1e6
+        print(f"{length:>13}  {db_ms:>7.3f}  {buffer_us:>9.2f}")
+
+
+if __name__ == "__main__":
+    main()
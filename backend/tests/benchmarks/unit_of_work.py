@@ -0,0 +1,115 @@
+"""Commits, INSERT/SELECT statements and p50 latency per request: per-row commits vs one unit of work.
+
+The "legacy" functions reproduce the write pattern the endpoints used before
+(commit + refresh after every row); "current" calls the endpoint bodies in
+``app.main`` (with the write-behind audit sink and transcript writer running, flushed before counting). Both run against the same SQLite file with synchronous=FULL.
+
+Run from ``backend/``: ``python -m tests.benchmarks.unit_of_work [--sessions 300 --messages 5]``
+"""
+import argparse
+import os
+import statistics
+import tempfile
+import time
+import uuid
+from collections import Counter
+from typing import Callable, List
+
+os.environ.setdefault("DATABASE_URL", "sqlite:///" + os.path.join(tempfile.mkdtemp(), "uow.db"))
+
+from sqlalchemy import event  # noqa: E402
+
+from app import audit, main as app_main, schemas, transcripts  # noqa: E402
+from app.database import SessionLocal, engine  # noqa: E402
+from app.models import AuditLog, Message, Session as DBSession, User  # noqa: E402
+
+
+def legacy_start_session(db, payload: schemas.StartSessionRequest) -> str:
+    user = User(email=payload.email, consent=payload.consent)
+    db.add(user)
+    db.commit()
+    db.refresh(user)
+    session = DBSession(user_id=user.id, language=payload.language, country=payload.country, age_band=payload.age_band)
+    db.add(session)
+    db.commit()
+    db.refresh(session)
+    db.add(AuditLog(session_id=session.id, event="session_started", detail=payload.dict()))
+    db.commit()
+    return str(session.id)
+
+
+def current_process_message(db, payload: schemas.MessageRequest) -> None:
+    session, _ = app_main._load_conversation(db, payload.session_id)
+    transcripts.store.add(session.id, transcripts.USER, payload.message)
+    transcripts.store.add(session.id, transcripts.ASSISTANT, "summary")
+    audit.sink.record(session.id, "llm_called", {"intent": "summary"})
+
+
+def legacy_process_message(db, payload: schemas.MessageRequest) -> None:
+    session = db.get(DBSession, uuid.UUID(payload.session_id))
+    db.add(Message(session_id=session.id, sender="user", content=payload.message))
+    db.commit()
+    db.add(AuditLog(session_id=session.id, event="llm_called", detail={"intent": "summary"}))
+    db.commit()
+
+
+class StatementCounter:
+    def __init__(self):
+        self.counts: Counter = Counter()
+        event.listen(engine, "before_cursor_execute", self._on_execute)
+        event.listen(engine, "commit", self._on_commit)
+
+    def _on_execute(self, conn, cursor, statement, parameters, context, executemany):
+        self.counts[statement.split(None, 1)[0].upper()] += 1
+
+    def _on_commit(self, conn):
+        self.counts["COMMIT"] += 1
+
+    def reset(self) -> Counter:
+        counts, self.counts = self.counts, Counter()
+        return counts
+
+
+def run(label: str, start: Callable, message: Callable, sessions: int, messages: int, counter: StatementCounter) -> None:
+    latencies: List[float] = []
+    counter.reset()
+    for i in range(sessions):
+        with SessionLocal() as db:
+            t0 = time.perf_counter()
+            session_id = start(db, schemas.StartSessionRequest(email=f"{label}-{i}-{uuid.uuid4()}@bench"))
+            latencies.append(time.perf_counter() - t0)
+        for j in range(messages):
+            with SessionLocal() as db:
+                t0 = time.perf_counter()
+                message(db, schemas.MessageRequest(session_id=session_id, message=f"message {j}"))
+                latencies.append(time.perf_counter() - t0)
+    audit.sink.flush()
+    transcripts.store.writer.flush()
+    requests = sessions * (1 + messages)
+    counts = counter.reset()
+    print(
+        f"{label:>8}  {statistics.median(latencies) * 1000:>7.2f}  "
+        f"{counts['COMMIT'] / requests:>11.2f}  {counts['INSERT'] / requests:>11.2f}  {counts['SELECT'] / requests:>11.2f}"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sessions", type=int, default=300)
+    parser.add_argument("--messages", type=int, default=5)
+    args = parser.parse_args()
+
+    app_main.Base.metadata.create_all(bind=engine)
+    event.listen(engine, "connect", lambda conn, _: conn.execute("PRAGMA synchronous=FULL"))
+    counter = StatementCounter()
+    print(f"{'mode':>8}  {'p50 ms':>7}  {'commits/req':>11}  {'inserts/req':>11}  {'selects/req':>11}")
+    run("legacy", legacy_start_session, legacy_process_message, args.sessions, args.messages, counter)
+    audit.sink.start()
+    transcripts.store.writer.start()
+    run("current", app_main._start_session, current_process_message, args.sessions, args.messages, counter)
+    transcripts.store.writer.stop()
+    audit.sink.stop()
+
+
+if __name__ == "__main__":
+    main()
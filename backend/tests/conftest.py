@@ -0,0 +1,20 @@
+import os
+import tempfile
+
+import pytest
+
+# app.config reads DATABASE_URL at import time; keep test runs off the working-tree app.db.
+os.environ.setdefault("DATABASE_URL", "sqlite:///" + os.path.join(tempfile.mkdtemp(), "test.db"))
+
+
+@pytest.fixture
+def engine(tmp_path):
+    """A fresh SQLite file with the model schema."""
+    from sqlalchemy import create_engine
+
+    from app.database import Base
+
+    engine = create_engine(f"sqlite:///{tmp_path / 'test.db'}")
+    Base.metadata.create_all(bind=engine)
+    yield engine
+    engine.dispose()
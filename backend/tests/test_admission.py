@@ -0,0 +1,132 @@
+import asyncio
+
+import pytest
+
+pytest.importorskip("fastapi")
+
+from fastapi import HTTPException  # noqa: E402
+from starlette.requests import Request  # noqa: E402
+
+from app import database, llm, metrics  # noqa: E402
+from app.admission import Admission, Limit, MemoryBucketStore, RateLimiter  # noqa: E402
+
+
+def _request(host: str = "10.0.0.1", forwarded: str = "") -> Request:
+    headers = [(b"x-forwarded-for", forwarded.encode())] if forwarded else []
+    return Request({"type": "http", "method": "POST", "path": "/message", "headers": headers, "client": (host, 1234)})
+
+
+def _controller(now, **overrides) -> Admission:
+    options = dict(
+        message_per_session=Limit(2, 10),
+        message_per_ip=Limit(100, 10),
+        rate_limits=True,
+        shedding=True,
+        llm_queue=4,
+        db_queue=4,
+    )
+    options.update(overrides)
+    return Admission(RateLimiter(MemoryBucketStore(), clock=lambda: now[0]), **options)
+
+
+def _take(store: MemoryBucketStore, key: str, now: float, rate: float = 1.0, burst: int = 3) -> float:
+    return asyncio.run(store.take(key, rate, burst, now))
+
+
+def test_limit_parse():
+    assert Limit.parse("20/60") == Limit(20, 60.0)
+    assert Limit.parse("5").rate == 5
+    assert not Limit.parse("0/60").enabled
+
+
+def test_bucket_allows_burst_then_refills():
+    store = MemoryBucketStore()
+    assert [_take(store, "k", 0.0) for _ in range(3)] == [0.0, 0.0, 0.0]
+    assert _take(store, "k", 0.0) == pytest.approx(1.0)
+    assert _take(store, "k", 0.5) == pytest.approx(0.5)
+    assert _take(store, "k", 1.0) == 0.0
+    # Idle time refills up to the burst, not beyond.
+    assert [_take(store, "k", 100.0) for _ in range(4)][-1] > 0
+
+
+def test_bucket_store_is_bounded():
+    store = MemoryBucketStore(max_keys=2)
+    for key in ("a", "b", "c"):
+        _take(store, key, 0.0, burst=1)
+    assert _take(store, "a", 0.0, burst=1) == 0.0  # evicted, so it starts full again
+    assert _take(store, "c", 0.0, burst=1) > 0
+
+
+def test_message_limit_is_per_session():
+    now = [0.0]
+    controller = _controller(now)
+    for _ in range(2):
+        asyncio.run(controller.check_message("message", _request(), "s1"))
+    with pytest.raises(HTTPException) as refused:
+        asyncio.run(controller.check_message("message", _request(), "s1"))
+    assert refused.value.status_code == 429
+    assert refused.value.headers["Retry-After"] == "5"
+    asyncio.run(controller.check_message("message", _request(), "s2"))
+    now[0] += 5
+    asyncio.run(controller.check_message("message", _request(), "s1"))
+
+
+def test_message_refused_by_the_ip_limit_keeps_its_session_token():
+    now = [0.0]
+    controller = _controller(now, message_per_ip=Limit(1, 10))
+    asyncio.run(controller.check_message("message", _request(), "s1"))
+    with pytest.raises(HTTPException):
+        asyncio.run(controller.check_message("message", _request(), "s1"))
+    # s1 has one of its two messages left, usable from another address.
+    asyncio.run(controller.check_message("message", _request("10.0.0.2"), "s1"))
+    with pytest.raises(HTTPException):
+        asyncio.run(controller.check_message("message", _request("10.0.0.3"), "s1"))
+
+
+def test_forwarded_address_counts_trusted_hops_from_the_right():
+    # The client sent "1.2.3.4"; the edge proxy appended 203.0.113.7 and an internal one 10.0.0.2.
+    request = _request(forwarded="1.2.3.4, 203.0.113.7,10.0.0.2")
+    assert _controller([0.0]).client_address(request) == "10.0.0.1"
+    assert _controller([0.0], trusted_proxies=1).client_address(request) == "10.0.0.2"
+    assert _controller([0.0], trusted_proxies=2).client_address(request) == "203.0.113.7"
+    # Fewer hops than trusted proxies: not proxied, so the header is ignored.
+    assert _controller([0.0], trusted_proxies=4).client_address(request) == "10.0.0.1"
+
+
+def test_spoofed_forwarded_hops_share_a_bucket():
+    controller = _controller([0.0], trusted_proxies=1, session_start_per_ip=Limit(1, 60))
+    asyncio.run(controller.check_session_start(_request(forwarded="1.1.1.1, 203.0.113.7")))
+    with pytest.raises(HTTPException):
+        asyncio.run(controller.check_session_start(_request(forwarded="2.2.2.2, 203.0.113.7")))
+
+
+def test_overload_sheds_with_503(monkeypatch):
+    controller = _controller([0.0])
+    monkeypatch.setattr(llm, "queue_depth", lambda: 5)
+    with pytest.raises(HTTPException) as shed:
+        asyncio.run(controller.check_message("message", _request(), "s1"))
+    assert shed.value.status_code == 503
+    assert controller.overloaded() == "llm_queue"
+
+    monkeypatch.setattr(llm, "queue_depth", lambda: 0)
+    monkeypatch.setattr(database, "pool_queue_depth", lambda: 5)
+    assert controller.overloaded() == "db_queue"
+    monkeypatch.setattr(database, "pool_queue_depth", lambda: 4)
+    assert controller.overloaded() is None
+
+
+def test_disabled_checks_admit_everything(monkeypatch):
+    monkeypatch.setattr(llm, "queue_depth", lambda: 1000)
+    controller = _controller([0.0], rate_limits=False, shedding=False)
+    for _ in range(10):
+        asyncio.run(controller.check_message("message", _request(), "s1"))
+        asyncio.run(controller.check_session_start(_request()))
+
+
+def test_rejections_are_counted():
+    before = metrics.ADMISSION_REJECTIONS.value("session_start", "ip")
+    controller = _controller([0.0], session_start_per_ip=Limit(1, 60))
+    asyncio.run(controller.check_session_start(_request()))
+    with pytest.raises(HTTPException):
+        asyncio.run(controller.check_session_start(_request()))
+    assert metrics.ADMISSION_REJECTIONS.value("session_start", "ip") == before + 1
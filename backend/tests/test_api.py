@@ -0,0 +1,418 @@
+import json
+
+import pytest
+
+pytest.importorskip("fastapi")
+pytest.importorskip("sqlalchemy")
+
+from fastapi.testclient import TestClient  # noqa: E402
+
+from app import admission, audit, transcripts  # noqa: E402
+from app.main import app  # noqa: E402
+
+
+@pytest.fixture
+def client():
+    # Every TestClient request comes from the same address; start each test with full buckets.
+    admission.controller.limiter.store.clear()
+    with TestClient(app) as test_client:
+        yield test_client
+
+
+def test_resources_support_conditional_get(client):
+    first = client.get("/resources", params={"country": "uk"})
+    assert first.status_code == 200
+    assert first.json()["emergency_number"] == "999"
+    etag = first.headers["etag"]
+    second = client.get("/resources", params={"country": "uk"}, headers={"If-None-Match": etag})
+    assert second.status_code == 304
+    assert second.headers["etag"] == etag
+    for header in (f'"other",{etag}', f'"other" , W/{etag}', "*"):
+        assert client.get("/resources", params={"country": "uk"}, headers={"If-None-Match": header}).status_code == 304
+    assert client.get("/resources", params={"country": "uk"}, headers={"If-None-Match": '"other"'}).status_code == 200
+
+
+def test_crisis_message_uses_country_resources(client):
+    session_id = client.post("/session/start", json={"country": "UK"}).json()["session_id"]
+    body = client.post("/message", json={"session_id": session_id, "message": "I want to end my life"}).json()
+    assert body["intent"] == "crisis"
+    assert "Emergency number: 999" in body["user_message"]
+
+
+def test_full_intake_flow(client):
+    session_id = client.post("/session/start", json={"email": "flow@example.com", "consent": True}).json()["session_id"]
+    reply = client.post("/message", json={"session_id": session_id, "message": "I have been tired lately"}).json()
+    assert reply["intent"] == "summary"
+
+    for questionnaire, count in (("phq9", 9), ("gad7", 7)):
+        for _ in range(count):
+            nxt = client.get("/questionnaire/next", params={"session_id": session_id, "questionnaire": questionnaire})
+            assert nxt.status_code == 200
+            answer = {"session_id": session_id, "questionnaire": questionnaire, "question_index": nxt.json()["question_index"], "score": 2}
+            assert client.post("/questionnaire/answer", json=answer).json() == {"status": "recorded"}
+        done = client.get("/questionnaire/next", params={"session_id": session_id, "questionnaire": questionnaire})
+        assert done.status_code == 404
+
+    route = client.get("/route", params={"session_id": session_id}).json()
+    assert route["scores"] == {"phq9": 18, "gad7": 14}
+    assert route["bucket"] == "high"
+
+    audit.sink.flush()
+    transcripts.store.writer.flush()
+    export = client.get("/export", params={"email": "flow@example.com"}).json()
+    assert [s["id"] for s in export["sessions"]] == [session_id]
+    assert [(m["sender"], m["content"]) for m in export["messages"]] == [
+        ("user", "I have been tired lately"),
+        ("assistant", reply["user_message"]),
+    ]
+    assert len(export["questionnaire_responses"]) == 16
+    assert {a["event"] for a in export["audit_logs"]} >= {"session_started", "llm_called", "routing"}
+
+
+def test_endpoints_commit_once(client, monkeypatch):
+    from sqlalchemy import event
+
+    from app import database
+
+    buffered = []
+    monkeypatch.setattr(audit.sink, "_enqueue", lambda row: buffered.append(row) or True)
+    turns = []
+    monkeypatch.setattr(transcripts.store.writer, "_enqueue", lambda row: turns.append(row) or True)
+
+    engine = database.async_engine.sync_engine if database.async_engine is not None else database.engine
+    commits = []
+    listener = lambda conn: commits.append(1)  # noqa: E731
+    event.listen(engine, "commit", listener)
+    try:
+        session_id = client.post("/session/start", json={"email": "uow@example.com"}).json()["session_id"]
+        assert len(commits) == 1
+        # Session metadata and transcript are in memory; both turns are written behind.
+        client.post("/message", json={"session_id": session_id, "message": "hello"})
+        assert len(commits) == 1
+        client.post("/message", json={"session_id": session_id, "message": "kendime zarar vermek"})
+        assert len(commits) == 2
+        assert [row["event"] for row in buffered] == ["session_started", "llm_called"]
+        assert [turn["sender"] for turn in turns] == [transcripts.USER, transcripts.ASSISTANT]
+    finally:
+        event.remove(engine, "commit", listener)
+
+
+def test_messages_carry_recent_turns_as_context(client, monkeypatch):
+    from app.llm import FALLBACK_RESULT, get_llm_client
+
+    contexts = []
+
+    async def generate(prompt, context=()):
+        contexts.append(list(context))
+        return {**FALLBACK_RESULT, "user_message": f"reply to {prompt}"}
+
+    monkeypatch.setattr(get_llm_client().client, "generate", generate)
+    session_id = client.post("/session/start", json={}).json()["session_id"]
+    for message in ("first", "second"):
+        client.post("/message", json={"session_id": session_id, "message": message})
+    assert contexts == [
+        [],
+        [{"role": "user", "content": "first"}, {"role": "assistant", "content": "reply to first"}],
+    ]
+
+    # A cold buffer is rebuilt from transcript_turns.
+    transcripts.store.writer.flush()
+    transcripts.store.buffer.clear()
+    client.post("/message", json={"session_id": session_id, "message": "third"})
+    assert [turn["content"] for turn in contexts[-1]] == ["first", "reply to first", "second", "reply to second"]
+
+
+def test_message_reads_the_shared_session_cache_off_the_event_loop(client, monkeypatch):
+    import asyncio
+
+    from app import session_cache
+
+    class Shared(session_cache.MemoryBackend):
+        def get(self, key):
+            try:
+                asyncio.get_running_loop()
+                calls.append("event loop")
+            except RuntimeError:
+                calls.append("thread")
+            return super().get(key)
+
+    calls = []
+    monkeypatch.setattr(session_cache.cache, "shared", Shared())
+    session_id = client.post("/session/start", json={}).json()["session_id"]
+    session_cache.cache.clear()  # as in a worker that did not create the session
+    assert client.post("/message", json={"session_id": session_id, "message": "hello"}).status_code == 200
+    assert calls and set(calls) == {"thread"}
+
+
+def test_session_start_is_rate_limited_per_client(client, monkeypatch):
+    monkeypatch.setattr(admission.controller, "rate_limits", True)
+    monkeypatch.setattr(admission.controller, "session_start_per_ip", admission.Limit(2, 60))
+    statuses = [client.post("/session/start", json={}).status_code for _ in range(3)]
+    assert statuses == [200, 200, 429]
+    refused = client.post("/session/start", json={})
+    assert int(refused.headers["retry-after"]) > 0
+
+
+def test_messages_are_rate_limited_per_session(client, monkeypatch):
+    monkeypatch.setattr(admission.controller, "rate_limits", True)
+    monkeypatch.setattr(admission.controller, "message_per_session", admission.Limit(1, 60))
+    session_id = client.post("/session/start", json={}).json()["session_id"]
+    other_id = client.post("/session/start", json={}).json()["session_id"]
+    assert client.post("/message", json={"session_id": session_id, "message": "hello"}).status_code == 200
+    assert client.post("/message", json={"session_id": session_id, "message": "hello"}).status_code == 429
+    assert client.post("/message", json={"session_id": other_id, "message": "hello"}).status_code == 200
+    # Crisis messages are never limited.
+    crisis = client.post("/message", json={"session_id": session_id, "message": "I want to end my life"})
+    assert crisis.status_code == 200 and crisis.json()["intent"] == "crisis"
+
+
+def test_overload_sheds_only_non_crisis_messages(client, monkeypatch):
+    session_id = client.post("/session/start", json={}).json()["session_id"]
+    monkeypatch.setattr(admission.controller, "shedding", True)
+    monkeypatch.setattr(admission.controller, "overloaded", lambda: "llm_queue")
+    shed = client.post("/message", json={"session_id": session_id, "message": "hello"})
+    assert shed.status_code == 503 and shed.headers["retry-after"] == "1"
+    assert client.post("/message/stream", json={"session_id": session_id, "message": "hello"}).status_code == 503
+    crisis = client.post("/message", json={"session_id": session_id, "message": "I want to end my life"})
+    assert crisis.status_code == 200 and crisis.json()["intent"] == "crisis"
+    stream = client.post("/message/stream", json={"session_id": session_id, "message": "I want to end my life"})
+    assert stream.status_code == 200 and '"crisis": true' in stream.text
+
+
+def test_reanswer_replaces_previous_score(client):
+    session_id = client.post("/session/start", json={}).json()["session_id"]
+    answer = {"session_id": session_id, "questionnaire": "PHQ9", "question_index": 0, "score": 1}
+    assert client.post("/questionnaire/answer", json=answer).status_code == 200
+    assert client.post("/questionnaire/answer", json=dict(answer, questionnaire="phq9", score=3)).status_code == 200
+    nxt = client.get("/questionnaire/next", params={"session_id": session_id, "questionnaire": "phq9"}).json()
+    assert nxt["question_index"] == 1
+    assert client.get("/route", params={"session_id": session_id}).json()["scores"] == {"phq9": 3, "gad7": 0}
+
+
+def test_export_formats(client):
+    client.post("/session/start", json={"email": "formats@example.com"})
+    ndjson = client.get("/export", params={"email": "formats@example.com", "format": "ndjson"})
+    assert ndjson.headers["content-type"].startswith("application/x-ndjson")
+    assert [line.split('"type": ')[1].split(",")[0] for line in ndjson.text.splitlines()] == ['"user"', '"sessions"']
+    assert client.get("/export", params={"email": "formats@example.com", "format": "xml"}).status_code == 400
+    assert client.get("/export", params={"email": "missing@example.com"}).status_code == 404
+    documented = client.get("/openapi.json").json()["paths"]["/export"]["get"]["responses"]["200"]["content"]
+    assert documented["application/json"]["schema"] == {"$ref": "#/components/schemas/ExportResponse"}
+    assert "application/x-ndjson" in documented
+
+
+def _events(body: str):
+    events = []
+    for block in body.strip().split("\n\n"):
+        name, data = block.split("\n")
+        events.append((name[len("event: "):], json.loads(data[len("data: "):])))
+    return events
+
+
+def test_message_stream_sends_tokens_then_result(client, monkeypatch):
+    buffered = []
+    monkeypatch.setattr(audit.sink, "_enqueue", lambda row: buffered.append(row) or True)
+    session_id = client.post("/session/start", json={}).json()["session_id"]
+    response = client.post("/message/stream", json={"session_id": session_id, "message": "I have been tired lately"})
+    assert response.headers["content-type"].startswith("text/event-stream")
+    events = _events(response.text)
+    assert events[0] == ("safety", {"crisis": False})
+    tokens = [data["text"] for name, data in events if name == "token"]
+    name, done = events[-1]
+    assert name == "done"
+    assert len(tokens) > 1 and "".join(tokens) == done["user_message"]
+    assert done["intent"] == "summary" and done["next_action"]["type"] == "continue"
+    assert [row["event"] for row in buffered] == ["session_started", "llm_called"]
+
+
+def test_message_stream_crisis_short_circuits(client, monkeypatch):
+    from app import llm
+
+    monkeypatch.setattr(llm.LLMService, "stream", lambda *args: pytest.fail("LLM must not be called"))
+    session_id = client.post("/session/start", json={"country": "UK"}).json()["session_id"]
+    response = client.post("/message/stream", json={"session_id": session_id, "message": "I want to end my life"})
+    events = _events(response.text)
+    assert [name for name, _ in events] == ["safety", "done"]
+    assert events[0][1] == {"crisis": True}
+    assert events[1][1]["intent"] == "crisis"
+    assert "Emergency number: 999" in events[1][1]["user_message"]
+
+
+def test_batch_answers_record_in_one_commit_and_route(client, monkeypatch):
+    from sqlalchemy import event
+
+    from app import database
+
+    session_id = client.post("/session/start", json={}).json()["session_id"]
+    answers = [{"questionnaire": "PHQ9", "question_index": i, "score": 2} for i in range(9)]
+    answers += [{"questionnaire": "gad7", "question_index": i, "score": 2} for i in range(7)]
+    answers.append({"questionnaire": "gad7", "question_index": 0, "score": 0})  # last answer wins
+
+    engine = database.async_engine.sync_engine if database.async_engine is not None else database.engine
+    commits = []
+    listener = lambda conn: commits.append(1)  # noqa: E731
+    event.listen(engine, "commit", listener)
+    try:
+        response = client.post(
+            "/questionnaire/answers", json={"session_id": session_id, "answers": answers, "include_route": True}
+        )
+    finally:
+        event.remove(engine, "commit", listener)
+    assert response.status_code == 200
+    assert len(commits) == 1
+    body = response.json()
+    assert body["status"] == "recorded"
+    assert body["route"]["scores"] == {"phq9": 18, "gad7": 12}
+    assert body["route"]["bucket"] == "high"
+    done = client.get("/questionnaire/next", params={"session_id": session_id, "questionnaire": "gad7"})
+    assert done.status_code == 404
+
+
+def test_async_db_mode_serves_the_intake_flow(client):
+    pytest.importorskip("aiosqlite")
+    from sqlalchemy import event
+    from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+    from sqlalchemy.orm import sessionmaker
+    from sqlalchemy.pool import NullPool
+
+    from app import config
+    from app.database import DB, async_database_url, get_db
+
+    # What get_db yields with ASYNC_DB=true, against the test database.
+    async_engine = create_async_engine(async_database_url(config.DATABASE_URL), poolclass=NullPool)
+    async_sessions = sessionmaker(async_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False)
+
+    async def get_async_db():
+        async with async_sessions() as async_session:
+            yield DB(async_session=async_session)
+
+    statements = []
+    listener = lambda *args: statements.append(1)  # noqa: E731
+    event.listen(async_engine.sync_engine, "before_cursor_execute", listener)
+    app.dependency_overrides[get_db] = get_async_db
+    try:
+        session_id = client.post("/session/start", json={"country": "UK"}).json()["session_id"]
+        reply = client.post("/message", json={"session_id": session_id, "message": "I have been tired lately"})
+        assert reply.json()["intent"] == "summary"
+        for questionnaire, count in (("phq9", 9), ("gad7", 7)):
+            for _ in range(count):
+                nxt = client.get("/questionnaire/next", params={"session_id": session_id, "questionnaire": questionnaire})
+                answer = {
+                    "session_id": session_id,
+                    "questionnaire": questionnaire,
+                    "question_index": nxt.json()["question_index"],
+                    "score": 1,
+                }
+                assert client.post("/questionnaire/answer", json=answer).json() == {"status": "recorded"}
+        route = client.get("/route", params={"session_id": session_id}).json()
+    finally:
+        app.dependency_overrides.pop(get_db)
+        event.remove(async_engine.sync_engine, "before_cursor_execute", listener)
+    assert route["scores"] == {"phq9": 9, "gad7": 7}
+    assert route["bucket"] == "low"
+    assert statements
+
+
+def test_cancelled_db_run_finishes_before_the_session_is_released():
+    import asyncio
+    import threading
+
+    from app.database import DB
+
+    started, release, events = threading.Event(), threading.Event(), []
+
+    def work(session):
+        started.set()
+        release.wait(5)
+        events.append("work done")
+
+    async def request():
+        task = asyncio.create_task(DB(session=object()).run(work))
+        await asyncio.get_running_loop().run_in_executor(None, started.wait, 5)
+        task.cancel()
+        await asyncio.sleep(0.05)
+        assert not task.done()  # still waiting for the thread
+        release.set()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        events.append("session closed")
+
+    asyncio.run(request())
+    assert events == ["work done", "session closed"]
+
+
+def test_answer_rejects_out_of_range_question_index(client):
+    session_id = client.post("/session/start", json={}).json()["session_id"]
+    for index in (-1, 9):
+        answer = {"session_id": session_id, "questionnaire": "phq9", "question_index": index, "score": 1}
+        response = client.post("/questionnaire/answer", json=answer)
+        assert response.status_code == 400
+        assert response.json()["detail"] == "Invalid question index"
+
+
+def test_batch_answers_report_errors_per_item(client):
+    session_id = client.post("/session/start", json={}).json()["session_id"]
+    answers = [
+        {"questionnaire": "phq9", "question_index": 0, "score": 1},
+        {"questionnaire": "bdi", "question_index": 0, "score": 1},
+        {"questionnaire": "gad7", "question_index": 7, "score": 1},
+        {"questionnaire": "gad7", "question_index": 1, "score": 4},
+    ]
+    response = client.post("/questionnaire/answers", json={"session_id": session_id, "answers": answers})
+    assert response.status_code == 422
+    assert [(e["item"], e["error"]) for e in response.json()["detail"]] == [
+        (1, "Unknown questionnaire"),
+        (2, "Invalid question index"),
+        (3, "Score must be between 0 and 3"),
+    ]
+    # Nothing from the rejected batch was stored.
+    assert client.get("/route", params={"session_id": session_id}).json()["scores"] == {"phq9": 0, "gad7": 0}
+
+
+def test_questionnaire_language_variants_and_aliases(client):
+    session_id = client.post("/session/start", json={}).json()["session_id"]
+    params = {"session_id": session_id, "questionnaire": "PHQ-2", "language": "tr"}
+    nxt = client.get("/questionnaire/next", params=params).json()
+    assert nxt["question"] == "Bir şeyler yapmaya karşı az ilgi duyma veya bunlardan zevk alamama"
+    answer = {"session_id": session_id, "questionnaire": "phq 2", "question_index": 0, "score": 3}
+    assert client.post("/questionnaire/answer", json=answer).status_code == 200
+    assert client.get("/questionnaire/next", params=params).json()["question_index"] == 1
+    assert client.get("/route", params={"session_id": session_id}).json()["scores"] == {"phq9": 0, "gad7": 0, "phq2": 3}
+    unknown = client.get("/questionnaire/next", params={"session_id": session_id, "questionnaire": "bdi"})
+    assert unknown.status_code == 400
+
+
+def test_metrics_report_routes_stages_and_queries(client):
+    from app import config
+
+    if not config.METRICS_ENABLED:
+        pytest.skip("METRICS_ENABLED=false")
+    session_id = client.post("/session/start", json={}).json()["session_id"]
+    client.post("/message", json={"session_id": session_id, "message": "I want to end my life"})
+    client.get("/route", params={"session_id": session_id})
+    response = client.get("/metrics")
+    assert response.headers["content-type"].startswith("text/plain")
+    text = response.text
+    assert 'http_request_duration_seconds_count{method="GET",route="/route",status="200"}' in text
+    assert session_id not in text
+    assert 'stage_duration_seconds_count{handler="message",stage="crisis_detection"}' in text
+    assert 'stage_duration_seconds_count{handler="route",stage="load_scores"}' in text
+    assert 'db_queries_per_request_count{route="/message"}' in text
+    assert 'crisis_overrides_total{endpoint="message"}' in text
+    assert 'write_behind{writer="audit",stat="queue_depth"}' in text
+    assert 'write_behind{writer="transcript",stat="max_batch_ms"}' in text
+
+
+def test_disclaimer_header_and_static_bodies(client):
+    from app.safety import DISCLAIMER
+
+    root = client.get("/")
+    assert root.headers["x-disclaimer"] == DISCLAIMER
+    assert root.json() == {"message": "Mental Health Intake + Routing Assistant", "disclaimer": DISCLAIMER}
+    missing = client.get("/route", params={"session_id": "00000000-0000-0000-0000-000000000000"})
+    assert missing.status_code == 404
+    assert missing.headers["x-disclaimer"] == DISCLAIMER
+    session_id = client.post("/session/start", json={}).json()["session_id"]
+    reply = client.post("/message", json={"session_id": session_id, "message": "hello"})
+    assert reply.headers["content-type"] == "application/json"
+    assert set(reply.json()) == {"intent", "user_message", "extracted_entities", "next_action"}
@@ -0,0 +1,140 @@
+import asyncio
+import threading
+import time
+import uuid
+
+import pytest
+
+pytest.importorskip("sqlalchemy")
+
+from sqlalchemy import func, select  # noqa: E402
+from sqlalchemy.exc import OperationalError  # noqa: E402
+
+from app.audit import AuditSink  # noqa: E402
+from app.models import AuditLog  # noqa: E402
+
+
+def _count(engine) -> int:
+    with engine.connect() as conn:
+        return conn.execute(select(func.count()).select_from(AuditLog.__table__)).scalar()
+
+
+def test_sink_writes_synchronously_when_not_running(engine):
+    sink = AuditSink(engine)
+    sink.record(uuid.uuid4(), "routing", {"bucket": "low"})
+    assert _count(engine) == 1
+    assert sink.stats()["sync_writes"] == 1
+
+
+def test_sink_batches_by_size(engine):
+    sink = AuditSink(engine, batch_size=10, flush_interval=60)
+    sink.start()
+    try:
+        for _ in range(25):
+            sink.record(uuid.uuid4(), "llm_called", {})
+        sink.flush()
+        assert _count(engine) == 25
+        stats = sink.stats()
+        assert stats["enqueued"] == 25 and stats["written"] == 25
+        assert stats["batches"] == 3 and stats["queue_depth"] == 0
+    finally:
+        sink.stop()
+
+
+def test_sink_flushes_everything_on_stop(engine):
+    sink = AuditSink(engine, batch_size=1000, flush_interval=60)
+    sink.start()
+    for _ in range(50):
+        sink.record(uuid.uuid4(), "routing", {})
+    sink.stop()
+    assert _count(engine) == 50
+    assert not sink.running
+
+
+def test_sink_applies_backpressure_when_full(engine):
+    sink = AuditSink(engine, max_queue=1, batch_size=1000, flush_interval=60)
+    sink._run = sink._stopping.wait  # stalled flusher
+    sink.start()
+    try:
+        for _ in range(5):
+            sink.record(uuid.uuid4(), "routing", {})
+        assert sink.stats()["sync_writes"] == 4
+        assert _count(engine) == 4
+    finally:
+        sink.stop()
+    assert _count(engine) == 5
+
+
+def test_sink_drops_rejected_rows_and_keeps_the_rest(engine):
+    sink = AuditSink(engine, batch_size=1000, flush_interval=60)
+    poison = {"id": uuid.uuid4(), "session_id": None, "event": "routing", "detail": {}, "created_at": None}
+    sink.put(poison)  # written synchronously; queued again below as a duplicate key
+    sink.start()
+    try:
+        for _ in range(3):
+            sink.record(uuid.uuid4(), "routing", {})
+        sink.put(poison)
+        for _ in range(4):
+            sink.record(uuid.uuid4(), "routing", {})
+        sink.flush()
+        assert _count(engine) == 8
+        assert sink.stats()["rejected"] == 1
+        sink.record(uuid.uuid4(), "routing", {})
+        sink.flush()
+        assert _count(engine) == 9
+    finally:
+        sink.stop()
+
+
+def test_sink_retries_transient_errors_without_duplicates(engine, monkeypatch):
+    sink = AuditSink(engine, batch_size=1000, flush_interval=0.01)
+    write = sink._write
+    failures = [OperationalError("INSERT", {}, Exception("database is locked"))]
+
+    def flaky(rows):
+        if failures:
+            raise failures.pop()
+        write(rows)
+
+    monkeypatch.setattr(sink, "_write", flaky)
+    sink.start()
+    try:
+        for _ in range(5):
+            sink.record(uuid.uuid4(), "routing", {})
+        sink.flush()
+        assert _count(engine) == 5
+        assert sink.stats()["failed_batches"] == 1 and sink.stats()["rejected"] == 0
+    finally:
+        sink.stop()
+
+
+def test_async_record_writes_off_the_event_loop(engine, monkeypatch):
+    sink = AuditSink(engine)  # not running: every row is a synchronous write
+    write = sink._write
+    threads = []
+    monkeypatch.setattr(sink, "_write", lambda rows: threads.append(threading.current_thread()) or write(rows))
+    asyncio.run(sink.arecord(uuid.uuid4(), "llm_called", {}))
+    assert _count(engine) == 1
+    assert threads and threads[0] is not threading.main_thread()
+
+
+def test_async_record_is_written_when_the_request_is_cancelled(engine, monkeypatch):
+    sink = AuditSink(engine)
+    write, started = sink._write, threading.Event()
+
+    def slow_write(rows):
+        started.set()
+        time.sleep(0.1)
+        write(rows)
+
+    monkeypatch.setattr(sink, "_write", slow_write)
+
+    async def request():
+        task = asyncio.create_task(sink.arecord(uuid.uuid4(), "llm_called", {}))
+        await asyncio.get_running_loop().run_in_executor(None, started.wait, 5)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        assert _count(engine) == 1
+
+    asyncio.run(request())
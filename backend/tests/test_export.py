@@ -0,0 +1,88 @@
+import json
+import tracemalloc
+import uuid
+from datetime import datetime
+
+import pytest
+
+pytest.importorskip("sqlalchemy")
+
+from sqlalchemy import create_engine, insert  # noqa: E402
+from sqlalchemy.orm import sessionmaker  # noqa: E402
+
+from app import export  # noqa: E402
+from app.database import Base  # noqa: E402
+from app.models import AuditLog, Message, QuestionnaireResponse, Session as DBSession, User  # noqa: E402
+
+MESSAGE_COUNT = 100_000
+
+
+@pytest.fixture(scope="module")
+def factory(tmp_path_factory):
+    engine = create_engine(f"sqlite:///{tmp_path_factory.mktemp('export') / 'export.db'}")
+    Base.metadata.create_all(bind=engine)
+    user_id, session_id, other_session = uuid.uuid4(), uuid.uuid4(), uuid.uuid4()
+    now = datetime(2026, 1, 1)
+    with engine.begin() as conn:
+        conn.execute(insert(User.__table__).values(id=user_id, email="long@example.com", consent=True))
+        conn.execute(insert(DBSession.__table__), [{"id": session_id, "user_id": user_id, "country": "TR"}, {"id": other_session, "user_id": None, "country": "UK"}])
+        conn.execute(
+            insert(Message.__table__),
+            [
+                {"id": uuid.uuid4(), "session_id": session_id, "sender": "user", "content": f"message {i} " + "x" * 200, "created_at": now}
+                for i in range(MESSAGE_COUNT)
+            ],
+        )
+        conn.execute(insert(Message.__table__).values(id=uuid.uuid4(), session_id=other_session, sender="user", content="not mine"))
+        conn.execute(
+            insert(QuestionnaireResponse.__table__).values(
+                id=uuid.uuid4(), session_id=session_id, questionnaire="phq9", question_index=0, score=2
+            )
+        )
+        conn.execute(
+            insert(AuditLog.__table__).values(id=uuid.uuid4(), session_id=session_id, event="routing", detail={"bucket": "low"}, created_at=now)
+        )
+    return sessionmaker(bind=engine)
+
+
+def _user(factory):
+    with factory() as db:
+        return export.find_user(db, "long@example.com")
+
+
+def test_json_export_matches_export_response_shape(factory):
+    document = json.loads(b"".join(export.stream_export(factory, _user(factory), "json")))
+    assert list(document) == ["user", "sessions", "audit_logs", "messages", "questionnaire_responses"]
+    assert document["user"]["email"] == "long@example.com"
+    assert len(document["sessions"]) == 1
+    assert len(document["messages"]) == MESSAGE_COUNT
+    assert document["questionnaire_responses"] == [
+        {"session_id": document["sessions"][0]["id"], "questionnaire": "phq9", "question_index": 0, "score": 2}
+    ]
+    assert document["audit_logs"][0]["detail"] == {"bucket": "low"}
+
+
+def test_ndjson_export_has_one_record_per_line(factory):
+    types = [json.loads(line)["type"] for line in b"".join(export.stream_export(factory, _user(factory), "ndjson")).splitlines()]
+    assert types[0] == "user"
+    assert types.count("messages") == MESSAGE_COUNT
+    assert types.count("sessions") == types.count("audit_logs") == types.count("questionnaire_responses") == 1
+
+
+def test_export_memory_stays_bounded(factory):
+    user = _user(factory)
+    tracemalloc.start()
+    try:
+        exported = 0
+        for chunk in export.stream_export(factory, user, "ndjson"):
+            exported += len(chunk)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    assert exported > 20 * 1024 * 1024
+    assert peak < 8 * 1024 * 1024
+
+
+def test_unknown_user_has_no_header(factory):
+    with factory() as db:
+        assert export.find_user(db, "nobody@example.com") == {}
@@ -0,0 +1,150 @@
+import asyncio
+
+import pytest
+
+from app.cache import TTLCache
+from app.llm import FALLBACK_RESULT, LLMService, MockLLM
+
+
+class SlowLLM:
+    def __init__(self, delay: float):
+        self.delay = delay
+        self.calls = 0
+        self.active = 0
+        self.peak = 0
+
+    async def generate(self, prompt: str, context=()) -> dict:
+        self.calls += 1
+        self.active += 1
+        self.peak = max(self.peak, self.active)
+        try:
+            await asyncio.sleep(self.delay)
+        finally:
+            self.active -= 1
+        return {**FALLBACK_RESULT, "user_message": prompt}
+
+    async def aclose(self) -> None:
+        pass
+
+
+def test_mock_llm_returns_summary():
+    service = LLMService(MockLLM())
+    assert asyncio.run(service.generate("hello")) == FALLBACK_RESULT
+
+
+def test_deadline_falls_back_to_summary():
+    service = LLMService(SlowLLM(delay=1.0), timeout=0.05)
+    assert asyncio.run(service.generate("hello")) is FALLBACK_RESULT
+    assert service.stats["timeouts"] == 1
+
+
+def test_concurrency_is_capped():
+    client = SlowLLM(delay=0.02)
+    service = LLMService(client, timeout=5, max_concurrency=3)
+
+    async def burst():
+        return await asyncio.gather(*(service.generate(f"turn {i}") for i in range(12)))
+
+    results = asyncio.run(burst())
+    assert [r["user_message"] for r in results] == [f"turn {i}" for i in range(12)]
+    assert client.peak == 3
+
+
+def test_queue_depth_counts_calls_waiting_for_a_slot():
+    service = LLMService(SlowLLM(delay=0.05), max_concurrency=2)
+
+    async def burst():
+        calls = [asyncio.ensure_future(service.generate(f"turn {i}")) for i in range(5)]
+        await asyncio.sleep(0.01)
+        depth = service.queue_depth
+        await asyncio.gather(*calls)
+        return depth
+
+    assert asyncio.run(burst()) == 3
+    assert service.in_flight == 0 and service.queue_depth == 0
+
+
+def test_cache_is_keyed_on_normalized_prompt():
+    client = SlowLLM(delay=0)
+    service = LLMService(client, cache=TTLCache(16, ttl=60))
+
+    async def turns():
+        return [await service.generate(prompt) for prompt in ("Teşekkürler", "  TEŞEKKÜRLER ", "something else")]
+
+    first, second, _ = asyncio.run(turns())
+    assert second is first
+    assert client.calls == 2
+    assert service.stats["cache_hits"] == 1
+
+
+def test_calls_with_context_bypass_the_cache():
+    client = SlowLLM(delay=0)
+    service = LLMService(client, cache=TTLCache(16, ttl=60))
+    context = [{"role": "user", "content": "I cannot sleep"}]
+
+    async def turns():
+        return [await service.generate("thanks", context) for _ in range(2)]
+
+    asyncio.run(turns())
+    assert client.calls == 2
+    assert service.stats["cache_hits"] == 0
+
+
+def test_ttl_cache_expires_and_evicts():
+    now = [0.0]
+    cache = TTLCache(2, ttl=10, clock=lambda: now[0])
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1
+    cache.set("c", 3)  # evicts "b", the least recently used
+    assert cache.get("b") is None
+    now[0] = 11
+    assert cache.get("a") is None
+
+
+def test_http_client_against_fake_provider():
+    httpx = pytest.importorskip("httpx")
+    pytest.importorskip("fastapi")
+    from app.llm import HTTPLLM
+    from tests.benchmarks.fake_llm import create_app
+
+    async def call():
+        service = LLMService(HTTPLLM("http://fake/generate", transport=httpx.ASGITransport(app=create_app(latency=0))))
+        try:
+            return await service.generate("I have been tired")
+        finally:
+            await service.aclose()
+
+    result = asyncio.run(call())
+    assert result["intent"] == "summary"
+    assert "17 characters" in result["user_message"]
+
+
+def _collect(service: LLMService, prompt: str):
+    async def run():
+        return [item async for item in service.stream(prompt)]
+
+    return asyncio.run(run())
+
+
+def test_stream_yields_chunks_then_result():
+    items = _collect(LLMService(MockLLM(latency=0, chunk_delay=0)), "hello")
+    *tokens, result = items
+    assert result == FALLBACK_RESULT
+    assert "".join(tokens) == FALLBACK_RESULT["user_message"]
+
+
+def test_stream_deadline_keeps_sent_text():
+    service = LLMService(MockLLM(latency=0, chunk_delay=0.2), timeout=0.1)
+    *tokens, result = _collect(service, "hello")
+    assert tokens == [FALLBACK_RESULT["user_message"].split(" ")[0] + " "]
+    assert result["user_message"] == "".join(tokens)
+    assert result["intent"] == "summary"
+    assert service.stats["timeouts"] == 1
+
+
+def test_stream_falls_back_before_first_chunk():
+    service = LLMService(MockLLM(latency=1.0), timeout=0.05)
+    *tokens, result = _collect(service, "hello")
+    assert result is FALLBACK_RESULT
+    assert "".join(tokens) == FALLBACK_RESULT["user_message"]
@@ -0,0 +1,42 @@
+from app import metrics
+
+
+def test_histogram_renders_cumulative_buckets():
+    registry = metrics.Registry()
+    histogram = registry.register(metrics.Histogram("latency_seconds", "Latency.", ("route",), (0.1, 1.0)))
+    for value in (0.05, 0.5, 0.5, 3.0):
+        histogram.observe(value, "/route")
+    lines = registry.render().splitlines()
+    assert lines[:2] == ["# HELP latency_seconds Latency.", "# TYPE latency_seconds histogram"]
+    assert lines[2:] == [
+        'latency_seconds_bucket{route="/route",le="0.1"} 1',
+        'latency_seconds_bucket{route="/route",le="1.0"} 3',
+        'latency_seconds_bucket{route="/route",le="+Inf"} 4',
+        'latency_seconds_sum{route="/route"} 4.05',
+        'latency_seconds_count{route="/route"} 4',
+    ]
+    assert histogram.count("/route") == 4
+
+
+def test_counter_and_gauge_escape_label_values():
+    registry = metrics.Registry()
+    counter = registry.register(metrics.Counter("events_total", "Events.", ("name",)))
+    counter.inc('say "hi"')
+    counter.inc('say "hi"', amount=2)
+    registry.register(metrics.Gauge("depth", "Depth.", ("queue",), lambda: {("audit",): 7}))
+    text = registry.render()
+    assert 'events_total{name="say \\"hi\\""} 3.0' in text
+    assert 'depth{queue="audit"} 7.0' in text
+
+
+def test_stage_records_duration(monkeypatch):
+    monkeypatch.setattr(metrics.config, "METRICS_ENABLED", True)
+    before = metrics.STAGE_SECONDS.count("test", "step")
+    with metrics.stage("test", "step"):
+        pass
+    assert metrics.STAGE_SECONDS.count("test", "step") == before + 1
+
+    monkeypatch.setattr(metrics.config, "METRICS_ENABLED", False)
+    with metrics.stage("test", "step"):
+        pass
+    assert metrics.STAGE_SECONDS.count("test", "step") == before + 1
@@ -0,0 +1,72 @@
+import json
+import os
+
+import pytest
+
+from app import questionnaires
+
+
+def _write(path, mtime, **overrides):
+    data = {
+        "title": "Mini",
+        "score_range": [0, 3],
+        "thresholds": {"low": 0, "moderate": 2, "high": 4},
+        "items": {"en": ["One", "Two"], "TR": ["Bir", "İki"]},
+    }
+    data.update(overrides)
+    path.write_text(json.dumps(data), encoding="utf-8")
+    os.utime(path, (mtime, mtime))
+
+
+@pytest.fixture
+def registry(tmp_path):
+    _write(tmp_path / "mini-2.json", 1_000)
+    reg = questionnaires.QuestionnaireRegistry(tmp_path, reload_interval=0)
+    reg.load()
+    return reg
+
+
+def test_names_and_languages_are_normalized(registry):
+    mini = registry.get("MINI 2")
+    assert registry.get("mini-2") is mini and mini.name == "mini2"
+    assert mini.items_for("tr-TR") == ("Bir", "İki")
+    assert mini.items_for("de") == ("One", "Two")
+    assert mini.max_score == 6
+    with pytest.raises(ValueError, match="Unknown questionnaire"):
+        registry.get("bdi")
+
+
+def test_definitions_are_immutable(registry):
+    mini = registry.get("mini2")
+    with pytest.raises(AttributeError):
+        mini.title = "Other"
+    with pytest.raises(TypeError):
+        mini.items["en"] = ("Changed",)
+
+
+def test_levels_use_cutoffs(registry):
+    mini = registry.get("mini2")
+    assert mini.cutoffs == (0, 2, 4)
+    assert [mini.level_for(score) for score in range(7)] == ["low", "low", "moderate", "moderate", "high", "high", "high"]
+
+
+def test_reload_picks_up_changes_and_keeps_last_good_version(registry, tmp_path):
+    generation = registry.generation
+    _write(tmp_path / "mini-2.json", 2_000, thresholds={"low": 0, "high": 3})
+    _write(tmp_path / "extra.json", 2_000, items={"en": ["A"], "tr": ["B", "C"]})  # invalid: item counts differ
+    registry.load()
+    assert registry.get("mini2").levels == ("low", "high")
+    assert registry.generation != generation
+    with pytest.raises(ValueError):
+        registry.get("extra")
+
+    generation = registry.generation
+    registry.load()
+    assert registry.generation == generation
+
+
+def test_shipped_definitions():
+    assert [q.name for q in questionnaires.registry.all()][:2] == ["phq9", "gad7"]
+    assert len(questionnaires.get_questionnaire("PHQ-9")) == 9
+    assert len(questionnaires.get_questionnaire("gad7", "tr")) == 7
+    assert questionnaires.get_questionnaire("phq2", "en") == questionnaires.get_questionnaire("phq9", "en")[:2]
@@ -0,0 +1,94 @@
+import csv
+import uuid
+
+import pytest
+
+pytest.importorskip("numpy")
+pytest.importorskip("sqlalchemy")
+
+import numpy as np  # noqa: E402
+from sqlalchemy import create_engine, insert  # noqa: E402
+
+from app import questionnaires, rescore, routing  # noqa: E402
+from app.database import Base  # noqa: E402
+from app.models import QuestionnaireResponse, Session as DBSession  # noqa: E402
+
+
+def test_cutoff_ranks_match_level_for():
+    for questionnaire in questionnaires.registry.all():
+        cutoffs = rescore.Cutoffs.of(questionnaire)
+        totals = np.arange(questionnaire.max_score + 1)
+        expected = [questionnaires.LEVELS.index(questionnaire.level_for(int(total))) for total in totals]
+        assert cutoffs.rank(totals).tolist() == expected
+
+
+def test_parse_overrides():
+    assert rescore.parse_overrides(["PHQ-9.moderate=12", "phq9.high=18"]) == {"phq9": {"moderate": 12, "high": 18}}
+    with pytest.raises(ValueError):
+        rescore.parse_overrides(["phq9.severe=20"])
+
+
+def test_cli_reports_bad_overrides_as_usage_errors(tmp_path, monkeypatch, capsys):
+    monkeypatch.setattr("sys.argv", ["rescore", "--output", str(tmp_path / "r.csv"), "--set", "bdi2.moderate=12"])
+    with pytest.raises(SystemExit) as exc:
+        rescore.main()
+    assert exc.value.code == 2
+    assert "unknown questionnaires: bdi2" in capsys.readouterr().err
+
+
+def _id(n: int) -> uuid.UUID:
+    # The hex form must contain a letter: SQLite gives the UUID column NUMERIC
+    # affinity and would store an all-digit id as an integer.
+    return uuid.UUID(int=0xA << 100 | n)
+
+
+@pytest.fixture
+def url(tmp_path):
+    url = f"sqlite:///{tmp_path / 'rescore.db'}"
+    engine = create_engine(url)
+    Base.metadata.create_all(bind=engine)
+    rows = {
+        # phq9 total 11 (moderate), drops to low with moderate=12
+        _id(1): ("18+", {"phq9": [3, 3, 3, 2]}),
+        # phq9 total 12 stays moderate; under 18 keeps the minor suffix
+        _id(2): ("under 18", {"phq9": [3, 3, 3, 3], "gad7": [1]}),
+        # phq2 is optional and counts once answered (total 3: moderate under both)
+        _id(3): ("18+", {"phq2": [1, 2], "gad7": [3, 3, 3, 2]}),
+    }
+    with engine.begin() as conn:
+        for session_id, (age_band, answers) in rows.items():
+            conn.execute(insert(DBSession.__table__).values(id=session_id, age_band=age_band))
+            for name, scores in answers.items():
+                conn.execute(
+                    insert(QuestionnaireResponse.__table__),
+                    [
+                        {"id": uuid.uuid4(), "session_id": session_id, "questionnaire": name, "question_index": i, "score": s}
+                        for i, s in enumerate(scores)
+                    ],
+                )
+    return url, rows
+
+
+@pytest.mark.parametrize("workers, chunk_size", [(1, 2), (1, 1000), (3, 2)])
+def test_rescore_reports_bucket_shifts(tmp_path, url, workers, chunk_size):
+    url, rows = url
+    output = tmp_path / "shifts.csv"
+    stats = rescore.rescore(
+        questionnaires.registry.all(),
+        output,
+        overrides={"phq9": {"moderate": 12}},
+        url=url,
+        workers=workers,
+        chunk_size=chunk_size,
+        include_unchanged=True,
+    )
+    with open(output, newline="") as f:
+        report = {row["session_id"]: row for row in csv.DictReader(f)}
+    assert stats.sessions == 3 and stats.changed == 1
+    assert set(report) == {str(session_id) for session_id in rows}
+    for session_id, (age_band, answers) in rows.items():
+        totals = {name: sum(scores) for name, scores in answers.items()}
+        assert report[str(session_id)]["old_bucket"] == routing._route_uncached(totals, age_band)["bucket"]
+    assert report[str(_id(1))]["phq9"] == "11"
+    assert (report[str(_id(1))]["old_bucket"], report[str(_id(1))]["new_bucket"]) == ("moderate", "low")
+    assert report[str(_id(2))]["new_bucket"] == "moderate_minor"
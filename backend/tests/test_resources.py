@@ -0,0 +1,69 @@
+import json
+import os
+
+import pytest
+
+from app import file_registry, resources
+
+
+def _write(path, emergency, mtime=None):
+    path.write_text(json.dumps({"emergency_number": emergency, "crisis_lines": ["Line"], "public_health": []}))
+    if mtime is not None:
+        os.utime(path, (mtime, mtime))
+
+
+@pytest.fixture
+def registry(tmp_path):
+    _write(tmp_path / "default.json", "112", mtime=1_000)
+    _write(tmp_path / "uk.json", "999", mtime=1_000)
+    reg = resources.ResourceRegistry(tmp_path, reload_interval=0)
+    reg.load()
+    return reg
+
+
+def test_registry_falls_back_to_default(registry):
+    assert registry.get("UK").entry.emergency_number == "999"
+    assert registry.get("xx").country == "default"
+    assert registry.countries() == ("default", "uk")
+
+
+def test_registry_precomputes_crisis_text_and_etag(registry):
+    entry = registry.get("uk")
+    assert "Emergency number: 999" in entry.crisis_text
+    assert json.loads(entry.body)["emergency_number"] == "999"
+    assert entry.etag.startswith('"') and entry.etag == registry.get("uk").etag
+
+
+def test_registry_reloads_changed_and_new_files(registry, tmp_path):
+    before = registry.get("uk")
+    _write(tmp_path / "uk.json", "111", mtime=2_000)
+    _write(tmp_path / "tr.json", "112", mtime=2_000)
+    after = registry.get("uk")
+    assert after.entry.emergency_number == "111"
+    assert after.etag != before.etag
+    assert registry.get("tr").country == "tr"
+    assert registry.get("default") is registry.get("default")
+
+
+def test_registry_keeps_last_good_version_on_invalid_file(registry, tmp_path):
+    (tmp_path / "uk.json").write_text("{not json")
+    os.utime(tmp_path / "uk.json", (3_000, 3_000))
+    assert registry.get("uk").entry.emergency_number == "999"
+
+
+def test_registry_survives_files_vanishing_mid_scan(registry, tmp_path, monkeypatch):
+    _write(tmp_path / "uk.json", "111", mtime=4_000)
+    _write(tmp_path / "tr.json", "112", mtime=4_000)
+
+    def vanished(path, *args, **kwargs):
+        raise FileNotFoundError(path)
+
+    monkeypatch.setattr(file_registry, "open", vanished, raising=False)
+    registry.load()
+    assert registry.get("uk").entry.emergency_number == "999"  # last good version
+    assert registry.countries() == ("default", "uk")  # nothing to fall back to for tr
+
+
+def test_shipped_resources_are_valid():
+    resources.registry.load()
+    assert {"default", "tr", "uk"} <= set(resources.registry.countries())
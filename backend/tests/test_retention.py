@@ -0,0 +1,131 @@
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta
+
+import pytest
+
+pytest.importorskip("sqlalchemy")
+
+from sqlalchemy import func, insert, select  # noqa: E402
+from sqlalchemy.orm import sessionmaker  # noqa: E402
+
+from app import scores, session_cache, transcripts  # noqa: E402
+from app.models import AuditLog, Message, QuestionnaireResponse, Session as DBSession, SessionScore, TranscriptTurn  # noqa: E402
+from app.retention import Purger, RetentionScheduler  # noqa: E402
+
+NOW = datetime(2026, 6, 1)
+OLD = NOW - timedelta(days=60)
+CUTOFF = NOW - timedelta(days=30)
+
+
+def _seed_session(engine, created_at, message_times, answers=()):
+    session_id = uuid.uuid4()
+    with engine.begin() as conn:
+        conn.execute(insert(DBSession.__table__).values(id=session_id, created_at=created_at))
+        for when in message_times:
+            conn.execute(insert(Message.__table__).values(id=uuid.uuid4(), session_id=session_id, content="hi", created_at=when))
+            conn.execute(insert(AuditLog.__table__).values(id=uuid.uuid4(), session_id=session_id, event="llm_called", created_at=when))
+            conn.execute(
+                insert(TranscriptTurn.__table__).values(
+                    id=transcripts.ids.next(), session_id=session_id, sender=transcripts.USER, content="hi", created_at=when
+                )
+            )
+        for idx, (score, when) in enumerate(answers):
+            conn.execute(
+                insert(QuestionnaireResponse.__table__).values(
+                    id=uuid.uuid4(), session_id=session_id, questionnaire="phq9", question_index=idx, score=score, created_at=when
+                )
+            )
+    with sessionmaker(bind=engine)() as db:
+        scores.rebuild(db)
+    return session_id
+
+
+def _count(engine, model) -> int:
+    with engine.connect() as conn:
+        return conn.execute(select(func.count()).select_from(model.__table__)).scalar()
+
+
+@pytest.fixture
+def seeded(engine):
+    return {
+        "expired": _seed_session(engine, OLD, [OLD] * 5, answers=[(2, OLD), (3, OLD)]),
+        "active": _seed_session(engine, OLD, [OLD, NOW], answers=[(1, OLD), (2, NOW)]),
+        "recent": _seed_session(engine, NOW, [NOW] * 3),
+    }
+
+
+def test_dry_run_counts_without_deleting(engine, seeded):
+    stats = Purger(engine, chunk_size=2).run(cutoff=CUTOFF, dry_run=True)
+    assert stats.deleted == {"messages": 6, "transcript_turns": 6, "questionnaire_responses": 3, "audit_logs": 6, "sessions": 1}
+    assert _count(engine, Message) == 10
+
+
+def test_purge_deletes_expired_rows_in_chunks(engine, seeded):
+    progress = []
+    stats = Purger(engine, chunk_size=2, progress=lambda table, rows, _: progress.append((table, rows))).run(cutoff=CUTOFF)
+    assert stats.deleted == {"messages": 6, "transcript_turns": 6, "questionnaire_responses": 3, "audit_logs": 6, "sessions": 1}
+    assert all(rows <= 2 for _, rows in progress)
+    assert stats.chunks == len(progress)
+
+    with engine.connect() as conn:
+        remaining_sessions = set(conn.execute(select(DBSession.id)).scalars())
+        aggregates = conn.execute(select(SessionScore.session_id, SessionScore.total, SessionScore.answered_mask)).all()
+    assert remaining_sessions == {seeded["active"], seeded["recent"]}
+    assert _count(engine, Message) == 4
+    assert _count(engine, TranscriptTurn) == 4
+    # The surviving answer of the active session is index 1 (score 2).
+    assert aggregates == [(seeded["active"], 2, 0b10)]
+
+
+def test_purge_is_idempotent(engine, seeded):
+    Purger(engine).run(cutoff=CUTOFF)
+    assert sum(Purger(engine).run(cutoff=CUTOFF).deleted.values()) == 0
+
+
+def test_purge_invalidates_cached_sessions(engine, seeded):
+    cache = session_cache.SessionCache(maxsize=10, ttl=60)
+    for session_id in seeded.values():
+        cache.put(session_cache.SessionInfo(session_id, "TR", "TR", "18+"))
+    Purger(engine, cache=cache).run(cutoff=CUTOFF)
+    assert cache.get(seeded["expired"]) is None
+    assert cache.get(seeded["active"]) is not None
+
+
+def test_purge_discards_buffered_transcripts(engine, seeded):
+    buffer = transcripts.TranscriptBuffer(turns=5, max_sessions=10)
+    for session_id in seeded.values():
+        buffer.open(session_id)
+    Purger(engine, cache=None, buffer=buffer).run(cutoff=CUTOFF)
+    assert buffer.recent(seeded["expired"]) is None
+    assert buffer.recent(seeded["active"]) == ()
+
+
+def test_purge_stops_after_the_current_chunk(engine, seeded):
+    stop = threading.Event()
+    progress = []
+
+    def on_chunk(table, rows, _):
+        progress.append(table)
+        stop.set()
+
+    stats = Purger(engine, chunk_size=2, progress=on_chunk).run(cutoff=CUTOFF, stop=stop)
+    assert stats.interrupted and stats.chunks == 1 and len(progress) == 1
+    assert _count(engine, Message) == 8
+    assert _count(engine, DBSession) == 3
+    # The next run finishes the job.
+    assert not Purger(engine, chunk_size=2).run(cutoff=CUTOFF).interrupted
+    assert _count(engine, DBSession) == 2
+
+
+def test_scheduler_stop_does_not_wait_out_a_long_pause(engine, seeded):
+    scheduler = RetentionScheduler(Purger(engine, chunk_size=1, pause=60), interval=0)
+    scheduler.start()
+    deadline = time.monotonic() + 5
+    while _count(engine, Message) == 10 and time.monotonic() < deadline:
+        time.sleep(0.01)  # first chunk deleted; the purge is now in its 60s pause
+    started = time.monotonic()
+    scheduler.stop(timeout=5)
+    assert time.monotonic() - started < 1
+    assert _count(engine, Message) == 9
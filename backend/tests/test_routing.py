@@ -1,4 +1,67 @@
-from app import routing
+import json
+import os
+import shutil
+import time
+from datetime import datetime
+
+from app import questionnaires, routing
+
+# Independent oracle: route_user as it was before the decision table, with the
+# PHQ-9/GAD-7 cutoffs it read from config at the time.
+BASELINE_CUTOFFS = {"low": 0, "moderate": 10, "high": 15}
+BASELINE_RECOMMENDATIONS = {
+    "low": "Based on what you shared, here are some self-help options and public resources that may be supportive.",
+    "moderate": "We suggest speaking with a licensed professional or trusted clinician. Here are referral options.",
+    "high": (
+        "We recommend connecting with professional support as soon as possible. "
+        "If you feel unsafe, please use crisis resources."
+    ),
+}
+
+
+def _baseline_thresholds(score: int) -> dict:
+    comparisons = [
+        {"threshold": level, "cutoff": cutoff, "met": score >= cutoff}
+        for level, cutoff in sorted(BASELINE_CUTOFFS.items(), key=lambda item: item[1])
+    ]
+    highest_met = next((c["threshold"] for c in reversed(comparisons) if c["met"]), "low")
+    return {"score": score, "comparisons": comparisons, "highest_met": highest_met}
+
+
+def baseline_route_user(phq9_score: int, gad7_score: int, age_band: str) -> dict:
+    if phq9_score >= BASELINE_CUTOFFS["high"] or gad7_score >= BASELINE_CUTOFFS["high"]:
+        bucket = "high"
+    elif phq9_score >= BASELINE_CUTOFFS["moderate"] or gad7_score >= BASELINE_CUTOFFS["moderate"]:
+        bucket = "moderate"
+    else:
+        bucket = "low"
+    recommendation = BASELINE_RECOMMENDATIONS[bucket]
+    if age_band.lower() == "under 18":
+        recommendation += " As you are under 18, please involve a trusted guardian or appropriate youth service."
+        bucket = f"{bucket}_minor"
+    phq9_explanation = _baseline_thresholds(phq9_score)
+    gad7_explanation = _baseline_thresholds(gad7_score)
+    decision_basis = "phq9"
+    if bucket.startswith("high"):
+        decision_basis = "phq9" if phq9_explanation["highest_met"] == "high" else "gad7"
+    elif bucket.startswith("moderate"):
+        decision_basis = "phq9" if phq9_explanation["highest_met"] == "moderate" else "gad7"
+    return {
+        "bucket": bucket,
+        "recommendation": recommendation,
+        "scores": {"phq9": phq9_score, "gad7": gad7_score},
+        "timestamp": datetime.utcnow().isoformat(),
+        "explanation": {
+            "decision": {
+                "selected_bucket": bucket,
+                "basis": decision_basis,
+                "phq9_bucket": phq9_explanation["highest_met"],
+                "gad7_bucket": gad7_explanation["highest_met"],
+            },
+            "phq9": phq9_explanation,
+            "gad7": gad7_explanation,
+        },
+    }
 
 def test_routing_minor():
     result = routing.route_user(5, 5, "under 18")
@@ -20,3 +83,64 @@ def test_routing_explanation_contains_thresholds():
     decision = result["explanation"]["decision"]
     assert decision["selected_bucket"].startswith("moderate")
     assert decision["basis"] in {"phq9", "gad7"}
+
+
+def _without_timestamp(result):
+    return {key: value for key, value in result.items() if key != "timestamp"}
+
+
+def test_decision_table_matches_the_original_implementation_on_whole_grid():
+    phq9_max = questionnaires.get_definition("phq9").max_score
+    gad7_max = questionnaires.get_definition("gad7").max_score
+    for age_band in ("18+", "under 18", "Under 18"):
+        for phq9 in range(phq9_max + 1):
+            for gad7 in range(gad7_max + 1):
+                expected = _without_timestamp(baseline_route_user(phq9, gad7, age_band))
+                assert _without_timestamp(routing.route_user(phq9, gad7, age_band)) == expected
+                totals = {"phq9": phq9, "gad7": gad7}
+                assert _without_timestamp(routing.route_scores(totals, age_band)) == expected
+
+
+def test_decisions_are_shared_and_frozen():
+    first = routing.route_user(12, 3, "18+")
+    second = routing.route_user(12, 3, "18+")
+    assert first is not second
+    assert first["explanation"] is second["explanation"]
+    assert "timestamp" in first
+    decision = routing.get_table().lookup({"phq9": 12, "gad7": 3}, False)
+    try:
+        decision.bucket = "low"
+    except AttributeError:
+        pass
+    else:
+        raise AssertionError("RoutingDecision should be immutable")
+
+
+def test_out_of_range_scores_fall_back_to_direct_evaluation():
+    assert routing.route_user(40, 0, "18+")["bucket"] == "high"
+
+
+def test_optional_instruments_join_routing_once_answered():
+    assert set(routing.route_user(0, 0, "18+")["scores"]) == {"phq9", "gad7"}
+    result = routing.route_scores({"phq2": 4}, "18+")
+    assert result["scores"] == {"phq9": 0, "gad7": 0, "phq2": 4}
+    assert result["bucket"] == "moderate"
+    assert result["explanation"]["decision"]["basis"] == "phq2"
+    assert result["explanation"]["decision"]["phq2_bucket"] == "moderate"
+
+
+def test_table_rebuilds_when_definitions_change(tmp_path, monkeypatch):
+    for path in questionnaires.QUESTIONNAIRE_DIR.glob("*.json"):
+        shutil.copy(path, tmp_path / path.name)
+    registry = questionnaires.QuestionnaireRegistry(tmp_path, reload_interval=0)
+    monkeypatch.setattr(questionnaires, "registry", registry)
+
+    assert routing.route_user(12, 0, "18+")["bucket"] == "moderate"
+    generation = routing.get_table().generation
+    phq9 = tmp_path / "phq9.json"
+    data = json.loads(phq9.read_text(encoding="utf-8"))
+    data["thresholds"]["moderate"] = 13
+    phq9.write_text(json.dumps(data), encoding="utf-8")
+    os.utime(phq9, (time.time() + 5, time.time() + 5))
+    assert routing.route_user(12, 0, "18+")["bucket"] == "low"
+    assert routing.get_table().generation == registry.generation > generation
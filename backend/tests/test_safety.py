@@ -1,3 +1,5 @@
+import re
+
 from app import safety, resources
 
 def test_crisis_detection_english():
@@ -14,3 +16,41 @@ def test_crisis_response_includes_emergency():
     data = resources.load_resources("tr")
     result = safety.crisis_response(data)
     assert data["emergency_number"] in result
+
+
+def test_crisis_detection_turkish_case_and_diacritics():
+    assert safety.match_crisis("İNTİHAR etmeyi düşünüyorum") == "intihar"
+    assert safety.match_crisis("ÖLMEK İSTİYORUM") == "ölmek istiyorum"
+    assert safety.match_crisis("olmek  istiyorum") == "ölmek istiyorum"
+    assert safety.match_crisis("KENDIMI OLDURMEK") == "kendimi öldürmek"
+    assert safety.match_crisis("bugün biraz yorgunum") is None
+
+
+def test_matcher_reports_every_pattern():
+    matcher = safety.CrisisMatcher(["kill", "kill myself", "suicide"])
+    assert matcher.match("I want to kill myself") == "kill myself"
+    assert matcher.find_all("suicide, kill myself") == ["suicide", "kill myself"]
+
+
+def test_matcher_rebuilds_when_patterns_change(monkeypatch):
+    monkeypatch.setattr(safety, "CRISIS_PATTERNS", safety.CRISIS_PATTERNS + ("canıma kıymak",))
+    assert safety.match_crisis("Canıma kıymak istiyorum") == "canıma kıymak"
+
+
+def test_matcher_is_reused_until_the_patterns_are_replaced(monkeypatch):
+    monkeypatch.setattr(safety, "CRISIS_PATTERNS", safety.CRISIS_PATTERNS)
+    matcher = safety.get_matcher()
+    assert safety.get_matcher() is matcher
+    safety.set_crisis_patterns(["canıma kıymak"])
+    assert safety.get_matcher() is not matcher
+    assert safety.match_crisis("Canıma kıymak istiyorum") == "canıma kıymak"
+    assert safety.match_crisis("I want to kill myself") is None
+
+
+def test_matcher_is_one_regex_however_many_patterns():
+    from tests.benchmarks.crisis_matcher import synthetic_patterns
+
+    patterns = synthetic_patterns(1200)
+    matcher = safety.CrisisMatcher(patterns)
+    assert isinstance(matcher._regex, re.Pattern)
+    assert all(matcher.match(f"... {pattern} ...") is not None for pattern in patterns)
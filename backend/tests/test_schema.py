@@ -0,0 +1,120 @@
+import uuid
+from datetime import datetime
+from pathlib import Path
+
+import pytest
+
+pytest.importorskip("sqlalchemy")
+
+from sqlalchemy import create_engine, func, insert, inspect, select  # noqa: E402
+from sqlalchemy.exc import IntegrityError  # noqa: E402
+
+from app.database import Base  # noqa: E402
+from app.models import AuditLog, Message, QuestionnaireResponse, Session as DBSession, SessionScore, TranscriptTurn  # noqa: E402
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+SOME_ID = uuid.uuid4()
+SOME_IDS = [uuid.uuid4(), uuid.uuid4()]
+CUTOFF = datetime(2026, 1, 1)
+
+LOOKUPS = {
+    "sessions by user": select(DBSession.id).where(DBSession.user_id == SOME_ID),
+    "messages for export": select(Message).where(Message.session_id.in_(SOME_IDS)),
+    "responses for export": select(QuestionnaireResponse).where(QuestionnaireResponse.session_id.in_(SOME_IDS)),
+    "audit for export": select(AuditLog).where(AuditLog.session_id.in_(SOME_IDS)),
+    "answered indices": select(QuestionnaireResponse.question_index).where(
+        QuestionnaireResponse.session_id == SOME_ID, QuestionnaireResponse.questionnaire == "phq9"
+    ),
+    "route totals": select(QuestionnaireResponse.questionnaire, func.sum(QuestionnaireResponse.score))
+    .where(QuestionnaireResponse.session_id == SOME_ID)
+    .group_by(QuestionnaireResponse.questionnaire),
+    "expired messages": select(Message.id).where(Message.created_at < CUTOFF),
+    "recent turns": select(TranscriptTurn.content)
+    .where(TranscriptTurn.session_id == SOME_ID)
+    .order_by(TranscriptTurn.id.desc())
+    .limit(20),
+    "turns for export": select(TranscriptTurn.content).where(TranscriptTurn.session_id.in_(SOME_IDS)),
+    "expired turns": select(TranscriptTurn.id).where(TranscriptTurn.created_at < CUTOFF),
+    "expired audit": select(AuditLog.id).where(AuditLog.created_at < CUTOFF),
+    "expired responses": select(QuestionnaireResponse.id).where(QuestionnaireResponse.created_at < CUTOFF),
+    "expired sessions": select(DBSession.id).where(DBSession.created_at < CUTOFF),
+}
+
+
+def _plan(engine, statement) -> list:
+    compiled = statement.compile(dialect=engine.dialect, compile_kwargs={"render_postcompile": True})
+    params = tuple(None for _ in compiled.positiontup)
+    with engine.connect() as conn:
+        return [row[-1] for row in conn.exec_driver_sql("EXPLAIN QUERY PLAN " + str(compiled), params)]
+
+
+@pytest.mark.parametrize("name", sorted(LOOKUPS))
+def test_lookup_uses_index(engine, name):
+    plan = _plan(engine, LOOKUPS[name])
+    assert any("USING" in step and "INDEX" in step for step in plan), plan
+    assert not any(step.startswith("SCAN") and "INDEX" not in step for step in plan), plan
+
+
+def test_duplicate_answers_are_rejected(engine):
+    session_id = uuid.uuid4()
+    answer = {"session_id": session_id, "questionnaire": "phq9", "question_index": 0, "score": 1}
+    with engine.begin() as conn:
+        conn.execute(insert(DBSession.__table__).values(id=session_id))
+        conn.execute(insert(QuestionnaireResponse.__table__).values(id=uuid.uuid4(), **answer))
+    with pytest.raises(IntegrityError), engine.begin() as conn:
+        conn.execute(insert(QuestionnaireResponse.__table__).values(id=uuid.uuid4(), **answer))
+
+
+def test_migrations_dedupe_answers_and_match_models(tmp_path):
+    pytest.importorskip("alembic")
+    from alembic import command
+    from alembic.config import Config
+
+    url = f"sqlite:///{tmp_path / 'migrated.db'}"
+    alembic_cfg = Config(str(BACKEND_DIR / "alembic.ini"))
+    alembic_cfg.set_main_option("script_location", str(BACKEND_DIR / "migrations"))
+    alembic_cfg.set_main_option("sqlalchemy.url", url)
+    command.upgrade(alembic_cfg, "0001")
+
+    engine = create_engine(url)
+    session_id = uuid.uuid4()
+    with engine.begin() as conn:
+        conn.execute(insert(DBSession.__table__).values(id=session_id))
+        for score, created_at, name in ((1, datetime(2026, 1, 1), "PHQ9"), (3, datetime(2026, 1, 2), "phq9")):
+            conn.execute(
+                insert(QuestionnaireResponse.__table__).values(
+                    id=uuid.uuid4(), session_id=session_id, questionnaire=name, question_index=0, score=score, created_at=created_at
+                )
+            )
+    command.upgrade(alembic_cfg, "head")
+
+    with engine.connect() as conn:
+        rows = conn.execute(select(QuestionnaireResponse.questionnaire, QuestionnaireResponse.score)).all()
+    assert rows == [("phq9", 3)]
+    with engine.connect() as conn:
+        aggregates = conn.execute(select(SessionScore.questionnaire, SessionScore.total, SessionScore.answered_mask)).all()
+    assert aggregates == [("phq9", 3, 1)]
+    migrated = {ix["name"] for table in Base.metadata.tables for ix in inspect(engine).get_indexes(table)}
+    declared = {ix.name for table in Base.metadata.tables.values() for ix in table.indexes}
+    assert declared == migrated
+
+
+def test_migrate_creates_the_model_schema(tmp_path):
+    pytest.importorskip("alembic")
+    from app.migrate import migrate
+
+    url = f"sqlite:///{tmp_path / 'fresh.db'}"
+    migrate(url)
+    assert set(inspect(create_engine(url)).get_table_names()) == set(Base.metadata.tables) | {"alembic_version"}
+
+
+def test_migrate_creates_transcript_partitions(tmp_path, monkeypatch):
+    pytest.importorskip("alembic")
+    from app import transcripts
+    from app.migrate import migrate
+
+    urls = []
+    monkeypatch.setattr(transcripts, "ensure_partitions", lambda engine: urls.append(str(engine.url)))
+    url = f"sqlite:///{tmp_path / 'fresh.db'}"
+    migrate(url)
+    assert urls == [url]
@@ -0,0 +1,76 @@
+import uuid
+
+import pytest
+
+pytest.importorskip("sqlalchemy")
+
+from sqlalchemy import update  # noqa: E402
+from sqlalchemy.orm import sessionmaker  # noqa: E402
+
+from app import scores  # noqa: E402
+from app.models import Session as DBSession, SessionScore  # noqa: E402
+
+
+@pytest.fixture
+def db(engine):
+    with sessionmaker(bind=engine)() as session:
+        yield session
+
+
+@pytest.fixture
+def session_id(db):
+    session_id = uuid.uuid4()
+    db.add(DBSession(id=session_id, age_band="18+"))
+    db.commit()
+    return session_id
+
+
+def test_first_unanswered():
+    assert scores.first_unanswered(0, 9) == 0
+    assert scores.first_unanswered(0b1011, 9) == 2
+    assert scores.first_unanswered(0b111111111, 9) is None
+
+
+def test_record_answer_keeps_running_totals(db, session_id):
+    scores.record_answer(db, session_id, "phq9", 0, 2)
+    scores.record_answer(db, session_id, "phq9", 3, 1)
+    scores.record_answer(db, session_id, "gad7", 0, 3)
+    assert scores.totals(db, session_id) == {"phq9": 3, "gad7": 3}
+    assert scores.answered_mask(db, session_id, "phq9") == 0b1001
+    assert scores.answered_mask(db, session_id, "gad7") == 0b1
+
+
+def test_reanswer_adjusts_total_by_delta(db, session_id):
+    scores.record_answer(db, session_id, "phq9", 1, 3)
+    scores.record_answer(db, session_id, "phq9", 1, 1)
+    assert scores.totals(db, session_id) == {"phq9": 1}
+    assert scores.answered_mask(db, session_id, "phq9") == 0b10
+
+
+def test_record_answers_mixes_new_and_replaced_answers(db, session_id):
+    scores.record_answers(db, session_id, [("phq9", 0, 1), ("phq9", 1, 1)])
+    scores.record_answers(db, session_id, [("phq9", 1, 3), ("phq9", 2, 2), ("gad7", 4, 1), ("phq9", 2, 0)])
+    assert scores.totals(db, session_id) == {"phq9": 4, "gad7": 1}
+    assert scores.answered_mask(db, session_id, "phq9") == 0b111
+    assert scores.answered_mask(db, session_id, "gad7") == 0b10000
+    assert scores.rebuild(db, check_only=True) == {"checked": 2, "mismatched": 0, "stale": 0}
+
+
+def test_empty_aggregates(db, session_id):
+    assert scores.totals(db, session_id) == {}
+    assert scores.answered_mask(db, session_id, "phq9") == 0
+
+
+def test_rebuild_repairs_drift(db, session_id):
+    for idx, score in enumerate([1, 2, 3]):
+        scores.record_answer(db, session_id, "phq9", idx, score)
+    assert scores.rebuild(db, check_only=True) == {"checked": 1, "mismatched": 0, "stale": 0}
+
+    db.execute(update(SessionScore).values(total=99, answered_mask=0))
+    db.add(SessionScore(session_id=session_id, questionnaire="gad7", total=5, answered_mask=1))
+    db.commit()
+    assert scores.rebuild(db, check_only=True) == {"checked": 1, "mismatched": 1, "stale": 1}
+    scores.rebuild(db)
+    assert scores.rebuild(db, check_only=True)["mismatched"] == 0
+    assert scores.totals(db, session_id) == {"phq9": 6}
+    assert scores.answered_mask(db, session_id, "phq9") == 0b111
@@ -0,0 +1,73 @@
+import uuid
+
+import pytest
+
+pytest.importorskip("sqlalchemy")
+
+from sqlalchemy import event  # noqa: E402
+from sqlalchemy.orm import sessionmaker  # noqa: E402
+
+from app.models import Session as DBSession  # noqa: E402
+from app.session_cache import MemoryBackend, SessionCache, SessionInfo  # noqa: E402
+
+
+@pytest.fixture
+def queries(engine):
+    statements = []
+    event.listen(engine, "before_cursor_execute", lambda *args: statements.append(args[2]))
+    return statements
+
+
+def test_fetch_reads_the_database_once(engine, queries):
+    session_id = uuid.uuid4()
+    with sessionmaker(bind=engine)() as db:
+        db.add(DBSession(id=session_id, country="UK", language="EN", age_band="under 18"))
+        db.commit()
+        queries.clear()
+        cache = SessionCache(maxsize=10, ttl=60)
+        assert cache.fetch(db, session_id) == SessionInfo(session_id, "UK", "EN", "under 18")
+        assert cache.fetch(db, session_id).age_band == "under 18"
+        assert len(queries) == 1
+        # Unknown sessions are looked up every time, so sessions created elsewhere are found.
+        assert cache.fetch(db, uuid.uuid4()) is None
+        assert cache.fetch(db, uuid.uuid4()) is None
+        assert len(queries) == 3
+
+
+def test_shared_backend_is_seen_by_other_workers():
+    shared = MemoryBackend()
+    first, second = SessionCache(10, 60, shared), SessionCache(10, 60, shared)
+    info = SessionInfo(uuid.uuid4(), "TR", "TR", "18+")
+    first.put(info)
+    assert second.get(info.id) == info
+    first.invalidate([info.id])
+    second.clear()
+    assert second.get(info.id) is None
+
+
+def test_entries_expire():
+    now = [0.0]
+    shared = MemoryBackend(clock=lambda: now[0])
+    cache = SessionCache(maxsize=0, ttl=5, shared=shared)
+    info = SessionInfo(uuid.uuid4(), "TR", "TR", "18+")
+    cache.put(info)
+    assert cache.get(info.id) == info
+    now[0] = 6
+    assert cache.get(info.id) is None
+
+
+def test_invalidation_reaches_other_workers_only_through_the_shared_backend():
+    shared = MemoryBackend()
+    info = SessionInfo(uuid.uuid4(), "TR", "TR", "18+")
+    first, second = SessionCache(10, 60, shared), SessionCache(10, 60, shared)
+    first.put(info)
+    assert second.get(info.id) == info
+    first.invalidate([info.id])
+    # second's LRU copy outlives the purge until it expires.
+    assert second.get(info.id) == info
+
+    first, second = SessionCache(0, 60, shared), SessionCache(0, 60, shared)
+    first.put(info)
+    assert second.get(info.id) == info
+    first.invalidate([info.id])
+    assert second.get(info.id) is None
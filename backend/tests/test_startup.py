@@ -0,0 +1,45 @@
+import pytest
+
+pytest.importorskip("fastapi")
+pytest.importorskip("sqlalchemy")
+pytest.importorskip("httpx")
+
+from tests.benchmarks.cold_start import DEFERRED, _env, import_times  # noqa: E402
+
+
+def test_importing_the_app_defers_rarely_used_modules(tmp_path):
+    times = import_times("app.main", _env(f"sqlite:///{tmp_path / 'cold.db'}"))
+    assert "app.main" in times
+    assert [name for name in DEFERRED if name in times] == []
+
+
+def test_importing_the_app_does_not_touch_the_database(tmp_path):
+    database = tmp_path / "cold.db"
+    import_times("app.main", _env(f"sqlite:///{database}", {"CREATE_SCHEMA": "true"}))
+    assert not database.exists()
+
+
+def test_lifespan_warms_caches_before_the_first_request(monkeypatch):
+    from fastapi.testclient import TestClient
+
+    from app import main, metrics
+
+    calls = []
+    monkeypatch.setattr(main, "preload", lambda: calls.append("preload"))
+    before = metrics.STAGE_SECONDS.count("startup", "preload")
+    with TestClient(main.app):
+        assert calls == ["preload"]
+    assert metrics.STAGE_SECONDS.count("startup", "preload") == before + 1
+
+
+def test_gunicorn_profile_refuses_a_retention_scheduler_per_worker(monkeypatch):
+    import runpy
+    from pathlib import Path
+
+    conf = str(Path(__file__).resolve().parents[1] / "gunicorn.conf.py")
+    monkeypatch.setenv("CREATE_SCHEMA", "false")
+    monkeypatch.setenv("RETENTION_INTERVAL_MINUTES", "0")
+    assert runpy.run_path(conf)["preload_app"] is True
+    monkeypatch.setenv("RETENTION_INTERVAL_MINUTES", "60")
+    with pytest.raises(RuntimeError, match="app.retention"):
+        runpy.run_path(conf)
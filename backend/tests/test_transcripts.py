@@ -0,0 +1,139 @@
+import uuid
+from datetime import date, datetime
+
+import pytest
+
+pytest.importorskip("sqlalchemy")
+
+from sqlalchemy import func, insert, select  # noqa: E402
+from sqlalchemy.orm import sessionmaker  # noqa: E402
+
+from app import transcripts  # noqa: E402
+from app.models import Session as DBSession, TranscriptTurn  # noqa: E402
+from app.transcripts import ASSISTANT, USER, TranscriptBuffer, Transcripts, TranscriptWriter, Turn, TurnIds  # noqa: E402
+
+
+def _session(engine) -> uuid.UUID:
+    session_id = uuid.uuid4()
+    with engine.begin() as conn:
+        conn.execute(insert(DBSession.__table__).values(id=session_id))
+    return session_id
+
+
+def _count(engine) -> int:
+    with engine.connect() as conn:
+        return conn.execute(select(func.count()).select_from(TranscriptTurn.__table__)).scalar()
+
+
+def _turn(session_id: uuid.UUID, n: int) -> Turn:
+    return Turn(n, session_id, USER, f"turn {n}", datetime(2026, 1, 1))
+
+
+def test_ids_are_increasing_within_and_across_milliseconds():
+    now = [1_800_000_000.0]
+    ids = TurnIds(clock=lambda: now[0])
+    same_millisecond = [ids.next() for _ in range(5000)]  # overflows the 12-bit counter
+    now[0] += 1
+    later = ids.next()
+    assert same_millisecond == sorted(set(same_millisecond))
+    assert later > same_millisecond[-1]
+    assert later < 2**63
+
+
+def test_ids_do_not_go_back_with_the_clock():
+    now = [1_800_000_000.0]
+    ids = TurnIds(clock=lambda: now[0])
+    first = ids.next()
+    now[0] -= 5
+    assert ids.next() > first
+
+
+def test_buffer_keeps_the_last_turns_of_open_sessions():
+    buffer = TranscriptBuffer(turns=3, max_sessions=10)
+    session_id = uuid.uuid4()
+    buffer.open(session_id)
+    for n in range(5):
+        buffer.append(_turn(session_id, n))
+    assert [turn.id for turn in buffer.recent(session_id)] == [2, 3, 4]
+
+
+def test_buffer_ignores_sessions_it_does_not_hold():
+    buffer = TranscriptBuffer(turns=3, max_sessions=10)
+    session_id = uuid.uuid4()
+    buffer.append(_turn(session_id, 1))
+    assert buffer.recent(session_id) is None
+
+
+def test_buffer_evicts_least_recently_used_session():
+    buffer = TranscriptBuffer(turns=3, max_sessions=2)
+    first, second, third = uuid.uuid4(), uuid.uuid4(), uuid.uuid4()
+    buffer.open(first)
+    buffer.open(second)
+    buffer.recent(first)
+    buffer.open(third)
+    assert buffer.recent(second) is None
+    assert buffer.recent(first) == () and buffer.recent(third) == ()
+    assert len(buffer) == 2
+
+
+def test_turns_are_slotted():
+    turn = _turn(uuid.uuid4(), 1)
+    assert not hasattr(turn, "__dict__")
+    assert turn.message() == {"role": "user", "content": "turn 1"}
+
+
+def test_context_reads_the_database_once(engine, monkeypatch):
+    session_id = _session(engine)
+    store = Transcripts(TranscriptBuffer(turns=2, max_sessions=10), TranscriptWriter(engine))
+    for n, sender in enumerate((USER, ASSISTANT, USER)):
+        store.add(session_id, sender, f"turn {n}")
+    assert _count(engine) == 3  # writer not running: written synchronously
+
+    loads = []
+    load = transcripts.load
+    monkeypatch.setattr(transcripts, "load", lambda *args: loads.append(args) or load(*args))
+    with sessionmaker(bind=engine)() as db:
+        first = store.context(db, session_id)
+        store.add(session_id, ASSISTANT, "turn 3")
+        second = store.context(db, session_id)
+    assert [turn.content for turn in first] == ["turn 1", "turn 2"]
+    assert [turn.content for turn in second] == ["turn 2", "turn 3"]
+    assert len(loads) == 1
+
+
+def test_add_with_session_writes_in_its_transaction(engine):
+    session_id = _session(engine)
+    store = Transcripts(TranscriptBuffer(), TranscriptWriter(engine))
+    with sessionmaker(bind=engine)() as db:
+        store.add(session_id, USER, "rolled back", db=db)
+        db.rollback()
+        store.add(session_id, USER, "committed", db=db)
+        db.commit()
+    with engine.connect() as conn:
+        assert conn.execute(select(TranscriptTurn.content)).scalars().all() == ["committed"]
+
+
+def test_writer_batches_turns(engine):
+    session_id = _session(engine)
+    writer = TranscriptWriter(engine, batch_size=10, flush_interval=60)
+    store = Transcripts(TranscriptBuffer(), writer)
+    writer.start()
+    try:
+        for n in range(25):
+            store.add(session_id, USER, f"turn {n}")
+        writer.flush()
+        assert _count(engine) == 25
+        assert writer.stats()["batches"] == 3
+    finally:
+        writer.stop()
+
+
+def test_partition_helpers_are_noops_without_postgres(engine):
+    assert transcripts.ensure_partitions(engine) == []
+    assert transcripts.drop_partitions_before(engine, datetime(2030, 1, 1)) == []
+
+
+def test_month_arithmetic():
+    assert transcripts._month_start(date(2026, 11, 30), 0) == date(2026, 11, 1)
+    assert transcripts._month_start(date(2026, 11, 30), 2) == date(2027, 1, 1)
+    assert transcripts._month_start(date(2026, 1, 15), -1) == date(2025, 12, 1)